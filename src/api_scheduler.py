@@ -7,7 +7,7 @@ from datetime import date
 
 # 引入排班核心邏輯
 try:
-    from scheduler_logic import SchedulerLogic
+    from scheduler_logic import SchedulerLogic, EmployeeIndex
 except ImportError:
     raise ImportError("scheduler_logic.py not found. Please ensure it is in the same directory.")
 
@@ -34,6 +34,7 @@ class CoverageRule(BaseModel):
 class DailyLimit(BaseModel):
     max_staff_per_day: int = 8 # 每日最大上班員工數
     enforce_limit: bool = True
+    min_rest_hours: float = SchedulerLogic.DEFAULT_MIN_REST_HOURS # 前一班下班到下一班上班的最少休息時數
 
 class BusinessHours(BaseModel):
     start: str = "07:00" # 營業開始時間
@@ -52,6 +53,15 @@ class ScheduleRequest(BaseModel):
     daily_limits: DailyLimit = DailyLimit()
     business_hours: BusinessHours = BusinessHours()
     max_retries: int = 5  # 每日最大重試次數
+    holidays: List[str] = []  # (選填) 國定假日 "YYYY-MM-DD"，計入週末班數
+    seed: Optional[int] = None  # (選填) 隨機種子，相同輸入 + 相同 seed 會得到相同班表
+    n_starts: int = 1  # (選填) 多起點次數，> 1 時平行跑多次並保留最好的結果
+    # (選填) 時間預算 (秒)，在預算內持續改善並回傳最好的班表。
+    # 優先於 n_starts: 同時指定時 n_starts 是預算內至少要跑的起點數 (依序執行，可能超過預算)
+    time_budget_s: Optional[float] = None
+    start_date: Optional[str] = None  # (選填) 排班區間 "YYYY-MM-DD"，指定時取代 year/month 的整月
+    end_date: Optional[str] = None  # (選填) 排班區間結束日，預設為 start_date 當月最後一天
+    prior_state: Optional[Dict[str, Any]] = None  # (選填) 上一期回傳的 state，延續連續上班與休息間隔
 
     class Config:
         json_schema_extra = {
@@ -94,11 +104,16 @@ def generate_schedule(req: ScheduleRequest):
             shifts_config=shifts_config,
             coverage_rules=coverage_rules,
             daily_limits=daily_limits,
-            business_hours=business_hours
+            business_hours=business_hours,
+            holidays=req.holidays,
+            start_date=req.start_date,
+            end_date=req.end_date,
+            prior_state=req.prior_state
         )
 
         # 執行排班
-        schedule, logs = scheduler.generate(max_retries=req.max_retries)
+        schedule, logs = scheduler.generate(max_retries=req.max_retries, seed=req.seed, n_starts=req.n_starts,
+                                            time_budget_s=req.time_budget_s)
 
         # 格式化輸出
         # schedule_flat 是為了方便寫入 CSV 或 Google Sheet
@@ -124,6 +139,11 @@ def generate_schedule(req: ScheduleRequest):
             "schedule_raw": schedule, # 原始結構
             "schedule_flat": flat_list, # 扁平化結構 (容易處理)
             "schedule_matrix": matrix_list, # 員工矩陣視圖 (包含 X)
+            "seed": scheduler.seed, # 實際使用的隨機種子 (可用來重現結果)
+            "objective": scheduler.objective, # 目標分數 (越小越好)
+            "feasibility": scheduler.feasibility, # 預先分析 (可證明無解的日子與原因)
+            "phase_times": getattr(scheduler, "phase_times", None), # 限時排班各階段耗時 (秒)
+            "state": scheduler.export_state(), # 本期結束的狀態快照 (下一期的 prior_state)
             "logs": logs # 排班過程的警示與日誌
         }
 
@@ -133,6 +153,78 @@ def generate_schedule(req: ScheduleRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze")
+def analyze_schedule(req: ScheduleRequest):
+    """
+    可行性預先分析：不排班，只回傳每天可證明無法滿足的規則與造成無解的限制 (毫秒級)
+    """
+    try:
+        scheduler = SchedulerLogic(
+            year=req.year,
+            month=req.month,
+            employees_config=[e.dict() for e in req.employees],
+            shifts_config={k: v.dict() for k, v in req.shifts.items()},
+            coverage_rules=[c.dict() for c in req.coverage_rules],
+            daily_limits=req.daily_limits.dict(),
+            business_hours=req.business_hours.dict(),
+            holidays=req.holidays,
+            start_date=req.start_date,
+            end_date=req.end_date,
+            prior_state=req.prior_state
+        )
+        return {"status": "success", "feasibility": scheduler.analyze_feasibility()}
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+class UnavailabilityEvent(BaseModel):
+    person: str # 請假的員工
+    date: str # 日期 "YYYY-MM-DD"
+    end_date: Optional[str] = None # (選填) 連續請假的最後一天
+
+class ReplanRequest(ScheduleRequest):
+    """
+    /replan 接口的請求格式: 排班設定 + 已發布的班表 + 請假事件
+    """
+    current_schedule: Dict[str, Dict[str, List[str]]] # 已發布的班表 {date: {shift: [names]}}
+    events: List[UnavailabilityEvent] # 無法上班的事件
+    neighbor_days: int = 1 # 事件前後各納入幾天一起重排 (連續上班 / 休息間隔的連鎖影響)
+
+@app.post("/replan")
+def replan_schedule(req: ReplanRequest):
+    """
+    臨時請假重排：只重排受影響的日子，變更最少，回傳差異 (不是整份班表)
+    """
+    try:
+        scheduler = SchedulerLogic(
+            year=req.year,
+            month=req.month,
+            employees_config=[e.dict() for e in req.employees],
+            shifts_config={k: v.dict() for k, v in req.shifts.items()},
+            coverage_rules=[c.dict() for c in req.coverage_rules],
+            daily_limits=req.daily_limits.dict(),
+            business_hours=req.business_hours.dict(),
+            holidays=req.holidays,
+            start_date=req.start_date,
+            end_date=req.end_date,
+            prior_state=req.prior_state
+        )
+        diff, logs = scheduler.replan(req.current_schedule, [e.dict() for e in req.events], neighbor_days=req.neighbor_days)
+        return {
+            "status": "success",
+            "diff": diff, # 變更的格子 [{date, person, from, to}] (None = 休息)
+            "changed": len(diff),
+            "objective": scheduler.objective,
+            "logs": logs
+        }
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 class ChangeRequest(BaseModel):
     """
     /validate 接口的請求格式
@@ -154,17 +246,16 @@ def validate_change(req: ChangeRequest):
     """
     try:
         # 內部檢查 helper func
-        def check_person_constraints(name: str, target_date_str: str, schedule_state: dict, emp_config: dict):
+        def check_person_constraints(name: str, target_date_str: str, schedule_state: dict, emp_index: EmployeeIndex):
             # 1. 存在性檢查
-            if name not in emp_config:
+            if name not in emp_index.id_of:
                 return False, f"Employee '{name}' not found in configuration."
             
-            emp = emp_config[name]
             from datetime import datetime
             t_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
             
             # 2. 星期幾限制
-            if t_date.weekday() not in emp['available_weekdays']:
+            if not emp_index.works_weekday(name, t_date.weekday()):
                 return False, f"Warning: {name} is usually not available on weekday {t_date.weekday()}."
 
             # 3. 每日限制 (檢查當日是否已排班)
@@ -192,17 +283,17 @@ def validate_change(req: ChangeRequest):
                 else:
                     break
             
-            if consecutive >= 6:
+            if consecutive >= SchedulerLogic.MAX_CONSECUTIVE_DAYS:
                 return False, f"Violation: {name} has already worked {consecutive} consecutive days before {target_date_str}."
 
             return True, "OK"
 
-        # 建立快速查找表
-        emp_map = {e.name: e.dict() for e in req.employees}
+        # 建立員工索引 (與排班引擎共用)
+        emp_index = EmployeeIndex([e.dict() for e in req.employees])
         
         # 針對不同動作進行檢查
         if req.action == "ASSIGN":
-            ok, msg = check_person_constraints(req.person, req.date_str, req.current_schedule, emp_map)
+            ok, msg = check_person_constraints(req.person, req.date_str, req.current_schedule, emp_index)
             if not ok:
                 return {"valid": False, "message": msg}
             return {"valid": True, "message": f"Assigning {req.person} is valid."}
@@ -215,7 +306,7 @@ def validate_change(req: ChangeRequest):
                 return {"valid": False, "message": "Target person required for SWAP."}
             
             # 驗證被換上來的人 (Target Person) 是否能上這個班
-            ok, msg = check_person_constraints(req.target_person, req.date_str, req.current_schedule, emp_map)
+            ok, msg = check_person_constraints(req.target_person, req.date_str, req.current_schedule, emp_index)
             if not ok:
                 return {"valid": False, "message": f"Swap rejected: {msg}"}
             
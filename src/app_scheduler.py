@@ -458,12 +458,21 @@ try:
                 value=st.session_state.daily_limits.get("min_monthly_hours", 0),
                 help="每位員工每月至少要安排多少小時的班 (設為0則不限制)"
             )
+            
+            min_rest_hours = st.number_input(
+                "班與班最少休息 (hours)",
+                min_value=0,
+                max_value=24,
+                value=st.session_state.daily_limits.get("min_rest_hours", 11),
+                help="前一天下班到隔天上班之間至少要休息幾小時 (防止花花班)"
+            )
     
         if st.button("储存限制设定 (Save Limits)"):
             st.session_state.daily_limits = {
                 "max_staff_per_day": max_staff,
                 "enforce_limit": enforce_limit,
-                "min_monthly_hours": min_monthly_hours  # Save new field
+                "min_monthly_hours": min_monthly_hours,  # Save new field
+                "min_rest_hours": min_rest_hours
             }
             save_data("config/config_daily_limits.json", st.session_state.daily_limits)
             st.success("限制设定已储存！")
@@ -541,6 +550,9 @@ try:
             year = st.number_input("年份", value=2026, key="sched_year")
         with col_b:
             month = st.number_input("月份", value=1, key="sched_month")
+        with col_c:
+            n_starts = st.number_input("多起點次數 (Multi-start)", min_value=1, max_value=64, value=1, key="sched_n_starts",
+                                       help="平行產生多份班表，自動保留目標分數最好的一份")
         
         debug_mode = st.toggle("🐞 啟用逐步除錯模式 (Step-by-Step Debug Mode)")
     
@@ -561,12 +573,6 @@ try:
                     daily_limits=st.session_state.daily_limits,
                     business_hours=st.session_state.business_hours
                 )
-                # Manually initialize empty structures
-                st.session_state.debug_scheduler.schedule = {}
-                st.session_state.debug_scheduler.history = {
-                    emp['name']: {"worked_days": set(), "consecutive_days": 0} 
-                    for emp in st.session_state.employees
-                }
                 st.session_state.current_debug_day = 1
                 if reset_clicked:
                     st.rerun()
@@ -587,19 +593,15 @@ try:
         
             if current_day <= num_days:
                 # DEBUG: Show internal state
-                st.caption(f"Debug Info: Day {current_day}/{num_days} | Scheduled: {len(scheduler.schedule)} days")
+                st.caption(f"Debug Info: Day {current_day}/{num_days} | Scheduled: {current_day - 1} days")
             
                 if col_next.button(f"🗓️ 排列 {year}-{month:02d}-{current_day:02d}", key=f"btn_next_day_{current_day}"):
                     current_date = date(year, month, current_day)
                     logs = scheduler.schedule_one_day(current_date)
                 
-                    # Update history and coverage check
-                    # Note: schedule_one_day already updates schedule/history
-                    # But we need to run the post-day cleanup (consecutive reset)
+                    # Note: schedule_one_day writes the assignment matrix;
+                    # consecutive days are derived from it (no manual reset needed)
                     date_str = current_date.strftime("%Y-%m-%d")
-                    for emp in scheduler.employees:
-                        if date_str not in scheduler.history[emp['name']]["worked_days"]:
-                            scheduler.history[emp['name']]["consecutive_days"] = 0
                 
                     # Check coverage
                     warns = scheduler._validate_coverage(date_str)
@@ -710,7 +712,7 @@ try:
                         business_hours=st.session_state.business_hours
                     )
                 
-                    schedule_dict, log = scheduler.generate()
+                    schedule_dict, log = scheduler.generate(n_starts=int(n_starts))
                     
                     elapsed = time.time() - start_time
                     
@@ -1,10 +1,594 @@
+import numpy as np
 import pandas as pd
 import random
 from datetime import date, timedelta
 import calendar
 
+# 時間軸解析度: 5 分鐘一格，一天 288 格 (Timeline resolution)
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 288
+
+
+class ShiftIndex:
+    """
+    班別編譯索引 (Compiled Shift Model)
+
+    在 SchedulerLogic 建構時一次解析所有班別時間字串，
+    之後的熱點路徑 (可用性、覆蓋率驗證、工時計算) 都只查表，不再重複解析。
+
+    每個班別有一個整數 id (依 shifts_config 的順序)，並預先計算:
+      - segments: 分段 [(start, end), ...]
+      - seg_starts / seg_ends: 各段開始、結束分鐘數
+      - first_start / last_end: 第一段開始、最後一段結束 (無時間則為 None)
+      - total_minutes: 總工時分鐘數 (跨日自動加 24 小時)
+      - slot_mask: 5 分鐘解析度時間軸 (289 格, 1=上班)
+      - rest_matrix: 班別 x 班別的隔日休息間隔 (分鐘，含跨日班別)
+
+    沒有 "time" 欄位的班別: 休息間隔沿用舊版預設，視為 UNTIMED_REST_SPAN (全天班)；
+    覆蓋、工時、角色需求仍視為無時間 (segments 為空)。"time" 為空字串的班別不受休息間隔限制。
+    """
+    # 不受休息間隔限制 (無時間的班別 / 無排班紀錄)
+    REST_UNBOUNDED = 10 ** 6
+    # 沒有 "time" 欄位的班別在休息間隔檢查中的時間
+    UNTIMED_REST_SPAN = "00:00-23:59"
+
+    def __init__(self, shifts_config):
+        self.names = list(shifts_config)
+        self.id_of = {name: i for i, name in enumerate(self.names)}
+        self.has_time = []
+        self.segments = []
+        self.seg_starts = []
+        self.seg_ends = []
+        self.first_start = []
+        self.last_end = []
+        self.total_minutes = []
+        self.slot_mask = []
+        rest_spans = []
+        untimed_span = tuple(SchedulerLogic._parse_shift_segments(self.UNTIMED_REST_SPAN))
+
+        for name in self.names:
+            info = shifts_config[name] or {}
+            time_str = info.get("time")
+            # 唯一一次字串解析 (解析失敗的分段會被略過)
+            segments = tuple(SchedulerLogic._parse_shift_segments(time_str))
+            rest_spans.append(segments if "time" in info else untimed_span)
+
+            total = 0
+            for start, end in segments:
+                duration = end - start
+                if duration < 0: duration += 24 * 60  # Cross midnight
+                total += duration
+
+            mask = [0] * (SLOTS_PER_DAY + 1)  # 00:00 to 24:00 (last index 288 for 24:00)
+            for start, end in segments:
+                s_idx = max(0, int(start // SLOT_MINUTES))
+                e_idx = min(SLOTS_PER_DAY, int(end // SLOT_MINUTES))
+                for i in range(s_idx, e_idx):
+                    mask[i] = 1
+
+            self.has_time.append(bool(time_str))
+            self.segments.append(segments)
+            self.seg_starts.append(tuple(s for s, _ in segments))
+            self.seg_ends.append(tuple(e for _, e in segments))
+            self.first_start.append(segments[0][0] if segments else None)
+            self.last_end.append(segments[-1][1] if segments else None)
+            self.total_minutes.append(total)
+            self.slot_mask.append(tuple(mask))
+
+        self.has_time_mask = np.array(self.has_time, dtype=bool)
+        # 班別人數上限 (enforce_headcount)，未強制的班別視為無上限
+        self.headcount_cap = np.array([
+            (shifts_config[name] or {}).get("required_people", 99)
+            if (shifts_config[name] or {}).get("enforce_headcount", False) else np.iinfo(np.int32).max
+            for name in self.names
+        ], dtype=np.int64)
+        # 以 shift id 查表用的陣列 (-1 = 無時間)
+        self.minutes_arr = np.array(self.total_minutes, dtype=np.int64)
+        self.last_end_arr = np.array([-1 if e is None else e for e in self.last_end], dtype=np.int64)
+        # 休息間隔檢查用的上班 / 下班時間 (沒有 "time" 欄位的班別用 UNTIMED_REST_SPAN)
+        self.rest_timed = np.array([bool(span) for span in rest_spans], dtype=bool)
+        self.first_start_arr = np.array([span[0][0] if span else 0 for span in rest_spans], dtype=np.int64)
+        # 歷史規則: 名稱含 A2C 的班別在角色需求時加 5 分
+        self.a2c_bonus = np.array([5 if "A2C" in name else 0 for name in self.names], dtype=np.int64)
+
+        # 休息間隔矩陣 rest_matrix[p, n]: 前一天上 p、今天上 n 之間的休息分鐘數
+        # 跨日班別 (例如 22:00-02:00) 的下班時間算到隔天 (26:00)；無時間的班別不受限制
+        end_abs = []
+        for segments in rest_spans:
+            end = segments[-1][1] if segments else 0
+            if any(e < s for s, e in segments):
+                end += 24 * 60
+            end_abs.append(end)
+        self.end_abs_arr = np.array(end_abs, dtype=np.int64)
+        self.rest_matrix = 24 * 60 + self.first_start_arr[None, :] - self.end_abs_arr[:, None]
+        self.rest_matrix[~self.rest_timed, :] = self.REST_UNBOUNDED
+        self.rest_matrix[:, ~self.rest_timed] = self.REST_UNBOUNDED
+
+    def __len__(self):
+        return len(self.names)
+
+    def segments_of(self, shift_name):
+        """取得班別分段，未知班別回傳空 tuple"""
+        sid = self.id_of.get(shift_name)
+        return self.segments[sid] if sid is not None else ()
+
+    def rest_gaps(self, last_shift, days_since):
+        """
+        距離上一班的休息分鐘數 (向量化)
+
+        :param last_shift: 上一次班別 id (np.ndarray, -1 = 無紀錄)
+        :param days_since: 上一次上班距今幾天 (1 = 昨天)
+        回傳: np.ndarray (len(last_shift) x 班別數)
+        """
+        gaps = self.rest_matrix[np.maximum(last_shift, 0)] + ((days_since - 1) * 24 * 60)[:, None]
+        gaps[last_shift < 0] = self.REST_UNBOUNDED
+        return gaps
+
+    def overlaps(self, sid, start, end):
+        """班別 sid 的任何一段是否與 [start, end) 重疊"""
+        for s_start, s_end in self.segments[sid]:
+            if s_start < end and s_end > start:
+                return True
+        return False
+
+
+class IntervalGrid:
+    """
+    基本時段 (Elementary Intervals)
+
+    收集設定中所有的時間邊界 (班別上下班、覆蓋規則、營業時段)，把一天切成 K 個
+    長度不等的時段，每個時段內所有班別與需求都不變。需求曲線、覆蓋、未滿足需求
+    都用長度 K 的陣列表示，依時段分鐘數加權，取代固定的 288 格 (5 分鐘) 時間軸。
+    時間不會被捨入到 5 分鐘格 (例如 06:20、21:35、06:17 都是精確邊界)。
+
+    - bounds: 邊界分鐘數 (K+1 個，第一個為 0、最後一個為 1440)
+    - starts / weights: 各時段開始分鐘數與長度 (分鐘)
+    - cover[s, k]: 班別 s 在時段 k 上班 (跨日的分段與 288 格版本相同，不計入當天需求)
+    - rise[s, k]: 班別 s 在時段 k 開始上班 (k-1 不在班)，k=0 不算
+
+    :param shift_index: ShiftIndex
+    :param windows: 其他需求時段 [(start, end), ...] (覆蓋規則、營業時段)
+    """
+    DAY_MINUTES = 24 * 60
+
+    def __init__(self, shift_index, windows=()):
+        points = {0, self.DAY_MINUTES}
+        for segments in shift_index.segments:
+            for start, end in segments:
+                points.update((start, end))
+        for start, end in windows:
+            points.update((start, end))
+        self.bounds = np.array(sorted(p for p in points if 0 <= p <= self.DAY_MINUTES), dtype=np.int64)
+        self.starts = self.bounds[:-1]
+        self.weights = np.diff(self.bounds)
+
+        self.cover = np.zeros((len(shift_index), len(self.starts)), dtype=bool)
+        for sid, segments in enumerate(shift_index.segments):
+            for start, end in segments:
+                self.cover[sid] |= self.window(start, end)
+        self.rise = np.zeros_like(self.cover)
+        self.rise[:, 1:] = self.cover[:, 1:] & ~self.cover[:, :-1]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def window(self, start, end):
+        """[start, end) 涵蓋的時段遮罩 (end <= start 視為空)"""
+        return (self.starts >= start) & (self.starts < end)
+
+
+class EmployeeIndex:
+    """
+    員工編譯索引 (Compiled Employee Model)
+
+    建構後不可變動。每位員工有一個整數 id (依設定順序，重複姓名以第一筆為準)，
+    角色、可上班別、可上班星期都壓成整數位元遮罩 (bitmask)，
+    讓角色與資格檢查變成一次 AND 運算，而不是線性搜尋員工列表。
+
+    :param employees_config: 員工設定列表 (List[Dict])
+    :param shift_index: ShiftIndex (選填) - 提供時才建立班別資格遮罩
+    """
+    GENERAL_ROLE = "一般員工"
+
+    def __init__(self, employees_config, shift_index=None):
+        names = []
+        records = []
+        id_of = {}
+        for emp in employees_config:
+            if emp['name'] in id_of:
+                continue
+            id_of[emp['name']] = len(names)
+            names.append(emp['name'])
+            records.append(emp)
+
+        role_ids = {}
+        for emp in records:
+            for role in emp.get('roles', []):
+                if role not in role_ids:
+                    role_ids[role] = len(role_ids)
+
+        role_mask = []
+        shift_mask = []
+        weekday_mask = []
+        is_special = []
+        for emp in records:
+            r_mask = 0
+            for role in emp.get('roles', []):
+                r_mask |= 1 << role_ids[role]
+            s_mask = 0
+            if shift_index is not None:
+                for shift_name in emp.get('allowed_shifts', []):
+                    sid = shift_index.id_of.get(shift_name)
+                    if sid is not None:
+                        s_mask |= 1 << sid
+            w_mask = 0
+            for wd in emp.get('available_weekdays', list(range(7))):
+                w_mask |= 1 << wd
+            role_mask.append(r_mask)
+            shift_mask.append(s_mask)
+            weekday_mask.append(w_mask)
+            # 持有非 '一般員工' 的角色視為特殊 (例如組長)
+            is_special.append(any(r != self.GENERAL_ROLE for r in emp.get('roles', [])))
+
+        self.names = tuple(names)
+        self.records = tuple(records)
+        self.id_of = id_of
+        self.role_ids = role_ids
+        self.role_mask = tuple(role_mask)
+        self.shift_mask = tuple(shift_mask)
+        self.weekday_mask = tuple(weekday_mask)
+        self.is_special = tuple(is_special)
+
+        # 向量化用的陣列形式
+        n_emp = len(names)
+        self.special_mask = np.array(is_special, dtype=bool)
+        # role_matrix[e, r]: 員工 e 是否持有角色 r
+        self.role_matrix = np.array(
+            [[bool(m >> r & 1) for r in range(len(role_ids))] for m in role_mask], dtype=bool
+        ).reshape(n_emp, len(role_ids))
+        # 靜態資格張量 eligibility[e, s, weekday]: 可上班別 s 且該星期可上班
+        n_shift = len(shift_index) if shift_index is not None else 0
+        shift_ok = np.array([[bool(m >> s & 1) for s in range(n_shift)] for m in shift_mask], dtype=bool).reshape(n_emp, n_shift)
+        weekday_ok = np.array([[bool(m >> d & 1) for d in range(7)] for m in weekday_mask], dtype=bool).reshape(n_emp, 7)
+        self.eligibility = shift_ok[:, :, None] & weekday_ok[:, None, :]
+
+        # 等價類別: 角色、可上班別、可上班星期完全相同的員工可以互換 (只差在各自的排班紀錄)
+        # class_of[e] = 類別 id (依第一次出現的順序)，classes[k] = 類別 k 的員工 id 陣列
+        signatures = {}
+        class_of = [signatures.setdefault(sig, len(signatures)) for sig in zip(role_mask, shift_mask, weekday_mask)]
+        self.class_of = np.array(class_of, dtype=np.int64)
+        self.classes = tuple(np.flatnonzero(self.class_of == k) for k in range(len(signatures)))
+
+    def role_column(self, roles):
+        """持有任一指定角色的員工遮罩 (np.ndarray[bool])"""
+        ids = [self.role_ids[r] for r in roles if r in self.role_ids]
+        if not ids:
+            return np.zeros(len(self.names), dtype=bool)
+        return self.role_matrix[:, ids].any(axis=1)
+
+    def __len__(self):
+        return len(self.names)
+
+    def roles_bits(self, roles):
+        """角色列表 -> 位元遮罩 (沒有人持有的角色為 0)"""
+        bits = 0
+        for role in roles:
+            if role in self.role_ids:
+                bits |= 1 << self.role_ids[role]
+        return bits
+
+    def has_role(self, emp_name, role):
+        eid = self.id_of.get(emp_name)
+        return eid is not None and bool(self.role_mask[eid] & self.roles_bits((role,)))
+
+    def has_any_role(self, emp_name, roles):
+        eid = self.id_of.get(emp_name)
+        return eid is not None and bool(self.role_mask[eid] & self.roles_bits(roles))
+
+    def works_weekday(self, emp_name, weekday):
+        eid = self.id_of.get(emp_name)
+        return eid is not None and bool(self.weekday_mask[eid] >> weekday & 1)
+
+    def can_work_shift(self, emp_name, sid):
+        eid = self.id_of.get(emp_name)
+        return eid is not None and sid is not None and bool(self.shift_mask[eid] >> sid & 1)
+
+
+class CoverageIndex:
+    """
+    覆蓋規則編譯索引 (Compiled Coverage Validator)
+
+    建構時把所有覆蓋規則與營業時段 (每小時一格) 編譯成「時段 x 班別」重疊矩陣，
+    之後驗證某一天只需要:
+      1. 由 assignment 的一列算出當天的覆蓋輪廓 (每個班別的人數、每個角色在各班別的人數)
+      2. 每條規則 / 每個營業時段的人數與角色 = 一次矩陣乘法 (range query)
+
+    規則的計算方式與原本的時間軸掃描相同: 只要班別任何一段與時段重疊就算一人
+    (每人每天最多一班，因此依班別加總就是不重複人數)。
+
+    violations() 回傳結構化的違規紀錄 (List[Dict])，每筆包含:
+      - type: "coverage" (人數不足) / "max_people" (人數超標) / "role" (缺少角色) / "business_hours" (營業時段空窗)
+      - rule: 覆蓋規則的索引 (營業時段為 None)
+      - time_range / start / end: 時段字串與分鐘數
+      - actual / required: 實際人數與需求 (上限) 人數
+      - role: 缺少的角色 (其他類型為 None)
+      - critical: 是否為需要重試的關鍵違規 (人數超標只是警告)
+    """
+    CRITICAL_TYPES = ("coverage", "role", "business_hours")
+
+    def __init__(self, coverage_rules, business_hours, shift_index, employee_index):
+        self.shift_index = shift_index
+        self.employee_index = employee_index
+
+        # 1. 覆蓋規則 (解析失敗的規則略過)
+        self.rules = []
+        for i, rule in enumerate(coverage_rules or []):
+            try:
+                start, end = SchedulerLogic._parse_time_range(rule["time_range"])
+                min_required = rule["min_people"]
+            except:
+                continue
+            if not SchedulerLogic._is_headcount(min_required):
+                continue
+            required_roles = rule.get("required_roles", [])
+            # 兼容舊版單一角色欄位
+            if not required_roles and rule.get("required_role"):
+                required_roles = [rule.get("required_role")]
+            self.rules.append({
+                "rule": i,
+                "time_range": rule["time_range"],
+                "start": start,
+                "end": end,
+                "min": min_required,
+                "max": rule.get("max_people"),
+                "roles": [r for r in required_roles if r],
+            })
+
+        # 2. 營業時段: 每個小時一個時段
+        self.hours = []
+        if (business_hours or {}).get("enforce_coverage", False):
+            try:
+                biz_start = SchedulerLogic._parse_time(business_hours["start"])
+                biz_end = SchedulerLogic._parse_time(business_hours["end"])
+            except:
+                biz_start = biz_end = 0
+            current_hour = biz_start
+            while current_hour < biz_end:
+                hour_end = min(current_hour + 60, biz_end)
+                self.hours.append((current_hour, hour_end, f"{current_hour//60:02d}:00-{hour_end//60:02d}:00"))
+                current_hour += 60
+
+        # 3. 時段 x 班別重疊矩陣 (規則在前、營業時段在後)
+        windows = [(r["start"], r["end"]) for r in self.rules] + [(s, e) for s, e, _ in self.hours]
+        self.overlap = np.array(
+            [[shift_index.overlaps(sid, start, end) for sid in range(len(shift_index))] for start, end in windows],
+            dtype=np.int64,
+        ).reshape(len(windows), len(shift_index))
+
+        # 4. 罰分 (penalty) 用的陣列: 人數下限 / 上限、每個 (規則, 角色) 檢查
+        self.rule_min = np.array([r["min"] for r in self.rules], dtype=float)
+        self.rule_max = np.array([r["max"] or 0 for r in self.rules], dtype=float)
+        checks = [(k, employee_index.role_ids.get(role, -1)) for k, r in enumerate(self.rules) for role in r["roles"]]
+        self.check_rule = np.array([k for k, _ in checks], dtype=np.int64)
+        self.check_role = np.array([r for _, r in checks], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.rules) + len(self.hours)
+
+    def penalty(self, shift_counts, role_counts):
+        """
+        由覆蓋輪廓直接算出罰分 (不產生違規紀錄，供搜尋時的差量評估使用)
+        回傳: (deficit, excess)
+              deficit: 人數不足的差額 + 缺少的角色數 + 營業時段空窗小時數 (= 關鍵違規的缺口)
+              excess: 超過 max_people 的人數
+        """
+        if not len(self):
+            return 0.0, 0.0
+        n_rules = len(self.rules)
+        headcount = self.overlap @ shift_counts
+        deficit = np.maximum(self.rule_min - headcount[:n_rules], 0).sum() + np.count_nonzero(headcount[n_rules:] == 0)
+        if len(self.check_rule):
+            held = role_counts[:, np.maximum(self.check_role, 0)]
+            present = np.einsum("js,sj->j", self.overlap[self.check_rule], held) > 0
+            deficit += np.count_nonzero(~present | (self.check_role < 0))
+        excess = np.maximum(headcount[:n_rules] - self.rule_max, 0)[self.rule_max > 0].sum()
+        return float(deficit), float(excess)
+
+    def profile(self, row):
+        """
+        當天的覆蓋輪廓
+        回傳: (shift_counts[S], role_counts[S x R]) - 每個班別的人數、每個班別中持有各角色的人數
+        """
+        n_shift = len(self.shift_index)
+        assigned = np.flatnonzero(row >= 0)
+        sids = row[assigned].astype(np.int64)
+        shift_counts = np.bincount(sids, minlength=n_shift)
+        role_counts = np.zeros((n_shift, len(self.employee_index.role_ids)), dtype=np.int64)
+        np.add.at(role_counts, sids, self.employee_index.role_matrix[assigned])
+        return shift_counts, role_counts
+
+    def violations(self, row):
+        """驗證一天的排班 (assignment 的一列)，回傳結構化違規紀錄"""
+        if not len(self):
+            return []
+        shift_counts, role_counts = self.profile(row)
+        headcount = self.overlap @ shift_counts
+        role_present = (self.overlap @ role_counts) > 0
+        role_ids = self.employee_index.role_ids
+
+        result = []
+        for k, rule in enumerate(self.rules):
+            actual = int(headcount[k])
+            if actual < rule["min"]:
+                result.append(self._record("coverage", rule, actual, rule["min"]))
+            if rule["max"] and actual > rule["max"]:
+                result.append(self._record("max_people", rule, actual, rule["max"]))
+            for role in rule["roles"]:
+                if role not in role_ids or not role_present[k, role_ids[role]]:
+                    result.append(self._record("role", rule, actual, None, role))
+
+        offset = len(self.rules)
+        for k, (start, end, label) in enumerate(self.hours):
+            if headcount[offset + k] == 0:
+                result.append({
+                    "type": "business_hours", "rule": None, "time_range": label, "start": start, "end": end,
+                    "actual": 0, "required": 1, "role": None, "critical": True,
+                })
+        return result
+
+    def _record(self, kind, rule, actual, required, role=None):
+        return {
+            "type": kind, "rule": rule["rule"], "time_range": rule["time_range"],
+            "start": rule["start"], "end": rule["end"], "actual": actual, "required": required,
+            "role": role, "critical": kind in self.CRITICAL_TYPES,
+        }
+
+
+class ScheduleSearch:
+    """
+    整月搜尋狀態 (Month-level Search State)
+
+    給局部搜尋 / 大鄰域搜尋使用: 快取每天的覆蓋輪廓 (每班人數、每班角色人數) 與罰分、
+    每位員工的工時，讓一次變更 (幾個 (day, eid) 格子) 只需要重算受影響的日子與員工，
+    不必重新驗證整個月。所有寫入經過 SchedulerLogic._set_assignment，計數器保持一致。
+
+    目標分數與 SchedulerLogic._schedule_objective 相同 (不含重試次數)。
+    """
+    def __init__(self, scheduler):
+        self.sched = scheduler
+        self.max_consecutive = scheduler.MAX_CONSECUTIVE_DAYS
+        self.cov = scheduler.coverage_index
+        self.shift_index = scheduler.shift_index
+        self.eligibility = scheduler.employee_index.eligibility
+        self.weights = scheduler.OBJECTIVE_WEIGHTS
+        self.min_rest = scheduler.min_rest_hours * 60
+        self.max_daily_staff = scheduler.daily_limits.get('max_staff_per_day', 50)
+        self.enforce_daily_limit = scheduler.daily_limits.get('enforce_limit', True)
+        self.min_minutes = scheduler.daily_limits.get('min_monthly_hours', 0) * 60
+        # 休息間隔檢查要往前 / 往後看幾天 (門檻 <= 24 小時時只需要看相鄰的日子)
+        self.rest_lookaround = int(np.ceil(self.min_rest / (24 * 60))) + 1
+
+        n_days = scheduler.num_days
+        self.day_shift_counts = np.zeros((n_days, len(self.shift_index)), dtype=np.int64)
+        self.day_role_counts = np.zeros((n_days, len(self.shift_index), len(scheduler.employee_index.role_ids)), dtype=np.int64)
+        self.day_deficit = np.zeros(n_days)
+        self.day_excess = np.zeros(n_days)
+        for day in range(n_days):
+            self._refresh_day(day)
+
+        # 公平性: 可排班員工工時的總和與平方和 (標準差可 O(1) 更新)
+        self.schedulable = self.eligibility.any(axis=(1, 2))
+        hours = scheduler.minutes_worked / 60.0
+        self.n_schedulable = max(1, int(self.schedulable.sum()))
+        self.sum_hours = float(hours[self.schedulable].sum())
+        self.sum_sq_hours = float((hours[self.schedulable] ** 2).sum())
+        self.min_hours_deficit = self._hours_deficit(scheduler.minutes_worked).sum()
+
+    def _refresh_day(self, day):
+        counts, roles = self.cov.profile(self.sched.assignment[day])
+        self.day_shift_counts[day] = counts
+        self.day_role_counts[day] = roles
+        self.day_deficit[day], self.day_excess[day] = self.cov.penalty(counts, roles)
+
+    def _hours_deficit(self, minutes):
+        if self.min_minutes <= 0:
+            return np.zeros(np.shape(minutes))
+        return np.maximum(self.min_minutes - np.asarray(minutes), 0) / 60.0
+
+    def objective(self, weights=None):
+        """目前的目標分數 (越小越好)；weights 預設為 SchedulerLogic.OBJECTIVE_WEIGHTS"""
+        weights = weights or self.weights
+        mean = self.sum_hours / self.n_schedulable
+        spread = np.sqrt(max(self.sum_sq_hours / self.n_schedulable - mean * mean, 0.0))
+        return (weights["coverage_deficit"] * self.day_deficit.sum()
+                + weights["min_hours_deficit"] * self.min_hours_deficit
+                + weights["fairness_spread"] * spread)
+
+    def feasible(self, eid, day, sid, column=None):
+        """
+        員工 eid 在第 day 天上班別 sid 是否符合硬性規則 (與 _is_available 相同):
+        星期 / 班別資格、不可排班的格子、前後的休息間隔、連續上班不超過 MAX_CONSECUTIVE_DAYS 天。
+        column 為該員工 (變更後) 的整月班別，預設為目前的 assignment。
+        """
+        sched = self.sched
+        if not self.eligibility[eid, sid, sched.weekdays[day]] or sched.blocked[day, eid]:
+            return False
+        if column is None:
+            column = sched.assignment[:, eid]
+        n_days = len(column)
+        
+        # 休息間隔: 前一個 / 後一個上班日 (本期之前沒有上班時看上一期的最後一班)
+        found = False
+        for prev in range(day - 1, max(-1, day - 1 - self.rest_lookaround), -1):
+            if column[prev] >= 0:
+                if self.shift_index.rest_matrix[column[prev], sid] + (day - prev - 1) * 24 * 60 < self.min_rest:
+                    return False
+                found = True
+                break
+        prior_shift = sched.prior_last_shift[eid]
+        if not found and prior_shift >= 0 and not (column[:day] >= 0).any():
+            prior_day = int(sched.prior_last_day[eid])
+            if self.shift_index.rest_matrix[prior_shift, sid] + (day - prior_day - 1) * 24 * 60 < self.min_rest:
+                return False
+        for nxt in range(day + 1, min(n_days, day + 1 + self.rest_lookaround)):
+            if column[nxt] >= 0:
+                if self.shift_index.rest_matrix[sid, column[nxt]] + (nxt - day - 1) * 24 * 60 < self.min_rest:
+                    return False
+                break
+        
+        # 連續上班天數 (含這天)
+        run = 1
+        prev = day - 1
+        while prev >= 0 and column[prev] >= 0 and run <= self.max_consecutive:
+            run += 1
+            prev -= 1
+        if prev < 0:
+            run += sched._prior_run(eid)
+        nxt = day + 1
+        while nxt < n_days and column[nxt] >= 0 and run <= self.max_consecutive:
+            run += 1
+            nxt += 1
+        return run <= self.max_consecutive
+
+    def can_staff(self, day, sid, added=1):
+        """第 day 天再加 added 人上 sid 是否仍符合每日人數上限與班別人數上限"""
+        if self.day_shift_counts[day, sid] + added > self.shift_index.headcount_cap[sid]:
+            return False
+        if self.enforce_daily_limit and self.day_shift_counts[day].sum() + added > self.max_daily_staff:
+            return False
+        return True
+
+    def apply(self, changes):
+        """
+        套用變更 [(day, eid, sid), ...] (sid = -1 為休息)，更新快取
+        回傳: 還原用的變更列表 (再呼叫 apply 即可還原)
+        """
+        sched = self.sched
+        undo = []
+        days = set()
+        for day, eid, sid in changes:
+            old = int(sched.assignment[day, eid])
+            if old == sid:
+                continue
+            undo.append((day, eid, old))
+            days.add(day)
+            before = sched.minutes_worked[eid]
+            sched._set_assignment(day, eid, sid)
+            after = sched.minutes_worked[eid]
+            if self.schedulable[eid]:
+                self.sum_hours += (after - before) / 60.0
+                self.sum_sq_hours += (after / 60.0) ** 2 - (before / 60.0) ** 2
+            if self.min_minutes > 0:
+                self.min_hours_deficit += float(self._hours_deficit(after) - self._hours_deficit(before))
+        for day in days:
+            self._refresh_day(day)
+        undo.reverse()
+        return undo
+
+
 class SchedulerLogic:
-    def __init__(self, year, month, employees_config, shifts_config, coverage_rules=None, daily_limits=None, business_hours=None):
+    def __init__(self, year, month, employees_config, shifts_config, coverage_rules=None, daily_limits=None, business_hours=None, holidays=None,
+                 start_date=None, end_date=None, prior_state=None, unavailable=None, class_matching=False):
         """
         排班邏輯核心類別 (Scheduler Core Logic)
 
@@ -20,34 +604,375 @@ class SchedulerLogic:
                範例: {"max_staff_per_day": 8, "enforce_limit": True}
         :param business_hours: 營業時段設定 (Dict)
                範例: {"start": "07:00", "end": "21:30", "enforce_coverage": True}
+        :param holidays: 國定假日列表 (List[date | "YYYY-MM-DD"]，選填) - 假日與週末一樣計入週末班數
+        :param start_date / end_date: 排班區間 (date | "YYYY-MM-DD"，選填) - 指定時取代 year/month 的整月，
+               可以是任意天數 (一週、一季...)；end_date 預設為 start_date 當月最後一天
+        :param prior_state: 上一期排班的狀態快照 (Dict，選填，見 export_state) - 連續上班天數、
+               最後一班與累積工時延續到這一期，跨期的連續上班與休息間隔一樣會檢查
+        :param unavailable: 不可排班的格子 (List[Dict]，選填)，格式同 replan 的請假事件
+               範例: [{"person": "Jun", "date": "2026-01-05", "end_date": "2026-01-07"}]
+               (多據點排班用來保留共用員工在其他據點的日子)
+        :param class_matching: 大型、同質的人力改用類別層級的骨架匹配 (_match_by_class，選填，預設關閉) -
+               速度快很多，但公平性只是近似，目標分數可能比逐人匹配差
         """
+        if start_date is not None:
+            start = self._to_date(start_date)
+            end = self._to_date(end_date) if end_date is not None else date(start.year, start.month, calendar.monthrange(start.year, start.month)[1])
+            if end < start:
+                raise ValueError(f"end_date {end} 早於 start_date {start}")
+            self.dates = [start + timedelta(days=k) for k in range((end - start).days + 1)]
+            year, month = start.year, start.month
+        else:
+            self.dates = [date(year, month, d) for d in range(1, calendar.monthrange(year, month)[1] + 1)]
         self.year = year
         self.month = month
+        self.start_date = start_date
+        self.end_date = end_date
+        self.holidays = list(holidays or [])
         self.employees = employees_config
         self.shifts = shifts_config
         self.coverage_rules = coverage_rules or []
         self.daily_limits = daily_limits or {"max_staff_per_day": 999, "enforce_limit": False}
         self.business_hours = business_hours or {"start": "07:00", "end": "21:30", "enforce_coverage": False}
-        self.num_days = calendar.monthrange(year, month)[1]
-        self.dates = [date(year, month, d) for d in range(1, self.num_days + 1)]
-        
-        # 追蹤排班狀態 (Tracking state)
-        # 結構: schedule[date_str][shift_name] = [employee_name1, employee_name2]
-        self.schedule = {d.strftime("%Y-%m-%d"): {s: [] for s in self.shifts} for d in self.dates}
-        
-        # 追蹤員工歷史紀錄 (用於驗證連續上班等規則)
-        # worked_days: 已經上班的日期集合
-        # consecutive_days: 當前連續上班天數
-        # last_shift_end_minutes: 最後一次下班時間（分鐘數，用於檢查休息時間）
-        self.history = {
-            emp['name']: {
-                "consecutive_days": 0, 
-                "last_shift_end": 0, 
-                "worked_days": set(),
-                "last_shift_end_minutes": None,  # NEW: 防止花花班
-                "weekend_count": 0 # 週末班計數 (公平性)
-            } 
-            for emp in self.employees
+        self.num_days = len(self.dates)
+
+        # 編譯班別時間 (只在建構時解析一次字串)
+        self.shift_index = ShiftIndex(self.shifts)
+        # 編譯員工資格 (角色 / 班別 / 星期 位元遮罩)
+        self.employee_index = EmployeeIndex(self.employees, self.shift_index)
+        # 編譯覆蓋規則與營業時段 (驗證時只做矩陣查詢)
+        self.coverage_index = CoverageIndex(self.coverage_rules, self.business_hours, self.shift_index, self.employee_index)
+        # 需求時段 (營業時段 + 覆蓋規則) 與基本時段切割
+        self.demand_windows = self._parse_demand_windows()
+        self.interval_grid = IntervalGrid(self.shift_index, [(w[0], w[1]) for w in self.demand_windows])
+        
+        # 日期索引: 引擎內部一律使用整數 day (第幾天)，ISO 日期字串只在輸出時使用
+        self.date_strs = [d.isoformat() for d in self.dates]
+        self.day_of = {d: i for i, d in enumerate(self.dates)}
+        self.day_of_str = {d_str: i for i, d_str in enumerate(self.date_strs)}
+        # 每天的星期 (0=週一)、週末、假日向量
+        self.weekdays = np.array([d.weekday() for d in self.dates], dtype=np.int64)
+        self.is_weekend = self.weekdays >= 5
+        holiday_strs = {h if isinstance(h, str) else h.isoformat() for h in (holidays or [])}
+        self.is_holiday = np.array([d_str in holiday_strs for d_str in self.date_strs], dtype=bool)
+        # 計入週末班數 (公平性) 的日子: 週末或假日
+        self.is_weekend_or_holiday = self.is_weekend | self.is_holiday
+        
+        # 上一期延續的狀態 (連續上班、最後一班、累積工時)
+        self._apply_prior_state(prior_state)
+        
+        # 不可排班的格子: blocked[day, employee_id] = True
+        self.unavailable = list(unavailable or [])
+        self.blocked = np.zeros((self.num_days, len(self.employee_index)), dtype=bool)
+        for day, eid in self._event_cells(self.unavailable):
+            self.blocked[day, eid] = True
+        
+        self.class_matching = class_matching
+        
+        # 追蹤排班狀態 (Canonical state)
+        # 結構: assignment[day, employee_id] = shift_id，-1 = 休息
+        # 已上班天數、連續上班、週末班數、工時等都由這個矩陣推導 (見 _employee_stats)
+        # 舊的 schedule[date_str][shift_name] = [names] 結構只在輸出時產生 (見 schedule 屬性)
+        self._reset_state()
+        
+        # 私有亂數產生器與員工排列 (employee_order[k] = 第 k 順位的員工 id，見 _seed_rng)
+        self._seed_rng(None)
+        
+        # 骨架快取: 需求簽章 -> (skeleton, 建構日誌)，跨日、跨重試共用
+        self._skeleton_cache = {}
+        self.skeleton_cache_stats = {"hits": 0, "misses": 0}
+        # 班別支配分析: 需求時段 (遮罩) -> 支配矩陣，跨日共用 (見 _shift_dominance)
+        self._dominance_cache = {}
+        self.dominance_stats = {"profiles": 0, "dominated_pairs": 0, "uncovered_shifts": 0, "scored": 0, "skipped": 0}
+
+    @property
+    def schedule(self):
+        """
+        輸出用的班表字典 (由 assignment 矩陣產生)
+        結構: schedule[date_str][shift_name] = [employee_name1, employee_name2]
+        """
+        return {d_str: self._day_schedule(i) for i, d_str in enumerate(self.date_strs)}
+
+    def _day_schedule(self, day):
+        """單日班表字典 {shift_name: [names]}"""
+        day_schedule = {s: [] for s in self.shifts}
+        row = self.assignment[day]
+        for eid in np.flatnonzero(row >= 0):
+            day_schedule[self.shift_index.names[row[eid]]].append(self.employee_index.names[eid])
+        return day_schedule
+
+    def _seed_rng(self, seed):
+        """
+        建立私有亂數產生器 (不影響全域 random 模組)，並把員工排列重設為設定順序
+        - rng: random.Random，用於打亂員工排列
+        - np_rng: numpy Generator，供向量化的隨機搜尋使用
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.employee_order = list(range(len(self.employee_index)))
+
+    # 排班狀態: assignment 矩陣與增量計數器 (重試前快照、失敗時還原)
+    STATE_ARRAYS = ("assignment", "shift_counts", "days_worked", "weekend_count", "minutes_worked",
+                    "last_day", "last_shift", "streak")
+
+    def _snapshot_state(self):
+        """複製排班狀態 (整月只有幾個小型 NumPy 陣列，複製比逐筆記錄變更便宜)"""
+        return [getattr(self, name).copy() for name in self.STATE_ARRAYS]
+
+    def _restore_state(self, snapshot):
+        """還原 _snapshot_state 的快照 (原地複製，既有的陣列參照仍然有效)"""
+        for name, saved in zip(self.STATE_ARRAYS, snapshot):
+            np.copyto(getattr(self, name), saved)
+
+    def _reset_state(self):
+        """清空排班狀態: assignment 矩陣與每位員工的增量計數器"""
+        n_emp = len(self.employee_index)
+        self.assignment = np.full((self.num_days, n_emp), -1, dtype=np.int16)
+        
+        # 增量計數器 (由 _set_assignment 維護，重試時與 assignment 一起還原，見 STATE_ARRAYS)
+        self.shift_counts = np.zeros((n_emp, len(self.shift_index)), dtype=np.int32)  # 各班別次數
+        self.days_worked = np.zeros(n_emp, dtype=np.int32)
+        self.weekend_count = np.zeros(n_emp, dtype=np.int32)
+        self.minutes_worked = np.zeros(n_emp, dtype=np.int64)
+        # 最後上班日 / 班別 / 連續天數從上一期的狀態開始 (上一期的日子是負的 day，-1 = 前一天)
+        self.last_day = self.prior_last_day.copy()       # 最後一天上班 (第幾天)
+        self.last_shift = self.prior_last_shift.copy()   # 最後一天上的班別
+        self.streak = self.prior_streak.copy()           # 到 last_day 為止的連續上班天數
+
+    @staticmethod
+    def _to_date(value):
+        """date 或 "YYYY-MM-DD" 字串 -> date"""
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+    def _apply_prior_state(self, prior_state):
+        """
+        載入上一期的狀態快照 (見 export_state)，轉成以本期第一天為 0 的陣列:
+        prior_last_day (負數，-1 = 本期前一天)、prior_last_shift (班別 id)、prior_streak、prior_minutes
+        """
+        n_emp = len(self.employee_index)
+        self.prior_state = prior_state
+        self.prior_last_day = np.full(n_emp, -1, dtype=np.int32)
+        self.prior_last_shift = np.full(n_emp, -1, dtype=np.int16)
+        self.prior_streak = np.zeros(n_emp, dtype=np.int32)
+        self.prior_minutes = np.zeros(n_emp, dtype=np.int64)
+        if not prior_state:
+            return
+        
+        # 快照結束日到本期第一天之間的天數 (1 = 緊接著)
+        gap = (self.dates[0] - self._to_date(prior_state["end_date"])).days
+        if gap < 1:
+            raise ValueError(f"prior_state 的結束日 {prior_state['end_date']} 必須早於排班起始日 {self.dates[0]}")
+        for name, entry in prior_state.get("employees", {}).items():
+            eid = self.employee_index.id_of.get(name)
+            if eid is None:
+                continue
+            self.prior_minutes[eid] = entry.get("minutes_to_date", 0)
+            sid = self.shift_index.id_of.get(entry.get("last_shift"), -1)
+            if entry.get("last_offset") is None or sid < 0:
+                continue
+            self.prior_last_day[eid] = -(gap + entry["last_offset"])
+            self.prior_last_shift[eid] = sid
+            self.prior_streak[eid] = entry.get("streak", 0)
+
+    def _event_cells(self, events, log=None):
+        """
+        事件列表 [{"person", "date", "end_date" (選填)}, ...] -> 格子集合 {(day, eid), ...}
+        日期區間外的日子略過；不認識的人略過 (有 log 時記錄)
+        """
+        cells = set()
+        for event in events:
+            eid = self.employee_index.id_of.get(event["person"])
+            if eid is None:
+                if log is not None:
+                    log.append(f"⚠️ 找不到員工 {event['person']}，略過")
+                continue
+            first = self._to_date(event["date"])
+            last = self._to_date(event.get("end_date") or event["date"])
+            for k in range((last - first).days + 1):
+                day = self.day_of.get(first + timedelta(days=k))
+                if day is not None:
+                    cells.add((day, eid))
+        return cells
+
+    def _prior_run(self, eid):
+        """上一期延續到本期第一天的連續上班天數"""
+        return int(self.prior_streak[eid]) if self.prior_last_day[eid] == -1 else 0
+
+    def export_state(self):
+        """
+        本期結束時的狀態快照 (可直接轉 JSON)，傳給下一期的 prior_state 即可接續排班
+        格式: {"end_date": "YYYY-MM-DD",
+               "employees": {name: {"streak": 連續上班天數 (到最後上班日為止),
+                                    "last_offset": 最後上班日距離 end_date 幾天 (0 = 當天有上班，None = 無紀錄),
+                                    "last_shift": 最後上的班別, "minutes_to_date": 累積工時 (分，含之前各期)}}}
+        沒有任何紀錄的員工不列入
+        """
+        employees = {}
+        for eid, name in enumerate(self.employee_index.names):
+            minutes = int(self.prior_minutes[eid] + self.minutes_worked[eid])
+            sid = int(self.last_shift[eid])
+            if sid < 0 and not minutes:
+                continue
+            entry = {"streak": 0, "last_offset": None, "last_shift": None, "minutes_to_date": minutes}
+            if sid >= 0:
+                entry.update(streak=int(self.streak[eid]), last_offset=int(self.num_days - 1 - self.last_day[eid]),
+                             last_shift=self.shift_index.names[sid])
+            employees[name] = entry
+        return {"end_date": self.date_strs[-1], "employees": employees}
+
+    @classmethod
+    def rolling_horizon(cls, periods, employees_config, shifts_config, coverage_rules=None, daily_limits=None,
+                        business_hours=None, holidays=None, prior_state=None, **generate_kwargs):
+        """
+        滾動排班 (Rolling Horizon): 依序排每一期，每期只求解自己的日期，
+        上一期的狀態快照 (export_state) 帶進下一期，已發布的期間不會重新求解
+
+        :param periods: [(start_date, end_date), ...] 依時間順序、不重疊 (例如每週、每月)
+        :param prior_state: 第一期之前的狀態快照 (選填)
+        :param generate_kwargs: 傳給每一期 generate() 的參數 (seed、max_retries、time_budget_s ...)
+        回傳: (results, state) - results = [(scheduler, schedule, log), ...]；state = 最後一期的快照
+        """
+        results = []
+        state = prior_state
+        for start_date, end_date in periods:
+            scheduler = cls(None, None, employees_config, shifts_config, coverage_rules, daily_limits, business_hours,
+                            holidays, start_date=start_date, end_date=end_date, prior_state=state)
+            schedule, log = scheduler.generate(**generate_kwargs)
+            state = scheduler.export_state()
+            results.append((scheduler, schedule, log))
+        return results, state
+
+    def _set_assignment(self, day, eid, sid):
+        """
+        設定 assignment[day, eid] = sid (-1 = 休息)，並以 O(1) 更新計數器
+        (依日期順序排班時)。
+        """
+        old = int(self.assignment[day, eid])
+        if old == sid:
+            return
+        minutes = self.shift_index.minutes_arr
+        weekend = bool(self.is_weekend_or_holiday[day])
+        
+        self.assignment[day, eid] = sid
+        if old >= 0:
+            self.shift_counts[eid, old] -= 1
+            self.days_worked[eid] -= 1
+            self.minutes_worked[eid] -= minutes[old]
+            if weekend:
+                self.weekend_count[eid] -= 1
+        if sid >= 0:
+            self.shift_counts[eid, sid] += 1
+            self.days_worked[eid] += 1
+            self.minutes_worked[eid] += minutes[sid]
+            if weekend:
+                self.weekend_count[eid] += 1
+        
+        last_day = self.last_day[eid]
+        if sid >= 0 and day > last_day:
+            # 一般情況 (逐日往後排): 延長或重新開始連續區段
+            self.streak[eid] = self.streak[eid] + 1 if last_day == day - 1 else 1
+            self.last_day[eid] = day
+            self.last_shift[eid] = sid
+        elif sid >= 0 and old >= 0:
+            # 同一天換班
+            if day == last_day:
+                self.last_shift[eid] = sid
+        else:
+            # 非依序的寫入 (移除或補排較早的日期): 由該員工的欄位重新計算
+            column = self.assignment[:, eid] >= 0
+            worked_days = np.flatnonzero(column)
+            if len(worked_days):
+                last = int(worked_days[-1])
+                rest_days = np.flatnonzero(~column[:last])
+                streak = last - int(rest_days[-1]) if len(rest_days) else last + 1 + self._prior_run(eid)
+                self.last_day[eid] = last
+                self.last_shift[eid] = self.assignment[last, eid]
+                self.streak[eid] = streak
+            else:
+                self.last_day[eid] = self.prior_last_day[eid]
+                self.last_shift[eid] = self.prior_last_shift[eid]
+                self.streak[eid] = self.prior_streak[eid]
+
+    def _counter_stats(self, day):
+        """
+        由增量計數器取得所有員工在第 day 天的狀態 (O(員工數)，不掃描矩陣)
+        回傳格式同 _employee_stats
+        """
+        consecutive = np.where(self.last_day == day - 1, self.streak, 0)
+        last_day = self.last_day.copy()
+        last_shift = self.last_shift.copy()
+        
+        # 在 day 當天或之後已有排班的人 (非依序排班時) 改由矩陣推導
+        late = np.flatnonzero(self.last_day >= day)
+        if len(late):
+            derived = self._employee_stats(day, late)
+            consecutive[late] = derived["consecutive"]
+            last_day[late] = derived["last_day"]
+            last_shift[late] = derived["last_shift"]
+        
+        return {
+            "days_worked": self.days_worked,
+            "weekend_count": self.weekend_count,
+            "total_minutes": self.minutes_worked,
+            "consecutive": consecutive,
+            "last_day": last_day,
+            "last_shift": last_shift,
+        }
+
+    def _employee_state_before(self, eid, day):
+        """單一員工在第 day 天之前的 (連續上班天數, 最後上班日 or -1, 最後班別 id or -1)，O(1)"""
+        last_day = int(self.last_day[eid])
+        if last_day < day:
+            consecutive = int(self.streak[eid]) if last_day == day - 1 else 0
+            return consecutive, last_day, int(self.last_shift[eid])
+        derived = self._employee_stats(day, [eid])
+        return int(derived["consecutive"][0]), int(derived["last_day"][0]), int(derived["last_shift"][0])
+
+    def _rest_gaps(self, day, last_day, last_shift):
+        """第 day 天各班別距離上一班的休息分鐘數 (員工 x 班別)，由 rest_matrix 查表"""
+        return self.shift_index.rest_gaps(np.asarray(last_shift), day - np.asarray(last_day))
+
+    def _employee_stats(self, day, eids=None):
+        """
+        由 assignment 矩陣推導員工狀態 (向量化)
+
+        :param day: 第幾天 (連續上班、最後下班時間只看這天之前)
+        :param eids: 員工 id 列表 (預設為全部)
+        回傳: Dict[str, np.ndarray]
+              days_worked / weekend_count / total_minutes: 已排班天數、週末班數、累積工時(分)
+              consecutive: 到前一天為止的連續上班天數
+              last_day / last_shift: 這天之前最後一次上班的日期索引與班別 id
+                                     (本期沒有上班時沿用上一期的狀態，-1 / -1 = 無紀錄)
+        """
+        cols = slice(None) if eids is None else eids
+        a = self.assignment[:, cols]
+        worked = a >= 0
+        shift_ids = np.maximum(a, 0)
+        
+        # 上一期延續的連續上班天數 (只有上一期最後一天有上班才接得上)
+        prior_run = np.where(self.prior_last_day[cols] == -1, self.prior_streak[cols], 0).astype(np.int64)
+        consecutive = prior_run
+        last_day = self.prior_last_day[cols].astype(np.int64)
+        last_shift = self.prior_last_shift[cols].astype(np.int64)
+        if day:
+            # 由前一天往回數，第一個休息日之前都算連續
+            before = worked[:day][::-1]
+            consecutive = np.where(before.all(axis=0), day + prior_run, np.argmin(before, axis=0))
+            
+            # 最後一次上班的日期與班別
+            has_worked = before.any(axis=0)
+            last_row = day - 1 - np.argmax(before, axis=0)
+            last_day = np.where(has_worked, last_row, last_day)
+            last_shift = np.where(has_worked, a[last_row, np.arange(a.shape[1])], last_shift)
+        
+        return {
+            "days_worked": worked.sum(axis=0),
+            "weekend_count": (worked & self.is_weekend_or_holiday[:, None]).sum(axis=0),
+            "total_minutes": np.where(worked, self.shift_index.minutes_arr[shift_ids], 0).sum(axis=0),
+            "consecutive": consecutive,
+            "last_day": last_day,
+            "last_shift": last_shift,
         }
 
     @staticmethod
@@ -62,6 +987,11 @@ class SchedulerLogic:
         start, end = range_str.split('-')
         return SchedulerLogic._parse_time(start.strip()), SchedulerLogic._parse_time(end.strip())
 
+    @staticmethod
+    def _is_headcount(value):
+        """覆蓋規則的人數是否為數字 (JSON / Streamlit 的數字輸入可能是 2.0 這類浮點數)"""
+        return isinstance(value, (int, float, np.integer, np.floating))
+
     @staticmethod
     def _parse_shift_segments(time_str):
         """解析班別時間，支援多段式 (例如 '10:00-14:00, 17:00-21:00')"""
@@ -84,15 +1014,11 @@ class SchedulerLogic:
         例如: 如果早班是 08:00-16:00，而規則規定 10:00-12:00 必須有組長，則早班需要考慮組長。
         """
         required_roles = set()
-        if shift_name not in self.shifts:
-            return required_roles
-        shift_time = self.shifts[shift_name].get("time")
-        if not shift_time:
+        sid = self.shift_index.id_of.get(shift_name)
+        if sid is None or not self.shift_index.has_time[sid]:
             return required_roles
         
         try:
-            segments = self._parse_shift_segments(shift_time)
-            
             for rule in self.coverage_rules:
                 # 獲取角色列表
                 roles_to_check = rule.get("required_roles", [])
@@ -106,13 +1032,7 @@ class SchedulerLogic:
                 try:
                     r_start, r_end = self._parse_time_range(rule["time_range"])
                     # 檢查任何一段時間是否重疊
-                    is_overlap = False
-                    for s_start, s_end in segments:
-                        if s_start < r_end and s_end > r_start:
-                            is_overlap = True
-                            break
-                    
-                    if is_overlap:
+                    if self.shift_index.overlaps(sid, r_start, r_end):
                         for role in roles_to_check:
                             if role:
                                 required_roles.add(role)
@@ -129,7 +1049,7 @@ class SchedulerLogic:
         (用於計算還缺多少人)
         """
         count = 0
-        daily_schedule = self.schedule[date_str]
+        daily_schedule = self._day_schedule(self.day_of_str[date_str])
         
         # 檢查當天所有已安排的班別
         for s_name, assigned_emps in daily_schedule.items():
@@ -137,30 +1057,28 @@ class SchedulerLogic:
                 continue
                 
             # 檢查時間是否有重疊
-            if s_name not in self.shifts:
+            sid = self.shift_index.id_of.get(s_name)
+            if sid is None or not self.shift_index.has_time[sid]:
                 continue
-            s_time = self.shifts[s_name].get("time")
-            if not s_time: continue
             
-            try:
-                segments = self._parse_shift_segments(s_time)
-                # 檢查任何一段時間是否重疊
-                is_overlap = False
-                for s_start, s_end in segments:
-                    if s_start < end_time and s_end > start_time:
-                        is_overlap = True
-                        break
-                
-                if is_overlap:
-                    # 檢查被安排的人是否有該角色
-                    for emp_name in assigned_emps:
-                        emp = next((e for e in self.employees if e['name'] == emp_name), None)
-                        if emp and role in emp.get('roles', []):
-                            count += 1
-            except:
-                continue
+            if self.shift_index.overlaps(sid, start_time, end_time):
+                # 檢查被安排的人是否有該角色
+                for emp_name in assigned_emps:
+                    if self.employee_index.has_role(emp_name, role):
+                        count += 1
         return count
 
+    # 勞基法/連續上班限制 (7天內必須休1天): 最多連續上班天數
+    # 逐筆檢查、每日可用遮罩、局部搜尋與多據點協調都讀這個常數
+    MAX_CONSECUTIVE_DAYS = 6
+    # 前一班下班到下一班上班的最少休息時數 (daily_limits 沒有設定 min_rest_hours 時使用)
+    DEFAULT_MIN_REST_HOURS = 11
+
+    @property
+    def min_rest_hours(self):
+        """最少休息時數 (daily_limits['min_rest_hours']，預設 DEFAULT_MIN_REST_HOURS)"""
+        return self.daily_limits.get('min_rest_hours', self.DEFAULT_MIN_REST_HOURS)
+
     def _is_available(self, employee, current_date, shift_name):
         """
         核心限制檢查：檢查員工是否可以上這個班
@@ -168,159 +1086,141 @@ class SchedulerLogic:
         想要修改限制邏輯，請修改這裡！
         """
         emp_name = employee['name']
+        sid = self.shift_index.id_of.get(shift_name)
+        day = self.day_of[current_date]
         
         # 1. 星期幾檢查 (Day of Week Check) (0=週一, 6=週日)
-        weekday = current_date.weekday()
-        if weekday not in employee.get('available_weekdays', list(range(7))):
+        weekday = self.weekdays[day]
+        if not self.employee_index.works_weekday(emp_name, weekday):
             return False, "非可上班日 (Day of week mismatch)"
 
         # 2. 允許班別檢查 (Allowed Shift Type)
-        if shift_name not in employee.get('allowed_shifts', []):
+        if not self.employee_index.can_work_shift(emp_name, sid):
             return False, "不可上此班別 (Shift type not allowed)"
 
+        eid = self.employee_index.id_of[emp_name]
+        if self.blocked[day, eid]:
+            return False, "當日不可排班 (Unavailable)"
+        consecutive, last_day, last_shift = self._employee_state_before(eid, day)
+
         # 3. 勞基法/連續上班限制 (7天內必須休1天)
-        # 簡化版: 不能連續上班超過 6 天
-        if self.history[emp_name]["consecutive_days"] >= 6:
+        # 簡化版: 不能連續上班超過 MAX_CONSECUTIVE_DAYS 天
+        if consecutive >= self.MAX_CONSECUTIVE_DAYS:
             return False, "已達連續上班上限 (Max consecutive days reached)"
 
         # 4. 休息時間間隔檢查 (Rest Interval) - 防止花花班 (Clopening)
-        # 確保員工有至少 11 小時的休息時間
-        last_shift_end = self.history[emp_name].get("last_shift_end_minutes")
-        if last_shift_end is not None:
-            try:
-                shift_time = self.shifts[shift_name].get("time", "00:00-23:59")
-                segments = self._parse_shift_segments(shift_time)
-                if not segments:
-                     # Fallback
-                     shift_start_min = 0
-                else:
-                     # 取第一段的開始時間
-                     shift_start_min = segments[0][0]
-                
-                # 計算距離上次下班的時間
-                # 處理跨日情況：如果上次下班時間 > 今天上班時間，表示跨日了
-                if last_shift_end > shift_start_min:
-                    # 跨日：例如昨天 22:00 下班 (1320分)，今天 07:00 上班 (420分)
-                    # 休息時間 = (24*60 - 1320) + 420 = 180 + 420 = 600 分鐘 = 10 小時
-                    time_since_last = (24 * 60 - last_shift_end) + shift_start_min
-                else:
-                    # 同日或正常間隔
-                    time_since_last = shift_start_min - last_shift_end
-                
-                MIN_REST_HOURS = 11
-                MIN_REST_MINUTES = MIN_REST_HOURS * 60
-                
-                if time_since_last < MIN_REST_MINUTES:
-                    hours_rest = time_since_last / 60
-                    return False, f"休息時間不足 ({hours_rest:.1f}小時，需要{MIN_REST_HOURS}小時)"
-            except:
-                pass  # 如果解析失敗，跳過此檢查
+        # 確保上一班下班到這班上班之間有足夠的休息時間 (預設 11 小時，可由 daily_limits 設定)
+        # 例如昨天 22:00 下班，今天 07:00 上班 = 9 小時，休息間隔由班別 x 班別矩陣查表
+        min_rest_hours = self.min_rest_hours
+        if last_shift >= 0:
+            time_since_last = int(self.shift_index.rest_matrix[last_shift, sid]) + (day - last_day - 1) * 24 * 60
+            if time_since_last < min_rest_hours * 60:
+                hours_rest = time_since_last / 60
+                return False, f"休息時間不足 ({hours_rest:.1f}小時，需要{min_rest_hours}小時)"
         
         # 5. 當日是否已排班 (Already worked today?)
-        if current_date.strftime("%Y-%m-%d") in self.history[emp_name]["worked_days"]:
+        if self.assignment[day, eid] >= 0:
             return False, "當日已排班 (Already worked today)"
 
         return True, "OK"
 
-    def generate(self, max_retries=5):
+    def generate(self, max_retries=5, seed=None, n_starts=1, workers=None, time_budget_s=None):
         """
         執行排班算法 (Constraint-First with Per-Day Retry)
         每一天都必須成功排班，否則重試
+
+        :param seed: 隨機種子 (int，選填)。相同輸入 + 相同 seed 會得到完全相同的班表；
+                     未指定時以時間戳記產生 (每次不同)，實際使用的值記錄在 self.seed 與日誌
+        :param n_starts: 多起點次數 (選填)。> 1 時以 seed, seed+1, ... 各跑一次，保留目標分數最好的結果
+        :param workers: 多起點使用的行程數 (選填，預設為 CPU 核心數，1 = 不開行程池)
+        :param time_budget_s: 時間預算 (秒，選填)。指定時在預算內依序執行貪婪排班、多起點、
+                              局部搜尋與大鄰域搜尋，回傳目前最好的班表 (見 _generate_anytime)。
+                              與 n_starts 同時指定時以 time_budget_s 為主: n_starts 成為多起點階段
+                              至少要跑的次數 (含第一次貪婪排班，可能超過預算)，依序執行，不使用 workers
         回傳: (schedule, log)
         """
-        import random
         import time
         
-        # 使用時間戳記作為隨機種子，確保每次生成都不同
-        random.seed(int(time.time() * 1000) % 2**32)
+        if seed is None:
+            seed = int(time.time() * 1000) % 2**32
+        if time_budget_s is not None:
+            return self._generate_anytime(max_retries, seed, time_budget_s, min_starts=n_starts)
         
-        log = []
+        # 預先分析: 可證明無解的日子只排一次，不浪費重試
+        self.feasibility = self.analyze_feasibility()
+        infeasible = self.feasibility["days"]
         
-        # 重置排班狀態與歷史紀錄
-        self.schedule = {}
-        self.history = {
-            emp['name']: {
-                "worked_days": set(), 
-                "consecutive_days": 0,
-                "last_shift_end_minutes": None,
-                "total_hours": 0.0
-            } 
-            for emp in self.employees
-        }
+        if n_starts > 1:
+            return self._generate_multi_start(max_retries, seed, n_starts, workers)
+        self._seed_rng(seed)
+        retries_used = 0
+        repairs_used = 0
+        
+        log = [f"🎲 隨機種子 (seed): {seed}"]
         
-        # 初始隨機打亂員工順序（增加變化性）
-        random.shuffle(self.employees)
+        # 重置排班狀態 (assignment 矩陣與計數器)
+        self._reset_state()
         
-        # 逐日排班
-        for current_date in self.dates:
-            date_str = current_date.strftime("%Y-%m-%d")
+        # 初始隨機打亂員工順序（增加變化性）- 只打亂排列索引，不改動傳入的員工列表
+        self.rng.shuffle(self.employee_order)
+        
+        # 逐日排班 (整數 day，日期字串只用在日誌)
+        for day in range(self.num_days):
+            date_str = self.date_strs[day]
             day_success = False
+            day_issues = infeasible.get(date_str)
+            attempts = 1 if day_issues else max_retries
+            if day_issues:
+                log.append(f"⛔ {date_str} 預先分析: 無法同時滿足所有規則，不重試")
+            
+            # 本日開始前的狀態 (重試時還原)
+            snapshot = self._snapshot_state() if attempts > 1 else None
             
             # 對每一天進行重試
-            for attempt in range(max_retries):
-                # 保存當前狀態（用於回滾）
-                saved_schedule = {k: {s: list(v) for s, v in shifts.items()} for k, shifts in self.schedule.items()}
-                saved_history = {
-                    name: {
-                        "worked_days": set(hist["worked_days"]),
-                        "consecutive_days": hist["consecutive_days"],
-                        "last_shift_end_minutes": hist["last_shift_end_minutes"],
-                        "total_hours": hist.get("total_hours", 0.0)  # Add hour tracking
-                    }
-                    for name, hist in self.history.items()
-                }
-                
+            for attempt in range(attempts):
                 if attempt > 0:
                     log.append(f"🔄 {date_str} 第 {attempt + 1} 次嘗試...")
-                    # 恢復到本日開始前的狀態
-                    self.schedule = saved_schedule
-                    self.history = saved_history
+                    retries_used += 1
                     # 打亂員工順序以探索不同解
-                    random.shuffle(self.employees)
+                    self.rng.shuffle(self.employee_order)
                 
                 # 1. 排定當天班表
-                day_log = self.schedule_one_day(current_date)
+                day_log = self._schedule_day(day)
                 
-                # 2. 重置沒上班的人的連續天數計數器
-                for emp in self.employees:
-                    if date_str not in self.history[emp['name']]["worked_days"]:
-                        self.history[emp['name']]["consecutive_days"] = 0
+                # 2. 驗證當天覆蓋率規則與營業時段覆蓋 (結構化違規紀錄)
+                day_violations = self._coverage_violations(day)
+                coverage_warnings, business_hours_warnings = self._format_violations(day_violations, date_str)
                 
-                # 3. 驗證當天覆蓋率規則
-                coverage_warnings = self._validate_coverage(date_str)
+                # 只有關鍵違規 (覆蓋不足、缺少必要角色、營業時段空窗) 才需要重試
+                critical = [v for v in day_violations if v["critical"]]
                 
-                # 4. 驗證營業時段覆蓋
-                business_hours_warnings = self._validate_business_hours_coverage(date_str)
-                
-                # 檢查是否有違規
-                violations = []
-                
-                # 只計算關鍵的覆蓋不足問題，忽略其他警告
-                for line in coverage_warnings + business_hours_warnings:
-                    # 只有真正的覆蓋不足才算違規
-                    if "Coverage Warning" in line or "營業時段空窗" in line:
-                        violations.append(line)
-                    # 角色缺失也算違規
-                    elif "Role Warning" in line and "缺少必要角色" in line:
-                        violations.append(line)
+                # 先依違規紀錄做針對性修補，修不好才回滾重排
+                if critical:
+                    repaired, repair_log = self._repair_day(day, critical)
+                    day_log.extend(repair_log)
+                    if repair_log:
+                        repairs_used += 1
+                        day_violations = self._coverage_violations(day)
+                        coverage_warnings, business_hours_warnings = self._format_violations(day_violations, date_str)
+                        critical = [v for v in day_violations if v["critical"]]
                 
                 # 如果本日成功（無關鍵違規）
-                if len(violations) == 0:
+                if not critical:
                     log.append(f"✅ {date_str} 排班成功 (嘗試 {attempt + 1} 次)")
                     # 記錄所有日誌（包括非關鍵警告）
                     log.extend(day_log)
-                    if coverage_warnings:
-                        log.extend([w for w in coverage_warnings if w not in violations])
-                    if business_hours_warnings:
-                        log.extend([w for w in business_hours_warnings if w not in violations])
+                    log.extend(coverage_warnings)
                     day_success = True
                     break
                 else:
-                    if attempt < max_retries - 1:
+                    violations = sum(self._format_violations(critical, date_str), [])
+                    if attempt < attempts - 1:
                         log.append(f"⚠️ {date_str} 有 {len(violations)} 個問題，重試中...")
+                        # 恢復到本日開始前的狀態
+                        self._restore_state(snapshot)
                     else:
-                        # 最後一次嘗試也失敗
-                        log.append(f"❌ {date_str} 經過 {max_retries} 次嘗試仍無法完美排班")
+                        # 最後一次嘗試也失敗 (保留最後一次的結果)
+                        log.append(f"❌ {date_str} 經過 {attempts} 次嘗試仍無法完美排班")
                         log.extend(day_log)
                         log.extend(coverage_warnings)
                         log.extend(business_hours_warnings)
@@ -334,10 +1234,15 @@ class SchedulerLogic:
             # 如果本日失敗，提供建議
             if not day_success:
                 log.append("")
-                log.append(f"💡 {date_str} 建議:")
-                log.append("  1. 檢查該日是否有足夠的可用員工")
-                log.append("  2. 確認班別時間能覆蓋所有需求時段")
-                log.append("  3. 考慮放寬該日的人數限制")
+                if day_issues:
+                    log.append(f"💡 {date_str} 無法滿足的原因 (預先分析):")
+                    for issue in day_issues:
+                        log.append(f"  - {issue['message']}")
+                else:
+                    log.append(f"💡 {date_str} 建議:")
+                    log.append("  1. 檢查該日是否有足夠的可用員工")
+                    log.append("  2. 確認班別時間能覆蓋所有需求時段")
+                    log.append("  3. 考慮放寬該日的人數限制")
                 log.append("")
         
         # 生成詳細的規則驗證報告
@@ -346,7 +1251,7 @@ class SchedulerLogic:
         
         # 統計整體成功率
         total_days = len(self.dates)
-        success_days = sum(1 for d in self.dates if d.strftime("%Y-%m-%d") in self.schedule and any(self.schedule[d.strftime("%Y-%m-%d")].values()))
+        success_days = int((self.assignment >= 0).any(axis=1).sum())
         
         log.insert(0, "")
         log.insert(0, f"📊 整體排班結果: {success_days}/{total_days} 天成功")
@@ -356,7 +1261,727 @@ class SchedulerLogic:
             log.insert(0, f"⚠️ 有 {total_days - success_days} 天無法完美排班")
         log.insert(0, "")
         
+        # 整體目標分數 (多起點比較用)
+        self.objective = self._schedule_objective(retries_used)
+        self.repairs_used = repairs_used
+        
         return self.schedule, log
+
+    # 目標分數權重 (越小越好): 覆蓋不足 >> 最低工時不足 >> 工時不均 >> 重試次數
+    OBJECTIVE_WEIGHTS = {"coverage_deficit": 1000.0, "min_hours_deficit": 10.0, "fairness_spread": 1.0, "retries": 0.1}
+
+    def _schedule_objective(self, retries=0):
+        """
+        整月班表的單一目標分數 (越小越好)
+        - coverage_deficit: 每天關鍵違規的缺口總和 (人數不足的差額、缺少的角色、營業時段空窗小時數)
+        - min_hours_deficit: 未達每月最低工時的總時數
+        - fairness_spread: 可排班員工工時的標準差 (小時)
+        - retries: 重試次數
+        回傳: Dict (各項數值 + total)
+        """
+        coverage_deficit = 0
+        for day in range(self.num_days):
+            coverage_deficit += self.coverage_index.penalty(*self.coverage_index.profile(self.assignment[day]))[0]
+        
+        hours = self.minutes_worked / 60.0
+        min_hours = self.daily_limits.get('min_monthly_hours', 0)
+        min_hours_deficit = float(np.maximum(min_hours - hours, 0).sum()) if min_hours > 0 else 0.0
+        
+        # 只看至少能上一個班別的員工 (完全不能排班的人不列入公平性)
+        schedulable = self.employee_index.eligibility.any(axis=(1, 2))
+        fairness_spread = float(hours[schedulable].std()) if schedulable.any() else 0.0
+        
+        objective = {
+            "coverage_deficit": float(coverage_deficit),
+            "min_hours_deficit": round(min_hours_deficit, 2),
+            "fairness_spread": round(fairness_spread, 2),
+            "retries": retries,
+        }
+        objective["total"] = round(sum(self.OBJECTIVE_WEIGHTS[k] * objective[k] for k in self.OBJECTIVE_WEIGHTS), 2)
+        return objective
+
+    def _config_kwargs(self):
+        """重建同一份設定用的建構參數 (傳給多起點的 worker)"""
+        return {
+            "year": self.year, "month": self.month,
+            "employees_config": self.employees, "shifts_config": self.shifts,
+            "coverage_rules": self.coverage_rules, "daily_limits": self.daily_limits,
+            "business_hours": self.business_hours, "holidays": self.holidays,
+            "start_date": self.start_date, "end_date": self.end_date, "prior_state": self.prior_state,
+            "unavailable": self.unavailable, "class_matching": self.class_matching,
+        }
+
+    def _load_assignment(self, assignment):
+        """載入整月的 assignment 矩陣 (例如其他行程算出的最佳解)，並重建計數器"""
+        self._reset_state()
+        for day in range(self.num_days):
+            for eid in np.flatnonzero(assignment[day] >= 0):
+                self._set_assignment(day, eid, int(assignment[day, eid]))
+
+    def _generate_multi_start(self, max_retries, seed, n_starts, workers):
+        """
+        多起點排班 (Multi-start): seed, seed+1, ..., seed+N-1 各獨立跑一次 generate，
+        以 _schedule_objective 的總分挑出最好的一次 (同分取 seed 較小者)。
+
+        workers > 1 時使用 ProcessPoolExecutor: 設定在每個 worker 啟動時只傳送並編譯一次
+        (initializer)，之後每個任務只傳 seed。
+        回傳: (schedule, log) - 最佳結果的班表與日誌，前面加上分數分布摘要；
+              每次的分數記錄在 self.multi_start_results
+        """
+        import os
+        import time
+        
+        seeds = [(seed + k) % 2**32 for k in range(n_starts)]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, n_starts))
+        
+        start_time = time.perf_counter()
+        if workers == 1:
+            results = []
+            for start_seed in seeds:
+                _, start_log = self.generate(max_retries=max_retries, seed=start_seed)
+                results.append((start_seed, self.assignment.copy(), start_log, self.objective))
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers, initializer=_multi_start_init, initargs=(self._config_kwargs(),)) as pool:
+                results = list(pool.map(_multi_start_run, [max_retries] * n_starts, seeds))
+        elapsed = time.perf_counter() - start_time
+        
+        best_seed, best_assignment, best_log, best_objective = min(results, key=lambda r: (r[3]["total"], r[0]))
+        self._seed_rng(best_seed)
+        self._load_assignment(best_assignment)
+        self.objective = best_objective
+        self.multi_start_results = [dict(seed=r[0], **r[3]) for r in results]
+        
+        totals = sorted(r[3]["total"] for r in results)
+        summary = [
+            f"🏁 多起點排班 (Multi-start): {n_starts} 次，{workers} 個行程，耗時 {elapsed:.2f} 秒",
+            f"  最佳 seed: {best_seed}，目標分數 {best_objective['total']} "
+            f"(覆蓋缺口 {best_objective['coverage_deficit']:.0f}、最低工時不足 {best_objective['min_hours_deficit']} 小時、"
+            f"工時標準差 {best_objective['fairness_spread']} 小時、重試 {best_objective['retries']} 次)",
+            f"  分數分布: 最佳 {totals[0]} / 中位數 {totals[len(totals) // 2]} / 最差 {totals[-1]}",
+            "",
+        ]
+        return self.schedule, summary + best_log
+
+    # 時間預算的分配: 多起點最多用到總預算的比例、局部搜尋佔剩餘時間的比例 (其餘給大鄰域搜尋)
+    ANYTIME_MULTI_START_SHARE = 0.3
+    ANYTIME_LOCAL_SEARCH_SHARE = 0.5
+
+    def _generate_anytime(self, max_retries, seed, time_budget_s, min_starts=1):
+        """
+        限時排班 (Anytime): 在時間預算內依序執行各種策略，隨時保留目前最好的班表
+          1. greedy:       generate(seed) 逐日排班 (一定會跑完，確保有可用的班表)
+          2. multi_start:  seed+1, seed+2, ... 再跑貪婪排班，直到用掉總預算的 ANYTIME_MULTI_START_SHARE
+                           (預估下一次會超過時就停止)；至少跑到 min_starts 次 (含第 1 步，不受預算限制)
+          3. local_search: 剩餘時間的 ANYTIME_LOCAL_SEARCH_SHARE
+          4. lns:          剩下的時間
+        搜尋階段 (3-4) 出錯時記錄在日誌並退回該階段開始前的班表，不會丟掉貪婪 / 多起點的結果。
+        各階段耗時記錄在 self.phase_times (秒)，結果的目標分數在 self.objective。
+        搜尋的步數取決於實際耗時，因此指定 seed 時也不保證每次結果相同。
+        回傳: (schedule, log)
+        """
+        import time
+        
+        start_time = time.perf_counter()
+        deadline = start_time + time_budget_s
+        phase_times = {}
+        
+        # 1. 貪婪排班
+        _, log = self.generate(max_retries=max_retries, seed=seed)
+        phase_times["greedy"] = time.perf_counter() - start_time
+        best = (self.objective["total"], seed, self.assignment.copy(), log, self.objective)
+        greedy_total = best[0]
+        
+        # 2. 多起點: 每次耗時約等於第一次貪婪排班
+        phase_start = time.perf_counter()
+        starts = 0
+        per_start = phase_times["greedy"]
+        while starts + 1 < min_starts or \
+                time.perf_counter() + per_start < start_time + time_budget_s * self.ANYTIME_MULTI_START_SHARE:
+            starts += 1
+            start_seed = (seed + starts) % 2**32
+            _, start_log = self.generate(max_retries=max_retries, seed=start_seed)
+            if self.objective["total"] < best[0]:
+                best = (self.objective["total"], start_seed, self.assignment.copy(), start_log, self.objective)
+        phase_times["multi_start"] = time.perf_counter() - phase_start
+        
+        _, best_seed, best_assignment, log, objective = best
+        if starts:
+            self._seed_rng(best_seed)
+            self._load_assignment(best_assignment)
+        self.objective = objective
+        start_objective = objective["total"]
+        
+        # 3-4. 局部搜尋、大鄰域搜尋 (都只會保留更好的班表)
+        def run_phase(phase, search, share):
+            """執行一個搜尋階段；出錯或結果變差時退回該階段開始前的班表 (限時排班一定要回傳目前最好的班表)"""
+            phase_start = time.perf_counter()
+            remaining = deadline - phase_start
+            lines = []
+            if remaining > 0:
+                saved_assignment, saved_objective = self.assignment.copy(), self.objective
+                failed = False
+                try:
+                    lines = search(time_budget_s=remaining * share)
+                except Exception as e:
+                    lines = [f"⚠️ {phase} 中斷 ({type(e).__name__}: {e})，保留先前的班表"]
+                    failed = True
+                if failed or self.objective["total"] > saved_objective["total"]:
+                    self._load_assignment(saved_assignment)
+                    self.objective = saved_objective
+            phase_times[phase] = time.perf_counter() - phase_start
+            return lines
+        
+        search_log = run_phase("local_search", self.local_search, self.ANYTIME_LOCAL_SEARCH_SHARE)
+        search_log += run_phase("lns", self.large_neighborhood_search, 1.0)
+        
+        self.phase_times = {phase: round(elapsed, 3) for phase, elapsed in phase_times.items()}
+        elapsed = time.perf_counter() - start_time
+        summary = [
+            f"⏱️ 限時排班 (Anytime): 預算 {time_budget_s} 秒，實際 {elapsed:.2f} 秒 "
+            f"(貪婪 {self.phase_times['greedy']} 秒、多起點 {starts} 次 {self.phase_times['multi_start']} 秒、"
+            f"局部搜尋 {self.phase_times['local_search']} 秒、大鄰域 {self.phase_times['lns']} 秒)",
+            f"  目標分數: 貪婪 {greedy_total} → 多起點 {start_objective} → 最終 {self.objective['total']} (seed {best_seed})",
+        ] + [f"  {line}" for line in search_log] + [""]
+        
+        log = summary + log
+        if self.objective["total"] < start_objective:
+            # 搜尋改動了班表: 附上最終班表的驗證報告
+            log.extend(self._generate_validation_report())
+        return self.schedule, log
+
+    def local_search(self, time_budget_s=1.0, seed=None, max_iters=None):
+        """
+        整月局部搜尋 (Simulated Annealing)，從目前的班表 (例如 generate 的結果) 出發改善目標分數
+
+        每一步隨機選一種移動:
+          - swap:   同一天兩位員工交換班別 (其中一位可以是休息 = 把班讓給別人)
+          - change: 同一天某位員工換成另一個可上的班別
+          - move:   某位員工把一個上班日移到另一個休息日 (交換休息日)
+        每一步只更新受影響的日子與員工 (ScheduleSearch 的快取)，不重新驗證整個月。
+        _is_available 的硬性規則 (星期 / 班別資格、休息間隔、連續 6 天上限) 與
+        每日人數上限、班別人數上限一律不可違反；max_people 超額不可增加。
+
+        :param time_budget_s: 時間預算 (秒)
+        :param seed: 隨機種子 (選填，預設沿用 generate 的亂數產生器)
+        :param max_iters: 最多嘗試次數 (選填)
+        回傳: log (List[str])；結束時載入搜尋到的最佳班表並更新 self.objective
+        """
+        import math
+        import time
+        
+        rng = self.rng if seed is None else random.Random(seed)
+        retries = getattr(self, "objective", None) or {}
+        retries = retries.get("retries", 0)
+        before = self._schedule_objective(retries)["total"]
+        
+        search = ScheduleSearch(self)
+        eligibility = self.employee_index.eligibility
+        n_emp = len(self.employee_index)
+        n_days = self.num_days
+        
+        current = search.objective()
+        best = current
+        best_assignment = self.assignment.copy()
+        temp_start, temp_end = 2.0, 0.01
+        
+        iters = accepted = 0
+        start_time = time.perf_counter()
+        deadline = start_time + time_budget_s
+        while n_emp >= 2 and (max_iters is None or iters < max_iters):
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            iters += 1
+            progress = (now - start_time) / time_budget_s if time_budget_s > 0 else 1.0
+            if max_iters:
+                progress = max(progress, iters / max_iters)
+            temperature = temp_start * (temp_end / temp_start) ** min(progress, 1.0)
+            
+            changes = self._propose_move(rng, eligibility, n_days, n_emp)
+            if not changes:
+                continue
+            
+            excess_before = {day: search.day_excess[day] for day, _, _ in changes}
+            undo = search.apply(changes)
+            if not undo:
+                continue
+            
+            # 硬性規則檢查 (只看變更過的格子與日子)
+            ok = all(sid < 0 or search.feasible(eid, day, sid) for day, eid, sid in changes)
+            for day in excess_before:
+                if not ok:
+                    break
+                counts = search.day_shift_counts[day]
+                ok = (bool((counts <= self.shift_index.headcount_cap).all())
+                      and not (search.enforce_daily_limit and counts.sum() > search.max_daily_staff)
+                      and search.day_excess[day] <= excess_before[day])
+            
+            if ok:
+                candidate = search.objective()
+                delta = candidate - current
+                if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                    current = candidate
+                    accepted += 1
+                    if current < best - 1e-9:
+                        best = current
+                        best_assignment = self.assignment.copy()
+                    continue
+            search.apply(undo)
+        elapsed = time.perf_counter() - start_time
+        
+        if not np.array_equal(self.assignment, best_assignment):
+            self._load_assignment(best_assignment)
+        self.objective = self._schedule_objective(retries)
+        return [
+            f"🔧 局部搜尋 (Local Search): 目標分數 {before} → {self.objective['total']}，"
+            f"{iters} 次嘗試、{accepted} 次接受，耗時 {elapsed:.2f} 秒",
+        ]
+
+    def _propose_move(self, rng, eligibility, n_days, n_emp):
+        """隨機產生一個局部搜尋的移動: [(day, eid, new_sid), ...]，無可行移動時回傳 None"""
+        kind = rng.random()
+        if kind < 0.5:
+            # swap: 同一天兩人交換 (上班 <-> 上班 或 上班 <-> 休息)
+            day = rng.randrange(n_days)
+            row = self.assignment[day]
+            working = np.flatnonzero(row >= 0)
+            if not len(working):
+                return None
+            a = int(working[rng.randrange(len(working))])
+            b = rng.randrange(n_emp)
+            if row[a] == row[b]:
+                return None
+            return [(day, a, int(row[b])), (day, b, int(row[a]))]
+        
+        if kind < 0.75:
+            # change: 換成另一個可上的班別
+            day = rng.randrange(n_days)
+            row = self.assignment[day]
+            working = np.flatnonzero(row >= 0)
+            if not len(working):
+                return None
+            a = int(working[rng.randrange(len(working))])
+            options = np.flatnonzero(eligibility[a, :, self.weekdays[day]])
+            options = options[options != row[a]]
+            if not len(options):
+                return None
+            return [(day, a, int(options[rng.randrange(len(options))]))]
+        
+        # move: 把一個上班日移到休息日
+        eid = rng.randrange(n_emp)
+        column = self.assignment[:, eid]
+        worked = np.flatnonzero(column >= 0)
+        resting = np.flatnonzero(column < 0)
+        if not len(worked) or not len(resting):
+            return None
+        src = int(worked[rng.randrange(len(worked))])
+        dst = int(resting[rng.randrange(len(resting))])
+        sid = int(column[src])
+        if not eligibility[eid, sid, self.weekdays[dst]]:
+            options = np.flatnonzero(eligibility[eid, :, self.weekdays[dst]])
+            if not len(options):
+                return None
+            sid = int(options[rng.randrange(len(options))])
+        return [(src, eid, -1), (dst, eid, sid)]
+
+    # 大鄰域搜尋的鄰域 (種類, 大小): 連續 2-4 天的所有格子，或 2-3 位員工整月的格子
+    LNS_NEIGHBORHOODS = (("days", 2), ("days", 3), ("days", 4), ("employees", 2), ("employees", 3))
+
+    def large_neighborhood_search(self, time_budget_s=2.0, seed=None, max_iters=None, node_limit=3000):
+        """
+        大鄰域搜尋 (Large Neighborhood Search): 反覆拆掉一塊班表 (destroy) 再精確重排 (repair)
+
+        - destroy: 清空連續 2-4 天的所有排班，或 2-3 位員工整月的排班
+          (員工鄰域優先挑未達最低工時的人)
+        - repair: 對拆掉的格子做有界的分支定界 (_repair_exact)，只在目標分數變好時保留
+        - 自適應: 每種鄰域的選擇權重依最近是否帶來改善調整 (有改善的鄰域被選中的機率變高)
+
+        :param time_budget_s: 時間預算 (秒)
+        :param seed: 隨機種子 (選填，預設沿用 generate 的亂數產生器)
+        :param max_iters: 最多 destroy/repair 次數 (選填)
+        :param node_limit: 每次 repair 的分支定界節點上限 (在上限內搜完即為該子問題的最佳解)
+        回傳: log (List[str])；結果寫回 assignment 並更新 self.objective，
+              各鄰域的統計記錄在 self.lns_stats
+        """
+        import time
+        
+        rng = self.rng if seed is None else random.Random(seed)
+        retries = getattr(self, "objective", None) or {}
+        retries = retries.get("retries", 0)
+        before = self._schedule_objective(retries)["total"]
+        
+        search = ScheduleSearch(self)
+        neighborhoods = self.LNS_NEIGHBORHOODS
+        weights = np.ones(len(neighborhoods))
+        stats = {f"{kind}:{size}": {"tried": 0, "improved": 0, "exhausted": 0} for kind, size in neighborhoods}
+        current = search.objective()
+        
+        iters = 0
+        start_time = time.perf_counter()
+        deadline = start_time + time_budget_s
+        while len(self.employee_index) and (max_iters is None or iters < max_iters) and time.perf_counter() < deadline:
+            iters += 1
+            pick = rng.random() * weights.sum()
+            k = min(int(np.searchsorted(np.cumsum(weights), pick, side="right")), len(neighborhoods) - 1)
+            kind, size = neighborhoods[k]
+            cells = self._lns_neighborhood(kind, size, rng, search)
+            
+            value, exhausted = self._repair_exact(search, cells, current, node_limit, deadline)
+            entry = stats[f"{kind}:{size}"]
+            entry["tried"] += 1
+            entry["exhausted"] += int(exhausted)
+            if value < current - 1e-9:
+                current = value
+                entry["improved"] += 1
+                reward = 1.0
+            else:
+                reward = 0.0
+            weights[k] = max(0.8 * weights[k] + 0.2 * reward, 0.05)
+        elapsed = time.perf_counter() - start_time
+        
+        self.objective = self._schedule_objective(retries)
+        self.lns_stats = stats
+        log = [
+            f"🧩 大鄰域搜尋 (LNS): 目標分數 {before} → {self.objective['total']}，{iters} 次拆解重排，耗時 {elapsed:.2f} 秒",
+        ]
+        for name, entry in stats.items():
+            if entry["tried"]:
+                log.append(f"  {name}: {entry['tried']} 次，改善 {entry['improved']} 次，完整搜尋 {entry['exhausted']} 次")
+        return log
+
+    def _lns_neighborhood(self, kind, size, rng, search):
+        """選出要拆掉的格子 [(day, eid), ...]，依 (day, eid) 排序 (分支定界逐日往後排)"""
+        n_emp = len(self.employee_index)
+        if kind == "days":
+            size = min(size, self.num_days)
+            first = rng.randrange(self.num_days - size + 1)
+            return [(day, eid) for day in range(first, first + size) for eid in range(n_emp)]
+        
+        # 員工鄰域: 至少一位挑未達最低工時的人，其餘隨機
+        short = np.flatnonzero(search.schedulable & (self.minutes_worked < search.min_minutes))
+        chosen = {int(short[rng.randrange(len(short))])} if len(short) else set()
+        while len(chosen) < min(size, n_emp):
+            chosen.add(rng.randrange(n_emp))
+        return [(day, eid) for day in range(self.num_days) for eid in sorted(chosen)]
+
+    def _repair_exact(self, search, cells, incumbent, node_limit, deadline=None, weights=None, baseline=None, fixed_rest=()):
+        """
+        拆掉 cells 的排班，以有界分支定界 (Branch-and-Bound) 重排
+
+        每個格子的值域 = 原本的值 (先試) + 休息 + 其他可上的班別。每個節點都檢查硬性規則
+        (ScheduleSearch.feasible、班別 / 每日人數上限)，一天排完時檢查 max_people 超額不可增加。
+        覆蓋輪廓與工時在搜尋中以區域副本增量維護，只有一天排完時才計算該天的罰分。
+        下界 = 已排完日子的覆蓋缺口 + 假設剩下的格子都排最長班別時仍不足的最低工時。
+        在 node_limit 內搜完就是這個子問題的最佳解；否則回傳搜尋到的最佳解。
+
+        :param weights: 目標權重 (預設 OBJECTIVE_WEIGHTS)；可多一項 "changes" = 每個與 baseline 不同的格子的成本
+        :param baseline: 每個格子的基準值 (計算變更數用，也是值域中最先嘗試的值；預設為目前的值)
+        :param fixed_rest: 必須休息的格子 {(day, eid), ...} (值域只有休息)
+        回傳: (目標分數, 是否完整搜尋)；只有嚴格變好時才寫回，否則保持原本的班表
+        """
+        import math
+        import time
+        
+        weights = weights or self.OBJECTIVE_WEIGHTS
+        change_weight = weights.get("changes", 0.0)
+        eligibility = self.employee_index.eligibility
+        role_matrix = self.employee_index.role_matrix
+        minutes = self.shift_index.minutes_arr
+        cap = self.shift_index.headcount_cap
+        min_minutes = search.min_minutes
+        
+        def shortfall(worked):
+            return max(min_minutes - worked, 0) / 60.0 if min_minutes > 0 else 0.0
+        
+        original = [int(self.assignment[day, eid]) for day, eid in cells]
+        if baseline is None:
+            baseline = original
+        domains = []
+        for (day, eid), old, base in zip(cells, original, baseline):
+            if (day, eid) in fixed_rest:
+                domains.append([-1])
+                continue
+            options = [int(sid) for sid in np.flatnonzero(eligibility[eid, :, self.weekdays[day]])]
+            domains.append([v for v in dict.fromkeys([base, old, -1] + options) if v < 0 or v in options])
+        
+        # 每天最後一個格子的位置 (排過它，這天的覆蓋就不會再變)
+        last_index = {}
+        for i, (day, _) in enumerate(cells):
+            last_index[day] = i
+        cell_days = sorted(last_index)
+        eids = sorted({eid for _, eid in cells})
+        
+        # 目標分數中不受這些格子影響的部分
+        fixed_deficit = search.day_deficit.sum() - search.day_deficit[cell_days].sum()
+        excess_cap = {day: search.day_excess[day] for day in cell_days}
+        fixed_hours = search.min_hours_deficit - sum(shortfall(self.minutes_worked[eid]) for eid in eids)
+        fair = [eid for eid in eids if search.schedulable[eid]]
+        base_sum = search.sum_hours - sum(self.minutes_worked[eid] / 60.0 for eid in fair)
+        base_sq = search.sum_sq_hours - sum((self.minutes_worked[eid] / 60.0) ** 2 for eid in fair)
+        
+        # 拆掉: 直接清空 assignment 的格子 (feasible 讀取員工欄位)，計數用區域副本
+        counts = {day: search.day_shift_counts[day].copy() for day in cell_days}
+        roles = {day: search.day_role_counts[day].copy() for day in cell_days}
+        worked = {eid: int(self.minutes_worked[eid]) for eid in eids}
+        for (day, eid), old in zip(cells, original):
+            if old >= 0:
+                counts[day][old] -= 1
+                roles[day][old] -= role_matrix[eid]
+                worked[eid] -= minutes[old]
+                self.assignment[day, eid] = -1
+        
+        # 每位員工剩餘格子最多還能增加的分鐘數 (最低工時的下界)
+        cell_room = [max([int(minutes[v]) for v in domain if v >= 0], default=0) for domain in domains]
+        room = {eid: 0 for eid in eids}
+        for (_, eid), extra in zip(cells, cell_room):
+            room[eid] += extra
+        hours_term = {eid: shortfall(worked[eid] + room[eid]) for eid in eids}
+        
+        day_deficit = {}
+        best = [incumbent, None]
+        nodes = [0]
+        exhausted = [True]
+        n_fair = search.n_schedulable
+        
+        def leaf_value(changed):
+            coverage = fixed_deficit + sum(day_deficit.values())
+            hours = fixed_hours + sum(shortfall(worked[eid]) for eid in eids)
+            total = base_sum + sum(worked[eid] / 60.0 for eid in fair)
+            total_sq = base_sq + sum((worked[eid] / 60.0) ** 2 for eid in fair)
+            mean = total / n_fair
+            spread = math.sqrt(max(total_sq / n_fair - mean * mean, 0.0))
+            return (weights["coverage_deficit"] * coverage + weights["min_hours_deficit"] * hours
+                    + weights["fairness_spread"] * spread + change_weight * changed)
+        
+        def enter(i, done, hours_lb, changed):
+            """進入第 i 個格子: 被下界剪枝或到達葉節點時回傳 None，否則回傳該層的搜尋狀態"""
+            if (weights["coverage_deficit"] * (fixed_deficit + done) + weights["min_hours_deficit"] * (fixed_hours + hours_lb)
+                    + change_weight * changed >= best[0] - 1e-9):
+                return None
+            if i == len(cells):
+                value = leaf_value(changed)
+                if value < best[0] - 1e-9:
+                    best[0] = value
+                    best[1] = [int(self.assignment[day, eid]) for day, eid in cells]
+                return None
+            eid = cells[i][1]
+            room[eid] -= cell_room[i]
+            # [格子, 已確定的覆蓋缺口, 工時下界, 變更數, 下一個要試的值, 目前套用的值, 進入前的工時項]
+            return [i, done, hours_lb, changed, 0, None, hours_term[eid]]
+        
+        # 深度優先搜尋以明確的堆疊進行 (深度 = 格子數，大型名單的整天鄰域也不會超過遞迴上限)
+        root = enter(0, 0.0, sum(hours_term.values()), 0)
+        stack = [root] if root is not None else []
+        while stack:
+            frame = stack[-1]
+            i, done, hours_lb, changed, k, applied, old_term = frame
+            day, eid = cells[i]
+            day_counts, day_roles = counts[day], roles[day]
+            
+            # 撤銷上一個嘗試的值
+            if applied is not None:
+                frame[5] = None
+                if last_index[day] == i:
+                    day_deficit.pop(day, None)
+                if applied >= 0:
+                    self.assignment[day, eid] = -1
+                    day_counts[applied] -= 1
+                    day_roles[applied] -= role_matrix[eid]
+                    worked[eid] -= minutes[applied]
+            
+            domain = domains[i]
+            if k < len(domain) and (nodes[0] >= node_limit or (deadline is not None and nodes[0] % 256 == 0 and time.perf_counter() > deadline)):
+                exhausted[0] = False
+                k = len(domain)
+            if k == len(domain):
+                hours_term[eid] = old_term
+                room[eid] += cell_room[i]
+                stack.pop()
+                continue
+            
+            sid = domain[k]
+            frame[4] = k + 1
+            if sid >= 0:
+                if day_counts[sid] >= cap[sid]:
+                    continue
+                if search.enforce_daily_limit and day_counts.sum() >= search.max_daily_staff:
+                    continue
+                if not search.feasible(eid, day, sid):
+                    continue
+                self.assignment[day, eid] = sid
+                day_counts[sid] += 1
+                day_roles[sid] += role_matrix[eid]
+                worked[eid] += minutes[sid]
+            frame[5] = sid
+            nodes[0] += 1
+            
+            hours_term[eid] = shortfall(worked[eid] + room[eid])
+            next_lb = hours_lb - old_term + hours_term[eid]
+            next_changed = changed + (sid != baseline[i])
+            child = None
+            if last_index[day] == i:
+                deficit, excess = self.coverage_index.penalty(day_counts, day_roles)
+                if excess <= excess_cap[day]:
+                    day_deficit[day] = deficit
+                    child = enter(i + 1, done + deficit, next_lb, next_changed)
+            else:
+                child = enter(i + 1, done, next_lb, next_changed)
+            if child is not None:
+                stack.append(child)
+        
+        # 還原原本的格子，有更好的解時才經由 ScheduleSearch 寫入 (同步計數器與快取)
+        for (day, eid), old in zip(cells, original):
+            self.assignment[day, eid] = old
+        if best[1] is None:
+            return incumbent, exhausted[0]
+        search.apply([(day, eid, sid) for (day, eid), sid in zip(cells, best[1])])
+        return best[0], exhausted[0]
+
+    # 重新排班的目標: 覆蓋缺口 >> 變更的格子數 >> 工時不均 (只用來打破平手)
+    REPLAN_WEIGHTS = {"coverage_deficit": 1000.0, "min_hours_deficit": 0.0, "fairness_spread": 0.001, "changes": 1.0}
+    # 每次分支定界最多的格子數 (格子越多，節點上限內能搜到的範圍越淺)
+    REPLAN_MAX_CELLS = 600
+
+    def replan(self, published_schedule, events, neighbor_days=1, node_limit=20000):
+        """
+        臨時請假的增量重排 (Incremental Re-plan): 只重排受影響的日子，並讓變更的格子數最少
+
+        :param published_schedule: 已發布的班表 {date_str: {shift_name: [names]}}
+        :param events: 無法上班的事件 [{"person": name, "date": "YYYY-MM-DD", "end_date": 選填}, ...]
+        :param neighbor_days: 事件前後各納入幾天 (連續上班 / 休息間隔的連鎖影響)
+        :param node_limit: 分支定界的節點上限
+        流程: 載入已發布的班表 -> 請假的格子改為休息 -> 事件當天與前後 neighbor_days 天
+              以 _repair_exact 求解 (REPLAN_WEIGHTS: 先補滿覆蓋，再讓變更最少；先試原本的值)；
+              範圍不相連的事件日子分組求解；格子超過 REPLAN_MAX_CELLS 時再依日子 / 員工分段，
+              每段的節點上限各自計算
+        回傳: (diff, log)
+              diff = [{"date", "person", "from", "to"}, ...] (班別名稱，None = 休息)；
+              結果寫回 assignment，並更新 self.objective
+        """
+        import time
+        
+        start_time = time.perf_counter()
+        log = []
+        self._load_assignment(self._assignment_from_schedule(published_schedule, log))
+        published = self.assignment.copy()
+        
+        # 請假的格子 (日期區間外或不認識的人略過)
+        fixed_rest = self._event_cells(events, log)
+        event_days = sorted({day for day, _ in fixed_rest})
+        
+        for day, eid in fixed_rest:
+            self._set_assignment(day, eid, -1)
+        
+        # 暖身: 事件當天先做針對性修補 (可用遮罩檢查前後兩側的休息 / 連續上班)，給分支定界一個好的上界
+        search = ScheduleSearch(self)
+        for day in event_days:
+            critical = [v for v in self._coverage_violations(day) if v["critical"]]
+            if not critical:
+                continue
+            eligible = self.employee_index.eligibility[:, :, self.weekdays[day]]
+            available = np.zeros_like(eligible)
+            for eid, sid in zip(*np.nonzero(eligible)):
+                available[eid, sid] = (day, eid) not in fixed_rest and search.feasible(eid, day, sid)
+            self._repair_day(day, critical, available)
+        search = ScheduleSearch(self)
+        
+        # 前後範圍相連的事件日子為一組 (彼此有連鎖影響)，各組分開求解
+        groups = []
+        for day in event_days:
+            if groups and day - neighbor_days <= groups[-1][-1] + neighbor_days + 1:
+                groups[-1].append(day)
+            else:
+                groups.append([day])
+        
+        n_emp = len(self.employee_index)
+        weights = self.REPLAN_WEIGHTS
+        exhausted = True
+        n_days = 0
+        for group in groups:
+            # 事件當天的格子先排 (覆蓋缺口最早確定，剪枝最有效)，再排前後的日子
+            neighbors = sorted({d for day in group for d in range(day - neighbor_days, day + neighbor_days + 1)
+                                if 0 <= d < self.num_days} - set(group))
+            days = group + neighbors
+            n_days += len(days)
+            # 格子太多時依日子、再依員工切成數段 (每段最多 REPLAN_MAX_CELLS 格)
+            days_per_chunk = max(1, self.REPLAN_MAX_CELLS // max(n_emp, 1))
+            chunks = []
+            for k in range(0, len(days), days_per_chunk):
+                chunk_days = days[k:k + days_per_chunk]
+                emps_per_chunk = max(1, self.REPLAN_MAX_CELLS // len(chunk_days))
+                chunks += [(chunk_days, range(first, min(first + emps_per_chunk, n_emp)))
+                           for first in range(0, n_emp, emps_per_chunk)]
+            for chunk_days, chunk_emps in chunks:
+                cells = [(day, eid) for day in chunk_days for eid in chunk_emps]
+                baseline = [int(published[day, eid]) for day, eid in cells]
+                changed = sum(int(self.assignment[day, eid]) != base for (day, eid), base in zip(cells, baseline))
+                incumbent = search.objective(weights) + weights["changes"] * changed
+                _, done = self._repair_exact(search, cells, incumbent, node_limit, weights=weights,
+                                             baseline=baseline, fixed_rest=fixed_rest)
+                exhausted = exhausted and done
+        
+        names = self.employee_index.names
+        shift_names = self.shift_index.names
+        diff = []
+        for day, eid in zip(*np.nonzero(self.assignment != published)):
+            before, after = int(published[day, eid]), int(self.assignment[day, eid])
+            diff.append({
+                "date": self.date_strs[day], "person": names[eid],
+                "from": shift_names[before] if before >= 0 else None,
+                "to": shift_names[after] if after >= 0 else None,
+            })
+        
+        self.objective = self._schedule_objective()
+        elapsed = time.perf_counter() - start_time
+        remaining = [v for day in event_days for v in self._coverage_violations(day) if v["critical"]]
+        log.insert(0, f"🔁 重新排班 (Re-plan): {len(events)} 個請假事件，重排 {n_days} 天，"
+                      f"變更 {len(diff)} 格，耗時 {elapsed * 1000:.0f} 毫秒" + ("" if exhausted else " (已達節點上限)"))
+        for change in diff:
+            log.append(f"  {change['date']} {change['person']}: {change['from'] or '休息'} → {change['to'] or '休息'}")
+        if remaining:
+            log.append(f"⚠️ 仍有 {len(remaining)} 個關鍵違規無法補上")
+        return diff, log
+
+    def _assignment_from_schedule(self, schedule, log=None):
+        """班表字典 {date_str: {shift_name: [names]}} -> assignment 矩陣 (不認識的日期 / 班別 / 員工略過)"""
+        assignment = np.full((self.num_days, len(self.employee_index)), -1, dtype=np.int16)
+        for date_str, day_schedule in (schedule or {}).items():
+            day = self.day_of_str.get(date_str)
+            if day is None:
+                continue
+            for shift_name, people in day_schedule.items():
+                sid = self.shift_index.id_of.get(shift_name)
+                for name in people:
+                    eid = self.employee_index.id_of.get(name)
+                    if sid is None or eid is None:
+                        if log is not None:
+                            log.append(f"⚠️ {date_str} 無法辨識 {shift_name} / {name}，略過")
+                        continue
+                    assignment[day, eid] = sid
+        return assignment
+
+    def _hard_rule_violations(self):
+        """
+        檢查整月班表的硬性規則 (與 _is_available 相同的規則 + 每日 / 班別人數上限)
+        回傳: List[str] (空列表 = 全部符合)
+        """
+        search = ScheduleSearch(self)
+        problems = []
+        for eid, name in enumerate(self.employee_index.names):
+            for day in np.flatnonzero(self.assignment[:, eid] >= 0):
+                if not search.feasible(eid, int(day), int(self.assignment[day, eid])):
+                    problems.append(f"{self.date_strs[day]} {name}: {self.shift_index.names[self.assignment[day, eid]]}")
+        for day in range(self.num_days):
+            counts = search.day_shift_counts[day]
+            over = np.flatnonzero(counts > self.shift_index.headcount_cap)
+            for sid in over:
+                problems.append(f"{self.date_strs[day]} {self.shift_index.names[sid]}: 超過班別人數上限")
+            if search.enforce_daily_limit and counts.sum() > search.max_daily_staff:
+                problems.append(f"{self.date_strs[day]}: 超過每日人數上限")
+        return problems
     
     def _generate_validation_report(self):
         """生成詳細的規則驗證報告"""
@@ -367,6 +1992,10 @@ class SchedulerLogic:
         report.append("=" * 80)
         report.append("")
         
+        # 由 assignment 矩陣推導整月統計
+        stats = self._employee_stats(self.num_days)
+        id_of = self.employee_index.id_of
+        
         # 1. 員工基礎設定檢查
         report.append("### 1️⃣ 員工基礎設定 (Employee Constraints)")
         report.append("")
@@ -389,8 +2018,8 @@ class SchedulerLogic:
             report.append(f"  - 角色: {', '.join(roles) if roles else '未設定'}")
             
             # 實際排班統計
-            worked_days = len(self.history[name]['worked_days'])
-            total_hours = self.history[name].get('total_hours', 0.0)
+            worked_days = int(stats["days_worked"][id_of[name]])
+            total_hours = stats["total_minutes"][id_of[name]] / 60.0
             report.append(f"  - ✅ 實際排班天數: {worked_days} 天")
             report.append(f"  - ⏱️ 累積總工時: {total_hours:.1f} 小時")
             report.append("")
@@ -405,7 +2034,7 @@ class SchedulerLogic:
             min_hours_violations = []
             for emp in self.employees:
                 name = emp['name']
-                hours = self.history[name].get('total_hours', 0.0)
+                hours = stats["total_minutes"][id_of[name]] / 60.0
                 if hours < min_monthly_hours:
                     min_hours_violations.append(f"  ❌ {name}: {hours:.1f} 小時 (差 {min_monthly_hours - hours:.1f} 小時)")
                 else:
@@ -428,28 +2057,18 @@ class SchedulerLogic:
         for emp in self.employees:
             name = emp['name']
             
-            # 檢查連續工作天數
-            max_consecutive = 0
-            current_consecutive = 0
-            sorted_dates = sorted(self.history[name]['worked_days'])
-            
-            for i, date_str in enumerate(sorted_dates):
-                if i == 0:
-                    current_consecutive = 1
-                else:
-                    from datetime import datetime, timedelta
-                    prev_date = datetime.strptime(sorted_dates[i-1], "%Y-%m-%d")
-                    curr_date = datetime.strptime(date_str, "%Y-%m-%d")
-                    if (curr_date - prev_date).days == 1:
-                        current_consecutive += 1
-                    else:
-                        current_consecutive = 1
-                max_consecutive = max(max_consecutive, current_consecutive)
+            # 檢查連續工作天數 (最長連續上班區段)
+            worked = self.assignment[:, id_of[name]] >= 0
+            edges = np.diff(np.concatenate(([0], worked.astype(np.int8), [0])))
+            runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+            if len(runs) and worked[0]:
+                runs[0] += self._prior_run(id_of[name])  # 接續上一期的連續上班
+            max_consecutive = int(runs.max()) if len(runs) else 0
             
-            if max_consecutive > 6:
-                violations.append(f"  ❌ {name}: 連續工作 {max_consecutive} 天 (超過6天上限)")
+            if max_consecutive > self.MAX_CONSECUTIVE_DAYS:
+                violations.append(f"  ❌ {name}: 連續工作 {max_consecutive} 天 (超過{self.MAX_CONSECUTIVE_DAYS}天上限)")
             elif max_consecutive > 0:
-                report.append(f"  ✅ {name}: 最長連續工作 {max_consecutive} 天 (符合≤6天規定)")
+                report.append(f"  ✅ {name}: 最長連續工作 {max_consecutive} 天 (符合≤{self.MAX_CONSECUTIVE_DAYS}天規定)")
         
         if violations:
             report.extend(violations)
@@ -461,68 +2080,37 @@ class SchedulerLogic:
         # 晚接早（花花班）檢查
         report.append("  **晚接早檢查 (Clopening Detection)**:")
         clopening_cases = []
+        min_rest_hours = self.min_rest_hours
+        rest_matrix = self.shift_index.rest_matrix
         
         for emp in self.employees:
             name = emp['name']
-            sorted_dates = sorted(self.history[name]['worked_days'])
+            column = self.assignment[:, id_of[name]]
             
-            for i in range(len(sorted_dates) - 1):
-                from datetime import datetime, timedelta
-                curr_date_str = sorted_dates[i]
-                next_date_str = sorted_dates[i + 1]
-                
-                curr_date = datetime.strptime(curr_date_str, "%Y-%m-%d")
-                next_date = datetime.strptime(next_date_str, "%Y-%m-%d")
-                
-                # 檢查是否為連續兩天
-                if (next_date - curr_date).days == 1:
-                    # 獲取當天和隔天的班別
-                    curr_shifts = []
-                    next_shifts = []
-                    
-                    if curr_date_str in self.schedule:
-                        for shift_name, people in self.schedule[curr_date_str].items():
-                            if name in people:
-                                curr_shifts.append(shift_name)
-                    
-                    if next_date_str in self.schedule:
-                        for shift_name, people in self.schedule[next_date_str].items():
-                            if name in people:
-                                next_shifts.append(shift_name)
-                    
-                    # 檢查休息時間
-                    for curr_shift in curr_shifts:
-                        for next_shift in next_shifts:
-                            curr_shift_info = self.shifts.get(curr_shift, {})
-                            next_shift_info = self.shifts.get(next_shift, {})
-                            
-                            try:
-                                # 解析當天班別的結束時間
-                                curr_time = curr_shift_info.get('time', '')
-                                curr_segments = self._parse_shift_segments(curr_time)
-                                if curr_segments:
-                                    curr_end = max(seg[1] for seg in curr_segments)  # 取最晚結束時間
-                                else:
-                                    continue
-                                
-                                # 解析隔天班別的開始時間
-                                next_time = next_shift_info.get('time', '')
-                                next_segments = self._parse_shift_segments(next_time)
-                                if next_segments:
-                                    next_start = min(seg[0] for seg in next_segments)  # 取最早開始時間
-                                else:
-                                    continue
-                                
-                                # 計算休息時間（跨日）
-                                rest_hours = (24 * 60 - curr_end + next_start) / 60
-                                
-                                if rest_hours < 11:
-                                    clopening_cases.append(
-                                        f"    ⚠️ {name}: {curr_date_str} {curr_shift} → {next_date_str} {next_shift} "
-                                        f"(休息 {rest_hours:.1f} 小時)"
-                                    )
-                            except:
-                                pass
+            # 上一期最後一天 -> 本期第一天
+            eid = id_of[name]
+            prior_sid = self.prior_last_shift[eid]
+            if self.prior_last_day[eid] == -1 and prior_sid >= 0 and column[0] >= 0 and rest_matrix[prior_sid, column[0]] < min_rest_hours * 60:
+                clopening_cases.append(
+                    f"    ⚠️ {name}: {(self.dates[0] - timedelta(days=1)).isoformat()} {self.shift_index.names[prior_sid]} (上一期) → "
+                    f"{self.date_strs[0]} {self.shift_index.names[column[0]]} "
+                    f"(休息 {rest_matrix[prior_sid, column[0]] / 60:.1f} 小時)"
+                )
+            
+            # 連續兩天都有上班的日子，休息間隔由班別 x 班別矩陣查表
+            pairs = np.flatnonzero((column[:-1] >= 0) & (column[1:] >= 0))
+            short = pairs[rest_matrix[column[pairs], column[pairs + 1]] < min_rest_hours * 60]
+            for day in short:
+                curr_sid = column[day]
+                next_sid = column[day + 1]
+                rest = rest_matrix[curr_sid, next_sid]
+                curr_date_str = self.date_strs[day]
+                next_date_str = self.date_strs[day + 1]
+                clopening_cases.append(
+                    f"    ⚠️ {name}: {curr_date_str} {self.shift_index.names[curr_sid]} → "
+                    f"{next_date_str} {self.shift_index.names[next_sid]} "
+                    f"(休息 {rest / 60:.1f} 小時)"
+                )
         
         if clopening_cases:
             report.extend(clopening_cases)
@@ -530,7 +2118,7 @@ class SchedulerLogic:
             report.append("    ✅ 無晚接早情況（所有連續班次都有足夠休息時間）")
         
         report.append("")
-        report.append("  ✅ 休息時間檢查: 已在排班時強制執行11小時休息")
+        report.append(f"  ✅ 休息時間檢查: 已在排班時強制執行{min_rest_hours}小時休息")
         report.append("  ✅ 每日一班限制: 已在排班時強制執行")
         report.append("")
         
@@ -538,6 +2126,9 @@ class SchedulerLogic:
         report.append("### 3️⃣ 時段覆蓋規則 (Coverage Rules)")
         report.append("")
         
+        # 每天只驗證一次 (結構化違規紀錄)
+        day_violations = [self._coverage_violations(day) for day in range(self.num_days)]
+        
         if not self.coverage_rules:
             report.append("  ℹ️ 未設定覆蓋規則")
         else:
@@ -553,15 +2144,10 @@ class SchedulerLogic:
                 
                 # 檢查每一天是否滿足
                 failed_dates = []
-                for date in self.dates:
-                    date_str = date.strftime("%Y-%m-%d")
-                    warnings = self._validate_coverage(date_str)
-                    
-                    # 檢查是否有此規則的違規
-                    for w in warnings:
-                        if time_range in w and "Coverage Warning" in w:
-                            failed_dates.append(date_str)
-                            break
+                for day, violations in enumerate(day_violations):
+                    # 檢查是否有此規則的人數不足
+                    if any(v["type"] == "coverage" and v["rule"] == idx - 1 for v in violations):
+                        failed_dates.append(self.date_strs[day])
                 
                 if failed_dates:
                     report.append(f"  ❌ 未滿足日期: {', '.join(failed_dates[:5])}")
@@ -582,12 +2168,11 @@ class SchedulerLogic:
             end = self.business_hours.get("end", "")
             report.append(f"  營業時間: {start} - {end}")
             
-            failed_dates = []
-            for date in self.dates:
-                date_str = date.strftime("%Y-%m-%d")
-                warnings = self._validate_business_hours_coverage(date_str)
-                if warnings:
-                    failed_dates.append(date_str)
+            failed_dates = [
+                self.date_strs[day]
+                for day, violations in enumerate(day_violations)
+                if any(v["type"] == "business_hours" for v in violations)
+            ]
             
             if failed_dates:
                 report.append(f"  ❌ 有空窗期的日期: {', '.join(failed_dates[:5])}")
@@ -611,14 +2196,10 @@ class SchedulerLogic:
             report.append(f"  上限: {max_staff} 人")
             
             exceeded_dates = []
-            for date in self.dates:
-                date_str = date.strftime("%Y-%m-%d")
-                if date_str in self.schedule:
-                    assigned = set()
-                    for shift_people in self.schedule[date_str].values():
-                        assigned.update(shift_people)
-                    if len(assigned) > max_staff:
-                        exceeded_dates.append(f"{date_str} ({len(assigned)}人)")
+            daily_counts = (self.assignment >= 0).sum(axis=1)
+            for day in np.flatnonzero(daily_counts > max_staff):
+                date_str = self.date_strs[day]
+                exceeded_dates.append(f"{date_str} ({daily_counts[day]}人)")
             
             if exceeded_dates:
                 report.append(f"  ❌ 超過上限的日期: {', '.join(exceeded_dates[:5])}")
@@ -631,144 +2212,181 @@ class SchedulerLogic:
         
         return report
     
+    def _coverage_violations(self, day):
+        """第 day 天的覆蓋違規 (結構化紀錄，見 CoverageIndex)"""
+        return self.coverage_index.violations(self.assignment[day])
+
+    def _format_violations(self, violations, date_str):
+        """
+        將結構化違規紀錄轉成日誌文字
+        回傳: (coverage_warnings, business_hours_warnings)
+        """
+        warnings = []
+        gap_hours = []
+        for v in violations:
+            if v["type"] == "coverage":
+                warnings.append(
+                    f"Coverage Warning: {date_str} {v['time_range']} 只有 {v['actual']} 人 (需要 {v['required']} 人)"
+                )
+            elif v["type"] == "max_people":
+                warnings.append(
+                    f"⚠️ 人數超標: {date_str} {v['time_range']} 有 {v['actual']} 人 (最多 {v['required']} 人)"
+                )
+            elif v["type"] == "role":
+                warnings.append(
+                    f"Role Warning: {date_str} {v['time_range']} 缺少必要角色 '{v['role']}'"
+                )
+            elif v["type"] == "business_hours":
+                gap_hours.append(v["time_range"])
+        
+        business_hours_warnings = []
+        if gap_hours:
+            business_hours_warnings.append(
+                f"⚠️ 營業時段空窗警告 ({date_str}): {', '.join(gap_hours)} 沒有人上班！"
+            )
+        return warnings, business_hours_warnings
+
     def _validate_coverage(self, date_str):
         """驗證特定日期的覆蓋規則是否有被滿足 (例如: 10點到14點要有3人)"""
-        warnings = []
-        
-        if not self.coverage_rules:
-            return warnings
-        
-        # 建立時間軸 (Timeline)
-        # 格式: [(start_min, end_min, employee_name)]
-        timeline = [] 
-        
-        if date_str not in self.schedule:
-            return warnings
-            
-        for shift_name, employees in self.schedule[date_str].items():
-            if not employees:
-                continue
-            
-            shift_time = self.shifts[shift_name].get("time", "00:00-23:59")
-            try:
-                segments = self._parse_shift_segments(shift_time)
-                for start_min, end_min in segments:
-                    for emp_name in employees:
-                        timeline.append((start_min, end_min, emp_name))
-            except:
-                continue
-        
-        # 檢查每一條規則
-        for rule in self.coverage_rules:
-            try:
-                rule_start, rule_end = self._parse_time_range(rule["time_range"])
-                min_required = rule["min_people"]
-                
-                # 計算此時段有多少人上班
-                working_people = set()
-                for start_min, end_min, emp_name in timeline:
-                    # 判斷時間重疊
-                    if start_min < rule_end and end_min > rule_start:
-                        working_people.add(emp_name)
-                
-                actual_count = len(working_people)
-                if actual_count < min_required:
-                    warnings.append(
-                        f"Coverage Warning: {date_str} {rule['time_range']} 只有 {actual_count} 人 (需要 {min_required} 人)"
-                    )
-                
-                # NEW: 檢查是否超過最大人數限制
-                max_allowed = rule.get("max_people")
-                if max_allowed and actual_count > max_allowed:
-                    warnings.append(
-                        f"⚠️ 人數超標: {date_str} {rule['time_range']} 有 {actual_count} 人 (最多 {max_allowed} 人)"
-                    )
-                
-                # 檢查是否有必要角色列表 (例如: ["組長", "資深員工"])
-                required_roles = rule.get("required_roles", [])
-                # 兼容舊版單一角色欄位
-                if not required_roles and rule.get("required_role"):
-                    required_roles = [rule.get("required_role")]
-                
-                for role in required_roles:
-                    if not role: continue
-                    role_present = False
-                    for start_min, end_min, emp_name in timeline:
-                        if start_min < rule_end and end_min > rule_start:
-                            emp_data = next((e for e in self.employees if e['name'] == emp_name), None)
-                            if emp_data and role in emp_data.get('roles', []):
-                                role_present = True
-                                break
-                    
-                    if not role_present:
-                        warnings.append(
-                            f"Role Warning: {date_str} {rule['time_range']} 缺少必要角色 '{role}'"
-                        )
-            except:
-                continue
-        
-        return warnings
+        if date_str not in self.day_of_str:
+            return []
+        violations = [v for v in self._coverage_violations(self.day_of_str[date_str]) if v["type"] != "business_hours"]
+        return self._format_violations(violations, date_str)[0]
 
     def _validate_business_hours_coverage(self, date_str):
         """
         驗證營業時段是否有完整覆蓋 (Business Hours Coverage Validation)
         檢查營業時段內每個小時是否至少有1人上班
         """
-        warnings = []
-        
-        if not self.business_hours.get("enforce_coverage", False):
-            return warnings
-        
-        try:
-            biz_start = self._parse_time(self.business_hours["start"])
-            biz_end = self._parse_time(self.business_hours["end"])
-        except:
-            return warnings
-        
-        # 建立時間軸
-        timeline = []
-        if date_str not in self.schedule:
-            return warnings
-            
-        for shift_name, employees in self.schedule[date_str].items():
-            if not employees:
-                continue
-            
-            shift_time = self.shifts[shift_name].get("time", "00:00-23:59")
-            try:
-                segments = self._parse_shift_segments(shift_time)
-                for start_min, end_min in segments:
-                    for emp_name in employees:
-                        timeline.append((start_min, end_min, emp_name))
-            except:
-                continue
-        
-        # 檢查每個小時是否有人
-        gap_hours = []
-        current_hour = biz_start
+        if date_str not in self.day_of_str:
+            return []
+        violations = [v for v in self._coverage_violations(self.day_of_str[date_str]) if v["type"] == "business_hours"]
+        return self._format_violations(violations, date_str)[1]
+
+    # 預先分析的限制名稱 -> 說明
+    BINDING_LABELS = {
+        "no_shift": "沒有任何班別涵蓋此時段",
+        "available_staff": "當天可上相關班別的員工不足",
+        "headcount_cap": "相關班別的人數上限 (enforce_headcount) 低於需求",
+        "daily_limit": "每日人數上限低於需求",
+        "unknown_role": "沒有任何員工具備此角色",
+        "role_supply": "當天沒有具備此角色且可上相關班別的員工",
+    }
+
+    def analyze_feasibility(self):
+        """
+        排班前的可行性預先分析 (Pre-solve Feasibility Analysis)
+
+        只用編譯後的模型 (資格張量、班別人數上限、每日上限、覆蓋規則)，不需要排班。
+        資格只跟星期幾有關，因此每個星期幾算一次再對應到每一天:
+          - 每條覆蓋規則 / 營業時段能達到的人數上限
+            = min(可上相關班別的員工數, 相關班別人數上限總和, 每日人數上限)
+          - 每個必要角色的供給 (可上相關班別的角色持有人數)
+          - 每個基本時段 (IntervalGrid) 的人數上限與需求
+        上限低於需求的日子一定無法排出沒有關鍵違規的班表 (休息 / 連續上班限制只會讓上限更低)，
+        generate() 對這些日子不再重試。
+
+        回傳: Dict (可直接轉 JSON)
+          - feasible: 是否沒有可證明無解的日子
+          - infeasible_days: 可證明無解的日期
+          - days: {date_str: [issue, ...]}，issue 包含 type / time_range / required / upper_bound /
+                  binding (造成無解的限制) / role / message
+          - weekdays: 每個星期幾的可用員工數、角色供給、時段人數上限不足的時段
+          - elapsed_ms: 分析耗時
+        """
+        import time
         
-        while current_hour < biz_end:
-            hour_end = min(current_hour + 60, biz_end)
-            
-            # 檢查這個小時是否有人上班
-            has_coverage = False
-            for start_min, end_min, emp_name in timeline:
-                # 檢查重疊: shift開始 < hour結束 AND shift結束 > hour開始
-                if start_min < hour_end and end_min > current_hour:
-                    has_coverage = True
-                    break
+        start_time = time.perf_counter()
+        cov = self.coverage_index
+        grid = self.interval_grid
+        idx = self.shift_index
+        emp = self.employee_index
+        n_rules = len(cov.rules)
+        
+        enforce_limit = self.daily_limits.get('enforce_limit', True)
+        daily_cap = self.daily_limits.get('max_staff_per_day', 50) if enforce_limit else np.iinfo(np.int32).max
+        window_cap = np.minimum(cov.overlap @ np.minimum(idx.headcount_cap, np.iinfo(np.int32).max), np.iinfo(np.int32).max)
+        slot_cap = np.minimum(grid.cover.T.astype(np.int64) @ np.minimum(idx.headcount_cap, np.iinfo(np.int32).max), np.iinfo(np.int32).max)
+        general_demand, _ = self._build_demand_profile()
+        
+        def binding_of(has_shift, staff, cap):
+            if not has_shift:
+                return "no_shift"
+            bounds = {"available_staff": staff, "headcount_cap": cap, "daily_limit": daily_cap}
+            return min(bounds, key=bounds.get)
+        
+        weekday_issues = {}
+        weekdays = []
+        for weekday in range(7):
+            eligible = emp.eligibility[:, :, weekday]                               # E x S
+            window_staff = ((eligible.astype(np.int64) @ cov.overlap.T) > 0).sum(axis=0)  # 每個時段可上的員工數
+            window_upper = np.minimum(np.minimum(window_staff, window_cap), daily_cap)
+            has_shift = cov.overlap.any(axis=1)
             
-            if not has_coverage:
-                gap_hours.append(f"{current_hour//60:02d}:00-{hour_end//60:02d}:00")
+            issues = []
+            role_supply = {}
+            for k, rule in enumerate(cov.rules):
+                if window_upper[k] < rule["min"]:
+                    binding = binding_of(has_shift[k], window_staff[k], window_cap[k])
+                    issues.append({
+                        "type": "coverage", "time_range": rule["time_range"], "required": rule["min"],
+                        "upper_bound": int(window_upper[k]), "binding": binding, "role": None,
+                        "message": f"{rule['time_range']} 最多只能排 {int(window_upper[k])} 人 (需要 {rule['min']} 人): {self.BINDING_LABELS[binding]}",
+                    })
+                for role in rule["roles"]:
+                    rid = emp.role_ids.get(role)
+                    if rid is None:
+                        holders = 0
+                        binding = "unknown_role"
+                    else:
+                        holders = int((eligible[:, cov.overlap[k] > 0].any(axis=1) & emp.role_matrix[:, rid].astype(bool)).sum())
+                        binding = "role_supply" if has_shift[k] else "no_shift"
+                    role_supply[role] = min(role_supply.get(role, holders), holders)
+                    if holders == 0:
+                        issues.append({
+                            "type": "role", "time_range": rule["time_range"], "required": 1,
+                            "upper_bound": 0, "binding": binding, "role": role,
+                            "message": f"{rule['time_range']} 需要「{role}」: {self.BINDING_LABELS[binding]}",
+                        })
+            for j, (_, _, label) in enumerate(cov.hours):
+                k = n_rules + j
+                if window_upper[k] == 0:
+                    binding = binding_of(has_shift[k], window_staff[k], window_cap[k])
+                    issues.append({
+                        "type": "business_hours", "time_range": label, "required": 1,
+                        "upper_bound": 0, "binding": binding, "role": None,
+                        "message": f"營業時段 {label} 無法安排任何人: {self.BINDING_LABELS[binding]}",
+                    })
             
-            current_hour += 60
-        
-        if gap_hours:
-            warnings.append(
-                f"⚠️ 營業時段空窗警告 ({date_str}): {', '.join(gap_hours)} 沒有人上班！"
-            )
+            # 每個基本時段的人數上限 (與骨架需求曲線比較，僅供參考: 覆蓋規則以重疊計算)
+            slot_staff = ((eligible.astype(np.int64) @ grid.cover.astype(np.int64)) > 0).sum(axis=0)
+            slot_upper = np.minimum(np.minimum(slot_staff, slot_cap), daily_cap)
+            short = np.flatnonzero(slot_upper < general_demand)
+            weekday_issues[weekday] = issues
+            weekdays.append({
+                "weekday": weekday,
+                "available_staff": int(eligible.any(axis=1).sum()),
+                "role_supply": role_supply,
+                "slot_shortfalls": [
+                    {"start": f"{grid.bounds[i] // 60:02d}:{grid.bounds[i] % 60:02d}",
+                     "end": f"{grid.bounds[i + 1] // 60:02d}:{grid.bounds[i + 1] % 60:02d}",
+                     "demand": int(general_demand[i]), "upper_bound": int(slot_upper[i])}
+                    for i in short
+                ],
+            })
         
-        return warnings
+        days = {}
+        for day, date_str in enumerate(self.date_strs):
+            issues = weekday_issues[self.weekdays[day]]
+            if issues:
+                days[date_str] = issues
+        return {
+            "feasible": not days,
+            "infeasible_days": list(days),
+            "days": days,
+            "weekdays": weekdays,
+            "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 2),
+        }
 
     def _would_violate_max_people(self, date_str, shift_name, emp_name):
         """
@@ -779,16 +2397,8 @@ class SchedulerLogic:
             return False, ""
         
         # 取得此班別的時間範圍
-        if shift_name not in self.shifts:
-            return False, ""
-        
-        shift_time = self.shifts[shift_name].get("time")
-        if not shift_time:
-            return False, ""
-        
-        try:
-            segments = self._parse_shift_segments(shift_time)
-        except:
+        sid = self.shift_index.id_of.get(shift_name)
+        if sid is None or not self.shift_index.has_time[sid]:
             return False, ""
         
         # 檢查每一條有 max_people 的規則
@@ -801,36 +2411,20 @@ class SchedulerLogic:
                 rule_start, rule_end = self._parse_time_range(rule["time_range"])
                 
                 # 檢查此班別是否與規則時段重疊
-                is_overlap = False
-                for s_start, s_end in segments:
-                    if s_start < rule_end and s_end > rule_start:
-                        is_overlap = True
-                        break
-                        
-                if is_overlap:
+                if self.shift_index.overlaps(sid, rule_start, rule_end):
                     # 計算目前此時段有多少人（假設分配了這個員工）
                     working_people = set()
                     working_people.add(emp_name)  # 加入即將分配的人
                     
-                    for s_name, employees in self.schedule[date_str].items():
+                    for s_name, employees in self._day_schedule(self.day_of_str[date_str]).items():
                         if not employees:
                             continue
-                        s_time = self.shifts.get(s_name, {}).get("time")
-                        if not s_time:
+                        s_sid = self.shift_index.id_of.get(s_name)
+                        if s_sid is None or not self.shift_index.has_time[s_sid]:
                             continue
                         
-                        try:
-                            s_segments = self._parse_shift_segments(s_time)
-                            s_overlap = False
-                            for ss_start, ss_end in s_segments:
-                                if ss_start < rule_end and ss_end > rule_start:
-                                    s_overlap = True
-                                    break
-                            
-                            if s_overlap:
-                                working_people.update(employees)
-                        except:
-                            continue
+                        if self.shift_index.overlaps(s_sid, rule_start, rule_end):
+                            working_people.update(employees)
                     
                     if len(working_people) > max_allowed:
                         return True, f"會違反 {rule['time_range']} 最大人數限制 ({max_allowed}人)"
@@ -939,22 +2533,11 @@ class SchedulerLogic:
         suitable = []
         try:
             need_start, need_end = self._parse_time_range(time_range)
-            for shift_name, shift_info in self.shifts.items():
-                s_time = shift_info.get('time')
-                if not s_time:
-                    continue
-                
-                try:
-                    segments = self._parse_shift_segments(s_time)
-                    is_overlap = False
-                    for s_start, s_end in segments:
-                        if s_start < need_end and s_end > need_start:
-                            is_overlap = True
-                            break
-                    if is_overlap:
-                        suitable.append(shift_name)
-                except:
+            for sid, shift_name in enumerate(self.shift_index.names):
+                if not self.shift_index.has_time[sid]:
                     continue
+                if self.shift_index.overlaps(sid, need_start, need_end):
+                    suitable.append(shift_name)
         except:
             pass
         return suitable
@@ -974,41 +2557,26 @@ class SchedulerLogic:
         
         covered_people = set()
         
-        if date_str not in self.schedule:
+        if date_str not in self.day_of_str:
             return 0
         
-        for shift_name, emp_list in self.schedule[date_str].items():
+        for shift_name, emp_list in self._day_schedule(self.day_of_str[date_str]).items():
             if not emp_list:
                 continue
             
             # 檢查此班別是否覆蓋需求時段
-            shift_info = self.shifts.get(shift_name)
-            if not shift_info:
-                continue
-            
-            s_time = shift_info.get('time')
-            if not s_time:
+            sid = self.shift_index.id_of.get(shift_name)
+            if sid is None or not self.shift_index.has_time[sid]:
                 continue
             
-            try:
-                segments = self._parse_shift_segments(s_time)
-                is_overlap = False
-                for s_start, s_end in segments:
-                    if s_start < need_end and s_end > need_start:
-                        is_overlap = True
-                        break
-                
-                if is_overlap:
-                    for emp_name in emp_list:
-                        # 如果有角色要求,檢查員工是否符合
-                        if required_roles:
-                            emp = next((e for e in self.employees if e['name'] == emp_name), None)
-                            if emp and any(r in emp.get('roles', []) for r in required_roles):
-                                covered_people.add(emp_name)
-                        else:
+            if self.shift_index.overlaps(sid, need_start, need_end):
+                for emp_name in emp_list:
+                    # 如果有角色要求,檢查員工是否符合
+                    if required_roles:
+                        if self.employee_index.has_any_role(emp_name, required_roles):
                             covered_people.add(emp_name)
-            except:
-                continue
+                    else:
+                        covered_people.add(emp_name)
         
         return len(covered_people)
 
@@ -1020,104 +2588,90 @@ class SchedulerLogic:
         if required_roles is None:
             required_roles = []
         
-        perfect_matches = [] # 符合特定需求 (或一般需求的一般員工)
-        overqualified = []   # 符合一般需求，但擁有特殊角色 (應保留)
-        
-        for emp in self.employees:
-            # 檢查是否可上此班別
-            if shift_name not in emp.get('allowed_shifts', []):
-                continue
-            
-            emp_roles = emp.get('roles', [])
-            
-            # 1. 如果有特定角色需求
-            if required_roles:
-                if any(r in emp_roles for r in required_roles):
-                    perfect_matches.append(emp)
-                continue # 如果有需求限制，不符合者直接略過 (Strict Filtering)
-            
-            # 2. 如果是一般需求 (無特定角色)
-            # 檢查是否為"持有特殊角色的員工" (例如組長)
-            # 定義：持有非 '一般員工' 的角色視為特殊
-            is_special = any(r != "一般員工" and r != "一般員工" for r in emp_roles)
-            
-            if is_special:
-                overqualified.append(emp) # 保留實力，最後才用
-            else:
-                perfect_matches.append(emp) # 優先使用
-        
-        # 按公平性排序 (已排班數少的優先，且週末班加權扣分)
-        def get_shift_count(e):
-            hist = self.history[e['name']]
-            # 優先級分數 = 總班數 + (週末班數 * 1.5)
-            # 這樣可以讓已經上過週末班的人，排序往後移
-            return len(hist['worked_days']) + (hist.get('weekend_count', 0) * 1.5)
+        idx = self.employee_index
+        sid = self.shift_index.id_of.get(shift_name)
+        if sid is None:
+            return []
         
-        perfect_matches.sort(key=get_shift_count)
-        overqualified.sort(key=get_shift_count)
+        # 靜態資格張量: 可上此班別且當天星期可上班
+        mask = idx.eligibility[:, sid, self.weekdays[self.day_of[current_date]]]
+        eids, ranking = self._rank_candidates(mask, required_roles)
+        return [idx.records[eids[i]] for i in np.lexsort(ranking)]
+
+    def _employee_order_positions(self):
+        """每位員工在目前排列 (self.employee_order，可能已打亂) 中的位置，作為排序的最後依據"""
+        positions = np.zeros(len(self.employee_index), dtype=np.int64)
+        positions[self.employee_order] = np.arange(len(self.employee_order))
+        return positions
+
+    def _rank_candidates(self, mask, required_roles, order_pos=None):
+        """
+        從可用遮罩中取出候選人，並回傳 np.lexsort 用的排序鍵 (最後一個鍵優先)
+
+        1. 有特定角色需求: 只保留持有角色者 (Strict Filtering)
+        2. 一般需求: 一般員工優先 (perfect match)，持有特殊角色者 (例如組長) 最後才用 (overqualified)
+        3. 按公平性排序: 總班數 + (週末班數 * 1.5)，讓已經上過週末班的人排序往後移
+        4. 同分時依 self.employee_order 的順序
+
+        回傳: (eids, [order_pos, workload, group])
+        """
+        idx = self.employee_index
+        if required_roles:
+            mask = mask & idx.role_column(required_roles)
+        eids = np.flatnonzero(mask)
+        if order_pos is None:
+            order_pos = self._employee_order_positions()
         
         # 當沒有特定需求時，優先使用 perfect_matches (一般員工)，用光了才用 overqualified (組長)
         # 這樣可以避免組長被一般勤務消耗掉
-        return perfect_matches + overqualified
+        group = np.zeros(len(eids), dtype=np.int64) if required_roles else idx.special_mask[eids].astype(np.int64)
+        workload = self.days_worked[eids] + (self.weekend_count[eids] * 1.5)
+        return eids, [order_pos[eids], workload, group]
+
+    def _day_availability(self, day, include_assigned=False):
+        """
+        當日可用遮罩 (員工 x 班別)，每天只計算一次:
+        靜態資格張量 (班別 / 星期) & 不可排班的格子 & 連續上班 < MAX_CONSECUTIVE_DAYS 天 & 休息間隔 >= min_rest_hours & 當日尚未排班
+        include_assigned=True 時不排除當天已排班的人 (修補時換班用)
+        """
+        stats = self._counter_stats(day)
+        mask = self.employee_index.eligibility[:, :, self.weekdays[day]].copy()
+        mask &= ~self.blocked[day][:, None]
+        
+        # 勞基法/連續上班限制 (7天內必須休1天)
+        mask &= (stats["consecutive"] < self.MAX_CONSECUTIVE_DAYS)[:, None]
+        
+        # 休息時間間隔: 上一班 (班別 id) x 今天班別 查表
+        mask &= self._rest_gaps(day, stats["last_day"], stats["last_shift"]) >= self.min_rest_hours * 60
+        
+        # 當日已排班
+        if not include_assigned:
+            mask &= (self.assignment[day] < 0)[:, None]
+        return mask
 
     def _calculate_shift_hours(self, shift_name):
         """計算班別的總工時 (小時)"""
-        shift_info = self.shifts.get(shift_name)
-        if not shift_info: return 0.0
-        
-        time_str = shift_info.get("time", "")
-        # Use existing parsing logic if available or implement simplified version
-        try:
-            segments = self._parse_shift_segments(time_str)
-        except:
-            return 0.0
-            
-        total_minutes = 0
-        for start_min, end_min in segments:
-            duration = end_min - start_min
-            if duration < 0: duration += 24 * 60  # Cross midnight
-            total_minutes += duration
-            
-        return total_minutes / 60.0
+        sid = self.shift_index.id_of.get(shift_name)
+        if sid is None: return 0.0
+        return self.shift_index.total_minutes[sid] / 60.0
 
 
     def _update_employee_history(self, emp_name, date_str, shift_name):
-        """更新員工歷史紀錄"""
-        self.history[emp_name]['worked_days'].add(date_str)
-        self.history[emp_name]['consecutive_days'] += 1
-        
-        # 檢查是否為週末 (Sat=5, Sun=6)
-        try:
-            y, m, d = map(int, date_str.split('-'))
-            if date(y, m, d).weekday() >= 5:
-                self.history[emp_name]['weekend_count'] = self.history[emp_name].get('weekend_count', 0) + 1
-        except:
-            pass
-
-        # 更新最後下班時間
-        try:
-            shift_time = self.shifts[shift_name].get('time', '00:00-23:59')
-            segments = self._parse_shift_segments(shift_time)
-            if segments:
-                self.history[emp_name]['last_shift_end_minutes'] = segments[-1][1]
-        except:
-            pass
-
-        # 4. 更新累積工時
-        hours = self._calculate_shift_hours(shift_name)
-        self.history[emp_name]['total_hours'] = self.history[emp_name].get('total_hours', 0.0) + hours
+        """
+        記錄員工當天上班 (寫入 assignment 矩陣與計數器，重試時由 _restore_state 還原)
+        已上班天數、連續天數、週末班數、最後下班時間與工時都由矩陣推導
+        """
+        day = self.day_of_str[date_str]
+        eid = self.employee_index.id_of[emp_name]
+        self._set_assignment(day, eid, self.shift_index.id_of[shift_name])
 
     def get_schedule_dataframe(self):
         """將排班結果轉換為 Pandas DataFrame，方便顯示或匯出"""
         data = []
-        for d in self.dates:
-            d_str = d.strftime("%Y-%m-%d")
-            row = {"Date": d_str, "Weekday": d.strftime("%a")}
-            for s in self.shifts:
-                if d_str in self.schedule:
-                    row[s] = ", ".join(self.schedule[d_str].get(s, []))
-                else:
-                    row[s] = ""
+        for day, d in enumerate(self.dates):
+            row = {"Date": self.date_strs[day], "Weekday": d.strftime("%a")}
+            for s, people in self._day_schedule(day).items():
+                row[s] = ", ".join(people)
             data.append(row)
         
         return pd.DataFrame(data)
@@ -1128,30 +2682,17 @@ class SchedulerLogic:
         休息日顯示 'X'
         """
         import pandas as pd
-        dates_cols = [d.strftime("%Y-%m-%d") for d in self.dates]
+        dates_cols = self.date_strs
         
         data = []
         
-        # 建立快速查找表: Date -> Shift -> People
-        # 但我們需要 Employee -> Date -> Shift
-        emp_schedule = {e['name']: {} for e in self.employees}
+        # Employee -> Date -> Shift 直接取 assignment 的欄位 (一人一天一班)
+        shift_labels = np.array(list(self.shift_index.names) + ["X"], dtype=object)  # -1 -> 'X' (休息)
         
-        for d_str, shifts in self.schedule.items():
-            for s_name, people in shifts.items():
-                for p in people:
-                    if p in emp_schedule:
-                        # 假設一人一天一班
-                        emp_schedule[p][d_str] = s_name
-        
-        # 2. 填充資料
         for emp in self.employees:
             row = {"Name": emp['name'], "Roles": ",".join(emp.get('roles', []))}
-            
-            for d_str in dates_cols:
-                # 如果有排班顯示班別，否則顯示 'X' (休息)
-                val = emp_schedule[emp['name']].get(d_str, "X")
-                row[d_str] = val
-            
+            column = self.assignment[:, self.employee_index.id_of[emp['name']]]
+            row.update(zip(dates_cols, shift_labels[column]))
             data.append(row)
             
         return pd.DataFrame(data)
@@ -1160,13 +2701,8 @@ class SchedulerLogic:
     def _calculate_shift_utility(self, shift_name, needs):
         """Calculates utility score of a shift based on how many needs it covers."""
         score = 0
-        shift_info = self.shifts.get(shift_name)
-        if not shift_info: return 0
-        
-        try:
-            segments = self._parse_shift_segments(shift_info.get("time"))
-        except:
-            return 0
+        segments = self.shift_index.segments_of(shift_name)
+        if not segments: return 0
             
         for need in needs:
             # Need info: time_range, priority, min_people
@@ -1201,54 +2737,23 @@ class SchedulerLogic:
 
     def _get_shift_timeline(self, shift_name):
         """Get 5-min resolution timeline for a shift (1=active, 0=inactive)"""
-        timeline = [0] * 289 # 00:00 to 24:00 (last index 288 for 24:00)
-        shift_info = self.shifts.get(shift_name)
-        if not shift_info: return timeline
-        
-        try:
-            segments = self._parse_shift_segments(shift_info.get("time"))
-            for start, end in segments:
-                s_idx = max(0, int(start // 5))
-                e_idx = min(288, int(end // 5))
-                for i in range(s_idx, e_idx):
-                    timeline[i] = 1
-        except:
-            pass
-        return timeline
+        sid = self.shift_index.id_of.get(shift_name)
+        if sid is None: return [0] * (SLOTS_PER_DAY + 1) # 00:00 to 24:00 (last index 288 for 24:00)
+        return list(self.shift_index.slot_mask[sid])
 
-    def schedule_one_day(self, current_date):
+    def _parse_demand_windows(self):
         """
-        Constraint-First Scheduling Algorithm (Constraints -> Shifts -> People)
+        解析需求時段 (建構時一次)
+        回傳: List[(start, end, min_people, roles)] - 營業時段 (最少 1 人) 在前，覆蓋規則依序在後
         """
-        date_str = current_date.strftime("%Y-%m-%d")
-        day_log = []
-        
-        # Global Limits
-        max_daily_staff = self.daily_limits.get('max_staff_per_day', 50)
-        enforce_daily_limit = self.daily_limits.get('enforce_limit', True)
-
-        # Initialize schedule structure for today
-        self.schedule[date_str] = {s: [] for s in self.shifts}
-
-        # 1. Build Demand Profile (5-min resolution)
-        # 288 slots (5 mins per slot). 
-        T_MAX = 288
-        general_demand = [0] * T_MAX
-        role_demands = {} # role -> [0]*T_MAX
+        windows = []
         
-        # Helper to add demand
-        def add_demand(target_timeline, start, end, count):
-             s = max(0, int(start // 5))
-             e = min(T_MAX, int(end // 5))
-             for i in range(s, e):
-                 target_timeline[i] = max(target_timeline[i], count)
-
         # 1.1 Business Hours (Min 1 person) - General Demand
         if self.business_hours.get("enforce_coverage", False):
              try:
                  bs = self._parse_time(self.business_hours["start"])
                  be = self._parse_time(self.business_hours["end"])
-                 add_demand(general_demand, bs, be, 1)
+                 windows.append((bs, be, 1, []))
              except: pass
 
         # 1.2 Coverage Rules
@@ -1259,38 +2764,110 @@ class SchedulerLogic:
                  roles = rule.get("required_roles", [])
                  if not roles and rule.get("required_role"):
                      roles = [rule.get("required_role")]
-                 
-                 add_demand(general_demand, rs, re, needed)
-                 
-                 for r in roles:
-                     if r not in role_demands: role_demands[r] = [0] * T_MAX
-                     add_demand(role_demands[r], rs, re, 1) 
-             except: pass
+             except:
+                 continue
+             # 人數必須是數字 (與 CoverageIndex 相同，其他值略過整條規則)；
+             # 小數的人數無條件進位 (例如 2.5 人 -> 排 3 人才算達標)
+             if self._is_headcount(needed):
+                 windows.append((rs, re, int(np.ceil(needed)), roles))
+
+        return windows
+
+    def _build_demand_profile(self):
+        """
+        建立當日需求曲線 (Demand Profile，以基本時段表示，見 IntervalGrid)
+        回傳: (general_demand, role_demands)
+              general_demand: np.ndarray[K] 每個時段最少人數
+              role_demands: Dict[role, np.ndarray[K]] 每個時段需要的角色人數
+        """
+        grid = self.interval_grid
+        general_demand = np.zeros(len(grid), dtype=np.int32)
+        role_demands = {} # role -> np.ndarray[K]
+        
+        for start, end, needed, roles in self.demand_windows:
+            window = grid.window(start, end)
+            general_demand[window] = np.maximum(general_demand[window], needed)
+            for r in roles:
+                if r not in role_demands: role_demands[r] = np.zeros(len(grid), dtype=np.int32)
+                role_demands[r][window] = np.maximum(role_demands[r][window], 1)
+
+        return general_demand, role_demands
+
+    # 班別數達到這個值才做支配剪枝 (班別少時評分本身很便宜，支配分析的成本划不來)
+    DOMINANCE_MIN_SHIFTS = 150
+
+    def _build_skeleton(self, general_demand, role_demands, day_log):
+        """
+        向量化骨架建構 (Vectorized Skeleton Builder)
+
+        以貪婪法挑選班別覆蓋需求曲線: 先滿足角色需求，再滿足一般人數需求。
+        所有班別覆蓋是一個 (shifts x 基本時段) 矩陣，每一輪用一次依時段長度加權的
+        矩陣-向量乘法為所有班別評分，開頭對齊加分由 IntervalGrid.rise 查表取得。
+        所有邊界都在 5 分鐘整點時，評分與同分時的挑選順序 (班別設定順序中的第一個)
+        與逐格 (288 格) 掃描版本完全相同。
+        班別數達到 DOMINANCE_MIN_SHIFTS 時，被支配的班別 (見 _shift_dominance) 不評分，結果與全部評分完全相同；
+        每次評分的班別數 (scored) 與因支配而略過的班別數 (skipped) 累計在 self.dominance_stats。
+
+        回傳: List[(shift_name, required_role or None)]
+        """
+        idx = self.shift_index
+        grid = self.interval_grid
+        
+        # Global Limits
+        max_daily_staff = self.daily_limits.get('max_staff_per_day', 50)
+        enforce_daily_limit = self.daily_limits.get('enforce_limit', True)
 
-        # 2. Comparison Logic for Shifts
-        all_shift_timelines = {s: self._get_shift_timeline(s) for s in self.shifts}
+        timelines = grid.cover.astype(np.int32)  # (S, K)
+        weighted = grid.cover * grid.weights     # (S, K) 每個時段的上班分鐘數
         
         # Skeleton: List of (shift_name, assigned_role_filter)
         skeleton = []
-        current_general_coverage = [0] * T_MAX
-        current_role_coverage = {r: [0]*T_MAX for r in role_demands}
-        
-        # Helper: Check Shift Limits
-        def can_add_shift(s_name):
-            # 1. Daily Limit
-            if enforce_daily_limit and len(skeleton) >= max_daily_staff:
-                return False
-            # 2. Shift Specific Limit
-            s_info = self.shifts.get(s_name)
-            if s_info and s_info.get("enforce_headcount", False):
-                limit = s_info.get("required_people", 99)
-                current_count = sum(1 for s, _ in skeleton if s == s_name)
-                if current_count >= limit:
-                    return False
-            return True
+        skeleton_counts = np.zeros(len(idx), dtype=np.int32)
+        current_general_coverage = np.zeros(len(grid), dtype=np.int32)
+        current_role_coverage = {r: np.zeros(len(grid), dtype=np.int32) for r in role_demands}
+
+        # 可用的班別 (有時間、未達班別人數上限)，只有班別達到人數上限時才會改變
+        valid = idx.has_time_mask & (skeleton_counts < idx.headcount_cap)
+        stats = self.dominance_stats
+        prune = len(idx) >= self.DOMINANCE_MIN_SHIFTS
+
+        def scoring_set(demand, bonus):
+            # 要評分的班別: 可用、在需求時段內有上班、且沒有被仍可用的班別支配 (依設定順序)
+            if prune:
+                dominated, uncovered = self._shift_dominance(demand > 0)
+                active = np.flatnonzero(valid & ~uncovered & ~(dominated & valid[:, None]).any(axis=0))
+            else:
+                active = np.flatnonzero(valid)
+            return (active, weighted[active], grid.cover[active], grid.rise[active],
+                    np.arange(len(active)), np.broadcast_to(bonus, len(idx))[active], int(valid.sum()) - len(active))
+
+        def pick_best(unmet, scoring):
+            active, active_weighted, active_cover, active_rise, rows, bonus, pruned = scoring
+            stats["scored"] += len(active)
+            stats["skipped"] += pruned
+            if not len(active):
+                return None
+            # Utility: How much UNMET demand does each shift cover? (10 per 5 minutes)
+            covered = active_weighted @ unmet
+            # Start Alignment Bonus: 第一個未滿足時段剛好是班別開頭
+            aligned = active_rise[rows, np.argmax(active_cover & unmet, axis=1)]
+            # CHECK LIMITS: 無時間、已達班別人數上限的班別不在 active 中；完全沒覆蓋到的班別不考慮
+            scores = np.where(covered > 0, covered * 10 / SLOT_MINUTES + aligned * 500 + bonus, -1)
+            best = int(np.argmax(scores))
+            if scores[best] < 0:
+                return None
+            return int(active[best])
+
+        def commit(best):
+            skeleton_counts[best] += 1
+            if skeleton_counts[best] >= idx.headcount_cap[best]:
+                valid[best] = False
+                return True
+            return False
 
         # 3. Solve Role Demands First
         for role, r_demand in role_demands.items():
+             scoring = scoring_set(r_demand, idx.a2c_bonus)
              while True:
                  # Check Limit
                  if enforce_daily_limit and len(skeleton) >= max_daily_staff:
@@ -1298,171 +2875,215 @@ class SchedulerLogic:
                      break
 
                  # Check Unmet Role Demand
-                 unmet = [max(0, r_demand[i] - current_role_coverage[role][i]) for i in range(T_MAX)]
-                 if sum(unmet) == 0: break
-                 
-                 # Find best shift covering unmet
-                 best_s, best_score = None, -1
+                 unmet = r_demand > current_role_coverage[role]
+                 if not unmet.any(): break
                  
-                 for s_name, timeline in all_shift_timelines.items():
-                     if not self.shifts[s_name].get('time'): continue
-                     if not can_add_shift(s_name): continue # CHECK LIMITS
-
-                     # Utility: How much UNMET demand does it cover?
-                     score = 0
-                     covered_minutes = 0
-                     
-                     first_unmet = -1
-                     for k in range(T_MAX):
-                         if timeline[k] and unmet[k]:
-                             score += 10 # Base score per slot covered
-                             covered_minutes += 5
-                             if first_unmet == -1: first_unmet = k
-                     
-                     if covered_minutes == 0: continue
-                     
-                     # Start Alignment Bonus
-                     if first_unmet > 0 and timeline[first_unmet-1] == 0:
-                         score += 500 
-                     
-                     # A2C Bonus
-                     if "A2C" in s_name: score += 5
-                     
-                     if score > best_score:
-                         best_score = score
-                         best_s = s_name
+                 # Find best shift covering unmet (A2C Bonus)
+                 best = pick_best(unmet, scoring)
                  
-                 if not best_s:
+                 if best is None:
                      # Attempted all shifts, none valid (often due to limits)
                      day_log.append(f"⚠️ 無法滿足角色需求: {role} (可能因班別限制)")
                      break
                  
                  # Commit Shift
-                 skeleton.append((best_s, role))
+                 skeleton.append((idx.names[best], role))
+                 if commit(best):
+                     scoring = scoring_set(r_demand, idx.a2c_bonus)
                  # Update coverages
-                 tl = all_shift_timelines[best_s]
-                 for i in range(T_MAX):
-                     if tl[i]:
-                         current_general_coverage[i] += 1
-                         current_role_coverage[role][i] += 1
+                 current_general_coverage += timelines[best]
+                 current_role_coverage[role] += timelines[best]
         
         # 4. Solve General Demands
+        scoring = scoring_set(general_demand, 0)
         while True:
             # Check Limit
             if enforce_daily_limit and len(skeleton) >= max_daily_staff:
                  day_log.append(f"⚠️ 達到每日人數上限 ({max_daily_staff})，停止排班 (一般覆蓋)")
                  break
 
-            unmet = [max(0, general_demand[i] - current_general_coverage[i]) for i in range(T_MAX)]
-            if sum(unmet) == 0: break
+            unmet = general_demand > current_general_coverage
+            if not unmet.any(): break
             
-            best_s, best_score = None, -1
+            best = pick_best(unmet, scoring)
             
-            for s_name, timeline in all_shift_timelines.items():
-                if not self.shifts[s_name].get('time'): continue
-                if not can_add_shift(s_name): continue # CHECK LIMITS
-
-                score = 0
-                first_unmet = -1
-                for k in range(T_MAX):
-                    if timeline[k] and unmet[k]:
-                        score += 10
-                        if first_unmet == -1: first_unmet = k
-                
-                if score == 0: continue
-                
-                if first_unmet > 0 and timeline[first_unmet-1] == 0:
-                     score += 500 # Alignment Bonus
-                
-                if score > best_score:
-                    best_score = score
-                    best_s = s_name
-            
-            if not best_s:
+            if best is None:
                 day_log.append("⚠️ 無法滿足覆蓋需求 (一般) - 可能因班別限制或無合適班次")
                 break
             
-            skeleton.append((best_s, None))
-            tl = all_shift_timelines[best_s]
-            for i in range(T_MAX):
-                if tl[i]: current_general_coverage[i] += 1
+            skeleton.append((idx.names[best], None))
+            if commit(best):
+                scoring = scoring_set(general_demand, 0)
+            current_general_coverage += timelines[best]
+
+        return skeleton
+
+    def _shift_dominance(self, support):
+        """
+        班別支配分析 (Shift Dominance)，每個需求時段遮罩 support (需求 > 0 的基本時段) 只計算一次
+
+        骨架建構時未滿足的時段 U 一定在 support 之內。班別 j 支配班別 i (dominated[j, i]) 的條件:
+          - 在 support 內 i 的上班時段 ⊆ j 的上班時段 (對任何 U，j 覆蓋的未滿足分鐘數 >= i)
+          - 開頭對齊加分: 對任何 U，i 有加分時 j 也有 —
+            i 在 support 內的每個開頭時段也是 j 的開頭，且 j 多出來的時段中、位在 i 最後一個開頭之前的都是 j 的開頭
+          - A2C 加分 j >= i、可上 j 的員工包含所有可上 i 的員工 (同星期)
+          - j 在班別設定順序中較前面 (同分時骨架選的是前面的班別)
+        因此只要 j 仍可用 (未達人數上限)，i 的分數不會超過 j，也不會是同分中最前面的班別，略過 i 不影響結果。
+        uncovered[i]: i 在 support 內完全沒有上班時段，永遠不會被選到。
+        回傳: (dominated (S x S), uncovered (S,))
+        """
+        key = support.tobytes()
+        cached = self._dominance_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        idx = self.shift_index
+        grid = self.interval_grid
+        n_shift = len(idx)
+        cover = grid.cover & support              # (S, K)
+        rise = grid.rise & support
+        
+        # 在 support 內的時段包含關係: i 的時段都在 j 裡 (subset[j, i])
+        subset = ~(cover[None, :, :] & ~cover[:, None, :]).any(axis=2)
+        # i 的開頭也是 j 的開頭
+        same_rises = ~(rise[None, :, :] & ~grid.rise[:, None, :]).any(axis=2)
+        # j 多出來、位在 i 最後一個開頭之前的時段都必須是 j 的開頭
+        positions = np.arange(len(grid))
+        last_rise = np.where(rise.any(axis=1), len(grid) - 1 - np.argmax(rise[:, ::-1], axis=1), -1)
+        before = positions[None, :] < last_rise[:, None]                                  # (i, K)
+        extra = cover[:, None, :] & ~cover[None, :, :] & before[None, :, :]              # (j, i, K)
+        extra_rises = ~(extra & ~grid.rise[:, None, :]).any(axis=2)
+        # 可上 i 的員工 (各星期) 都可上 j — 同一等價類別的資格相同，每個類別檢查一位即可
+        eligibility = self.employee_index.eligibility[[members[0] for members in self.employee_index.classes]]
+        staff = ~(eligibility[:, None, :, :] & ~eligibility[:, :, None, :]).any(axis=(0, 3))
+        bonus = idx.a2c_bonus[:, None] >= idx.a2c_bonus[None, :]
+        earlier = np.arange(n_shift)[:, None] < np.arange(n_shift)[None, :]
+        
+        uncovered = ~cover.any(axis=1)
+        dominated = (subset & same_rises & extra_rises & staff & bonus & earlier
+                     & idx.has_time_mask[:, None] & ~uncovered[None, :])
+        
+        self._dominance_cache[key] = (dominated, uncovered)
+        self.dominance_stats["profiles"] += 1
+        self.dominance_stats["dominated_pairs"] += int(dominated.sum())
+        self.dominance_stats["uncovered_shifts"] += int(uncovered.sum())
+        return dominated, uncovered
+
+    def _demand_signature(self, general_demand, role_demands):
+        """
+        當日需求簽章 (骨架快取的 key)
+        包含需求曲線、角色需求 (依求解順序) 與會影響骨架的限制 (每日人數上限、班別人數上限)
+        """
+        return (
+            general_demand.tobytes(),
+            tuple((role, demand.tobytes()) for role, demand in role_demands.items()),
+            self.daily_limits.get('max_staff_per_day', 50),
+            self.daily_limits.get('enforce_limit', True),
+            self.shift_index.headcount_cap.tobytes(),
+        )
+
+    def _cached_skeleton(self, general_demand, role_demands, day_log):
+        """
+        以需求簽章快取骨架: 需求相同的日子 (例如整個月都一樣) 只求解一次，
+        之後直接取用並重放當時的骨架日誌。回傳新的 list (呼叫端可自由排序)
+        """
+        key = self._demand_signature(general_demand, role_demands)
+        cached = self._skeleton_cache.get(key)
+        if cached is None:
+            self.skeleton_cache_stats["misses"] += 1
+            skeleton_log = []
+            cached = (self._build_skeleton(general_demand, role_demands, skeleton_log), skeleton_log)
+            self._skeleton_cache[key] = cached
+        else:
+            self.skeleton_cache_stats["hits"] += 1
+        skeleton, skeleton_log = cached
+        day_log.extend(skeleton_log)
+        return list(skeleton)
+
+    def _fairness_scores(self, eids, sid, consecutive):
+        """
+        公平性分數 (越小越優先)，對一組員工向量化計算，全部由計數器 O(1) 取得
+        1. Total workload (fewer days worked = higher priority)
+        2. Shift diversity (penalize if person worked this shift type recently)
+
+        :param eids: 員工 id 陣列
+        :param sid: 要排的班別 id
+        :param consecutive: 所有員工到昨天為止的連續上班天數 (np.ndarray)
+        """
+        # 1. Shift Diversity: Count times worked THIS shift
+        total_days = self.days_worked[eids].astype(np.int64)
+        shift_count = self.shift_counts[eids, sid].astype(np.int64)
+        # 2. Consecutive Days Check (Up to yesterday)
+        streak = consecutive[eids].astype(np.int64)
+        
+        # 3. Monthly Minimum Hours Check
+        min_hours = self.daily_limits.get('min_monthly_hours', 0)
+        current_hours = self.minutes_worked[eids] / 60.0
+        # High negative score to prioritize (make it smaller than others)
+        # Use deficit * 50 to strongly push them to front
+        if min_hours > 0:
+            hours_deficit_priority = np.where(current_hours < min_hours, -((min_hours - current_hours) * 50), 0.0)
+        else:
+            hours_deficit_priority = np.zeros(len(eids))
+
+        # Scoring Weights
+        # Total Workload: 10 per day
+        # Shift Repetition: 50 per count (High penalty to force supervisor rotation)
+        # Consecutive Fatigue: Quadratic penalty (Streak^2 * 20)
+        # Hours Deficit: -50 per missing hour (Strong Priority)
+        return (total_days * 10 + shift_count * 50 + streak ** 2 * 20) + hours_deficit_priority
+
+    def schedule_one_day(self, current_date):
+        """
+        Constraint-First Scheduling Algorithm (Constraints -> Shifts -> People)
+        """
+        return self._schedule_day(self.day_of[current_date])
+
+    def _schedule_day(self, day):
+        """排定第 day 天 (整數索引)，回傳當日日誌"""
+        date_str = self.date_strs[day]
+        day_log = []
+        
+        # Global Limits
+        max_daily_staff = self.daily_limits.get('max_staff_per_day', 50)
+        enforce_daily_limit = self.daily_limits.get('enforce_limit', True)
+
+        # Initialize schedule structure for today (清空當天已有的排班)
+        for eid in np.flatnonzero(self.assignment[day] >= 0):
+            self._set_assignment(day, eid, -1)
+
+        # 1. Build Demand Profile (基本時段，見 IntervalGrid)
+        general_demand, role_demands = self._build_demand_profile()
+
+        # 2-4. Shifts skeleton: List of (shift_name, assigned_role_filter) (相同需求只求解一次)
+        skeleton = self._cached_skeleton(general_demand, role_demands, day_log)
         
         # 5. Assign People to Skeleton
         assigned_peeps = set()
+        
+        # 今日可用遮罩 (員工 x 班別): 靜態資格 + 連續上班 / 休息間隔 / 當日已排班，整天只算一次
+        available = self._day_availability(day)
+        order_pos = self._employee_order_positions()
+        # 連續上班天數 (到昨天為止；今天被排到的人不會再被挑選，因此整天共用)
+        consecutive = self._counter_stats(day)["consecutive"]
 
         skeleton.sort(key=lambda x: 0 if x[1] else 1) 
         
-        for shift_name, required_role in skeleton:
-            # Hard Safety Check (Should be handled by skeleton limiting, but safe to keep)
-            if enforce_daily_limit and len(assigned_peeps) >= max_daily_staff:
+        # Hard Safety Check (Should be handled by skeleton limiting, but safe to keep)
+        if enforce_daily_limit and len(skeleton) > max_daily_staff:
+            for shift_name, _ in skeleton[max_daily_staff:]:
                 day_log.append(f"⚠️ (Assign) 已達最大人數 {max_daily_staff}，略過 {shift_name}")
-                continue
-
-            # Find Candidate
-            role_filter = [required_role] if required_role else []
-            candidates = self._get_available_candidates(current_date, shift_name, role_filter)
-            
-            # Enhanced Fairness Sorting: 
-            # 1. Total workload (fewer days worked = higher priority)
-            # 2. Shift diversity (penalize if person worked this shift type recently)
-            def fairness_score(c):
-                name = c['name']
-                history = self.history[name]
-                total_days = len(history['worked_days'])
-                
-                # 1. Shift Diversity: Count times worked THIS shift
-                shift_count = 0
-                for d_str in history['worked_days']:
-                    if d_str in self.schedule:
-                        if name in self.schedule[d_str].get(shift_name, []):
-                            shift_count += 1
-                
-                # 2. Consecutive Days Check (Up to yesterday)
-                consecutive = history['consecutive_days']
-                
-                # 3. Monthly Minimum Hours Check
-                min_hours = self.daily_limits.get('min_monthly_hours', 0)
-                current_hours = history.get('total_hours', 0.0)
-                
-                hours_deficit_priority = 0
-                if min_hours > 0 and current_hours < min_hours:
-                    deficit = min_hours - current_hours
-                    # High negative score to prioritize (make it smaller than others)
-                    # Use deficit * 50 to strongly push them to front
-                    hours_deficit_priority = - (deficit * 50)
-
-                # Scoring Weights
-                # Total Workload: 10 per day
-                # Shift Repetition: 50 per count (High penalty to force supervisor rotation)
-                # Consecutive Fatigue: Quadratic penalty (Streak^2 * 20)
-                # Hours Deficit: -50 per missing hour (Strong Priority)
-                
-                score = (total_days * 10) + \
-                        (shift_count * 50) + \
-                        (consecutive ** 2 * 20) + \
-                        hours_deficit_priority
-                
-                return score
-            
-            candidates.sort(key=fairness_score)
-            
-            picked = None
-            for cand in candidates:
-                if cand['name'] not in assigned_peeps:
-                    is_ok, reason = self._is_available(cand, current_date, shift_name)
-                    if is_ok:
-                        if required_role and required_role not in cand.get('roles', []):
-                             continue
-                        picked = cand
-                        break
-            
-            if picked:
-                self.schedule[date_str][shift_name].append(picked['name'])
-                assigned_peeps.add(picked['name'])
-                self._update_employee_history(picked['name'], date_str, shift_name)
+            skeleton = skeleton[:max_daily_staff]
+        
+        # 一次求出整天的最佳分配 (最小成本二分匹配): 先讓補上的班次最多，再讓公平性成本總和最小
+        for (shift_name, required_role), picked in zip(skeleton, self._match_skeleton(skeleton, available, order_pos, consecutive)):
+            if picked is not None:
+                name = self.employee_index.names[picked]
+                assigned_peeps.add(name)
+                self._set_assignment(day, picked, self.shift_index.id_of[shift_name])
                 
                 if required_role:
-                    day_log.append(f"✓ {date_str} {shift_name} 指定 '{required_role}': {picked['name']}")
+                    day_log.append(f"✓ {date_str} {shift_name} 指定 '{required_role}': {name}")
             else:
                 role_msg = f"({required_role})" if required_role else ""
                 day_log.append(f"⚠️ 缺工警示: 無法找到人值班 {shift_name} {role_msg}")
@@ -1470,29 +3091,330 @@ class SchedulerLogic:
         day_log.append(f"📊 {date_str} 共分配 {len(assigned_peeps)} 人")
         return day_log
 
+    def _repair_day(self, day, violations, available=None):
+        """
+        針對性修補 (Targeted Repair): 依當天的結構化違規紀錄做局部調整，而不是整天重排
+
+        每一步只考慮涵蓋違規時段的班別 (coverage / role / business_hours 的時段)，候選移動:
+          - add:     加派一位當天未排班的人上涵蓋該時段的班別 (缺角色時只找持有人)
+          - change:  已排班的人改上涵蓋該時段的班別
+          - replace: 缺角色時，由未排班的角色持有人替換掉該班別中沒有此角色的人
+        同一班別 + 相同角色組合的人效果相同，只評估公平性分數最好的一位。
+        只接受讓關鍵缺口變小、max_people 超額不增加、且符合班別 / 每日人數上限的移動；
+        每次選缺口最小的移動 (同分取公平性較好者)，直到沒有關鍵違規或沒有可改善的移動。
+        寫入經過 _set_assignment，失敗時由呼叫端還原 (_restore_state)。
+
+        :param available: 可用遮罩 (員工 x 班別，選填)；預設為 _day_availability (只檢查之前的日子)
+        回傳: (是否已無關鍵違規, 修補日誌)
+        """
+        cov = self.coverage_index
+        idx = self.shift_index
+        names = self.employee_index.names
+        role_matrix = self.employee_index.role_matrix
+        max_daily_staff = self.daily_limits.get('max_staff_per_day', 50)
+        enforce_daily_limit = self.daily_limits.get('enforce_limit', True)
+        consecutive = self._counter_stats(day)["consecutive"]
+        eligible = self._day_availability(day, include_assigned=True) if available is None else available
+        row = self.assignment[day]
+        
+        # 違規時段 -> 重疊矩陣的列 (覆蓋規則在前、營業時段在後)
+        rule_row = {r["rule"]: k for k, r in enumerate(cov.rules)}
+        hour_row = {start: len(cov.rules) + j for j, (start, _, _) in enumerate(cov.hours)}
+        
+        def evaluate():
+            counts, role_counts = cov.profile(row)
+            return cov.penalty(counts, role_counts) + (counts,)
+        
+        deficit, excess, counts = evaluate()
+        log = []
+        for _ in range(2 * len(violations) + 4):
+            if deficit <= 0:
+                break
+            critical = [v for v in cov.violations(row) if v["critical"]]
+            rows = [rule_row[v["rule"]] if v["rule"] is not None else hour_row[v["start"]] for v in critical]
+            targets = np.flatnonzero(cov.overlap[rows].any(axis=0))
+            needed_roles = [self.employee_index.role_ids[v["role"]] for v in critical
+                            if v["type"] == "role" and v["role"] in self.employee_index.role_ids]
+            staffed = int((row >= 0).sum())
+            
+            moves = []
+            for sid in targets:
+                free = np.flatnonzero(eligible[:, sid] & (row < 0))
+                if len(free) and counts[sid] < idx.headcount_cap[sid] and not (enforce_daily_limit and staffed >= max_daily_staff):
+                    moves += [[(int(eid), int(sid))] for eid in self._repair_representatives(free, sid, consecutive)]
+                others = np.flatnonzero(eligible[:, sid] & (row >= 0) & (row != sid))
+                if len(others) and counts[sid] < idx.headcount_cap[sid]:
+                    moves += [[(int(eid), int(sid))] for eid in self._repair_representatives(others, sid, consecutive, row)]
+                for rid in needed_roles:
+                    holders = free[role_matrix[free, rid] > 0]
+                    lacking = np.flatnonzero((row == sid) & (role_matrix[:, rid] == 0))
+                    if len(holders) and len(lacking):
+                        holder = self._repair_representatives(holders, sid, consecutive)[0]
+                        worst = lacking[np.argmax(self._fairness_scores(lacking, sid, consecutive))]
+                        moves.append([(int(worst), -1), (int(holder), int(sid))])
+            
+            best = None
+            for move in moves:
+                undo = [(eid, int(row[eid])) for eid, _ in move]
+                for eid, sid in move:
+                    self._set_assignment(day, eid, sid)
+                new_deficit, new_excess, _ = evaluate()
+                for eid, sid in reversed(undo):
+                    self._set_assignment(day, eid, sid)
+                if new_deficit < deficit and new_excess <= excess and (best is None or new_deficit < best[0]):
+                    best = (new_deficit, move)
+            if best is None:
+                break
+            
+            for eid, sid in best[1]:
+                self._set_assignment(day, eid, sid)
+            deficit, excess, counts = evaluate()
+            log.append("🩹 修補: " + "，".join(
+                f"{names[eid]} {'休息' if sid < 0 else idx.names[sid]}" for eid, sid in best[1]))
+        return deficit <= 0, log
+
+    def _repair_representatives(self, eids, sid, consecutive, row=None):
+        """每組 (角色組合[, 目前班別]) 中公平性分數最好的員工 (修補時效果相同的人只評估一位)"""
+        order = eids[np.argsort(self._fairness_scores(eids, sid, consecutive), kind="stable")]
+        seen = set()
+        picked = []
+        for eid in order:
+            key = (self.employee_index.role_matrix[eid].tobytes(), None if row is None else int(row[eid]))
+            if key not in seen:
+                seen.add(key)
+                picked.append(eid)
+        return picked
+
+    # 匹配成本: 無法補上的班次 (角色班次比一般班次更不能缺)、不可行的配對
+    UNFILLED_COST = 1e9
+    UNFILLED_ROLE_COST = 2e9
+    INFEASIBLE_COST = 1e12
+    # 啟用 class_matching 時，候選人的類別平均人數達到這個值才改用類別層級的匹配 (_match_by_class)
+    CLASS_MATCH_MIN_SIZE = 8
+
+    def _match_skeleton(self, skeleton, available, order_pos, consecutive):
+        """
+        骨架班次 x 可用員工 的最小成本二分匹配 (Min-Cost Bipartite Matching)
+
+        成本 = 公平性分數 (_fairness_scores)，同分時依角色分組 / 工作量 (_rank_candidates 的排序鍵)；
+        不可上該班 (資格、休息、角色) 的配對為不可行。每個班次另有一個「不補」選項，
+        成本遠大於任何公平性成本，因此解會先讓補上的班次最多 (角色班次優先)，
+        再讓公平性成本總和最小。只有真的不存在完整匹配時才會留下缺工。
+        啟用 class_matching 且候選人多半屬於少數幾個類別時 (大型、同質的人力)，改用 _match_by_class。
+
+        :param skeleton: List[(shift_name, required_role or None)]
+        :param available: 當日可用遮罩 (員工 x 班別)
+        回傳: List[employee id or None]，與 skeleton 一一對應
+        """
+        if not skeleton:
+            return []
+        
+        # 候選人: 至少能上其中一個班次的員工 (欄位依員工順序，作為同分時的依據)
+        sids = [self.shift_index.id_of[shift_name] for shift_name, _ in skeleton]
+        eids = np.flatnonzero(available[:, sorted(set(sids))].any(axis=1))
+        eids = eids[np.argsort(order_pos[eids], kind="stable")]
+        
+        n_slots, n_cand = len(skeleton), len(eids)
+        col_of = np.zeros(len(self.employee_index), dtype=np.int64)
+        col_of[eids] = np.arange(n_cand)
+        rows_of = {}
+        for i, (sid, (_, required_role)) in enumerate(zip(sids, skeleton)):
+            rows_of.setdefault((sid, required_role), []).append(i)
+        
+        # 班次組 (相同班別 + 角色的班次): (列, 候選人, 成本, 不補的成本)
+        groups = []
+        for (sid, required_role), rows in rows_of.items():
+            role_filter = [required_role] if required_role else []
+            mask = np.zeros(len(self.employee_index), dtype=bool)
+            mask[eids] = available[eids, sid]
+            cand_ids, (_, workload, group) = self._rank_candidates(mask, role_filter, order_pos)
+            costs = self._fairness_scores(cand_ids, sid, consecutive) + group * 1e-3 + workload * 1e-6 if len(cand_ids) else np.zeros(0)
+            groups.append((rows, cand_ids, costs, self.UNFILLED_ROLE_COST if required_role else self.UNFILLED_COST))
+        
+        if self.class_matching and n_cand:
+            # 匹配用的類別: 等價類別再依當天可上的班別細分 (休息間隔、連續上班、不可排班等個人限制)，
+            # 同一類別的人可上的班次組完全相同
+            keys = np.column_stack([self.employee_index.class_of[eids], available[np.ix_(eids, sorted(set(sids)))]])
+            _, labels = np.unique(keys, axis=0, return_inverse=True)
+            match_class = np.zeros(len(self.employee_index), dtype=np.int64)
+            match_class[eids] = labels.ravel()
+            if n_cand >= self.CLASS_MATCH_MIN_SIZE * (int(labels.max()) + 1):
+                return self._match_by_class(n_slots, groups, order_pos, match_class)
+        
+        cost = np.full((n_slots, n_cand + n_slots), self.INFEASIBLE_COST)
+        for rows, cand_ids, costs, unfilled in groups:
+            if len(cand_ids):
+                cost[np.ix_(rows, col_of[cand_ids])] = costs
+            cost[rows, n_cand:] = unfilled
+        
+        match = self._min_cost_assignment(cost)
+        return [int(eids[col]) if col < n_cand else None for col in match]
+
+    def _match_by_class(self, n_slots, groups, order_pos, class_of):
+        """
+        類別層級的骨架匹配 (Class-level Matching)
+
+        同一類別的員工可上的班次組完全相同，先決定「類別 K 派幾人上班次組 g」，再在類別內依公平性成本挑人:
+          1. 最小成本流: 來源 -> 類別 (第 k 個單位的成本 = 類別中第 k 便宜的人，遞增) -> 班次組 (容量 = 類別人數)
+             -> 匯點 (容量 = 班次數)；另有 來源 -> 班次組 的「不補」邊。
+             每次沿最短路徑 (Bellman-Ford，節點數 = 類別數 + 班次組數) 增廣一個單位，共 n_slots 次
+          2. 挑人: 每個類別把 (成本, 員工順序) 最好的配對依序填入各班次組的名額，同一人只上一個班次
+             (類別中的人都能上該類別的每個班次組，名額一定填得滿)
+        補班次的結果 (「不補」的總成本，角色班次優先) 與 _min_cost_assignment 相同；決策的規模與員工人數無關，
+        班別之間的公平性差異 (同班別次數) 只在類別內挑人時考慮 (近似)。
+
+        :param groups: List[(列, 候選人 id, 成本, 不補的成本)] (見 _match_skeleton)
+        :param class_of: 員工 id -> 類別 (等價類別依當天可上的班別細分，見 _match_skeleton)
+        回傳格式同 _match_skeleton
+        """
+        # 每個 (類別, 班次組) 的候選人，依 (成本, 員工順序) 排序
+        members = {}
+        for g, (_, cand_ids, costs, _) in enumerate(groups):
+            classes = class_of[cand_ids]
+            for k in np.unique(classes):
+                sel = classes == k
+                order = np.lexsort((order_pos[cand_ids[sel]], costs[sel]))
+                members[(int(k), g)] = (cand_ids[sel][order], costs[sel][order])
+        class_list = sorted({k for k, _ in members})
+        # 類別的單位成本: 成員在各班次組中最低的成本，由小到大 (第 k 個單位 = 類別中第 k 便宜的人)
+        unit_cost = {}
+        for k in class_list:
+            best = {}
+            for (kk, g), (ids, costs) in members.items():
+                if kk == k:
+                    for eid, cost in zip(ids.tolist(), costs.tolist()):
+                        best[eid] = min(cost, best.get(eid, cost))
+            unit_cost[k] = sorted(best.values())
+        demand = [len(rows) for rows, _, _, _ in groups]
+        
+        # 1. 逐單位最短增廣路徑
+        flow = {key: 0 for key in members}
+        used = {k: 0 for k in class_list}
+        filled = [0] * len(groups)
+        inf = float("inf")
+        for _ in range(n_slots):
+            dist_k = {k: unit_cost[k][used[k]] if used[k] < len(unit_cost[k]) else inf for k in class_list}
+            prev_k = {k: None for k in class_list}             # 經由哪個班次組 (反向邊) 到達，None = 來源
+            dist_g = [unfilled for _, _, _, unfilled in groups]
+            prev_g = [None] * len(groups)                      # 經由哪個類別到達，None = 不補
+            for _ in range(len(class_list) + len(groups) + 1):
+                changed = False
+                for (k, g), (ids, _) in members.items():
+                    x = flow[(k, g)]
+                    if x < len(ids) and dist_k[k] < dist_g[g] - 1e-9:
+                        dist_g[g] = dist_k[k]
+                        prev_g[g] = k
+                        changed = True
+                    if x > 0 and dist_g[g] < dist_k[k] - 1e-9:
+                        dist_k[k] = dist_g[g]
+                        prev_k[k] = g
+                        changed = True
+                if not changed:
+                    break
+            open_groups = [g for g in range(len(groups)) if filled[g] < demand[g]]
+            g = min(open_groups, key=lambda j: dist_g[j])
+            filled[g] += 1
+            # 沿路徑回溯: 類別 -> 班次組 為正向 (+1)，班次組 -> 類別 為反向 (-1)
+            while prev_g[g] is not None:
+                k = prev_g[g]
+                flow[(k, g)] += 1
+                if prev_k[k] is None:
+                    used[k] += 1
+                    break
+                g = prev_k[k]
+                flow[(k, g)] -= 1
+        
+        # 2. 類別內挑人
+        picked = [[] for _ in groups]
+        taken = set()
+        for k in class_list:
+            pairs = [(cost, order_pos[eid], g, eid)
+                     for (kk, g), (ids, costs) in members.items() if kk == k and flow[(k, g)] > 0
+                     for eid, cost in zip(ids.tolist(), costs.tolist())]
+            quota = {g: flow[(k, g)] for (kk, g) in members if kk == k}
+            for cost, _, g, eid in sorted(pairs):
+                if quota[g] > 0 and eid not in taken:
+                    quota[g] -= 1
+                    taken.add(eid)
+                    picked[g].append((cost, eid))
+        
+        result = [None] * n_slots
+        for (rows, _, _, _), people in zip(groups, picked):
+            for row, (_, eid) in zip(rows, sorted(people)):
+                result[row] = eid
+        return result
+
+    @staticmethod
+    def _min_cost_assignment(cost):
+        """
+        匈牙利演算法 (Hungarian algorithm, O(n^2 m)，內層以 NumPy 向量化)
+        cost: (n x m) 成本矩陣，n <= m
+        回傳: 每一列分配到的欄位 (List[int])，總成本最小
+        """
+        n, m = cost.shape
+        u = np.zeros(n + 1)
+        v = np.zeros(m + 1)
+        p = np.zeros(m + 1, dtype=np.int64)    # p[j]: 欄 j 配給第幾列 (1-based，0 = 未配)
+        way = np.zeros(m + 1, dtype=np.int64)
+        for i in range(1, n + 1):
+            p[0] = i
+            j0 = 0
+            minv = np.full(m + 1, np.inf)
+            used = np.zeros(m + 1, dtype=bool)
+            while True:
+                used[j0] = True
+                i0 = p[j0]
+                free = ~used[1:]
+                cur = cost[i0 - 1] - u[i0] - v[1:]
+                better = free & (cur < minv[1:])
+                minv[1:][better] = cur[better]
+                way[1:][better] = j0
+                candidates = np.where(free, minv[1:], np.inf)
+                j1 = int(np.argmin(candidates)) + 1
+                delta = candidates[j1 - 1]
+                used_cols = np.flatnonzero(used)
+                u[p[used_cols]] += delta
+                v[used_cols] -= delta
+                minv[1:][free] -= delta
+                j0 = j1
+                if p[j0] == 0:
+                    break
+            # 沿著增廣路徑翻轉
+            while j0:
+                j1 = way[j0]
+                p[j0] = p[j1]
+                j0 = j1
+        
+        result = [0] * n
+        for j in range(1, m + 1):
+            if p[j]:
+                result[p[j] - 1] = j - 1
+        return result
+
     def get_employee_status_snapshot(self, current_date):
         """
         取得當天所有員工的狀態快照 (Status Snapshot)
         用於除錯介面，顯示誰可以上班、誰不行及其原因。
         """
         snapshot = []
-        date_str = current_date.strftime("%Y-%m-%d")
+        day = self.day_of[current_date]
+        # 連續上班天數 (含當天)
+        stats = self._employee_stats(day + 1)
         
         for emp in self.employees:
             name = emp['name']
             
             # 重新檢查可用性邏輯以供顯示
-            weekday = current_date.weekday()
-            is_weekday_ok = weekday in emp.get('available_weekdays', [])
+            weekday = self.weekdays[day]
+            is_weekday_ok = self.employee_index.works_weekday(name, weekday)
             
-            cons_days = self.history[name]["consecutive_days"]
-            is_cons_ok = cons_days < 6
+            eid = self.employee_index.id_of[name]
+            cons_days = int(stats["consecutive"][eid])
+            is_cons_ok = cons_days < self.MAX_CONSECUTIVE_DAYS
             
             assigned_shifts = []
-            if date_str in self.schedule:
-                for s, ppl in self.schedule[date_str].items():
-                    if name in ppl:
-                        assigned_shifts.append(s)
+            if self.assignment[day, eid] >= 0:
+                assigned_shifts.append(self.shift_index.names[self.assignment[day, eid]])
             
             snapshot.append({
                 "Name": name,
@@ -1503,3 +3425,265 @@ class SchedulerLogic:
                 "Reason (If No)": "休假日" if not is_weekday_ok else ("達到連續上班限制" if not is_cons_ok else "-")
             })
         return snapshot
+
+
+
+class MultiSiteScheduler:
+    """
+    多據點排班 (Multi-site Scheduling): 每個據點一份設定，部分員工 (共用人力 / float pool) 可在多個據點上班
+
+    每個據點仍是獨立的 SchedulerLogic，在各自的行程中求解，不建一個跨據點的大模型；
+    共用員工由協調步驟以「每日保留 (reservation)」處理:
+      1. 各據點平行執行 generate (彼此不知道對方的班表)
+      2. 協調: 共用員工同一天被多個據點排班時，以邊際價值競標 — 拿掉這個人後當天覆蓋缺口增加最多的
+         據點得標 (同分時以 shared_employees 列出的順序為準)，其餘據點讓出這一格；
+         跨據點的休息間隔不足、或連續上班超過 6 天時，由較晚那一天的據點讓出
+      3. 讓出格子的據點以 replan 增量重排 (只動受影響的日子)；共用員工在其他據點已保留的日子
+         以 unavailable 傳入，重排時不會再排進去
+    重複 2~3 直到沒有衝突；MAX_ROUNDS 輪後仍有衝突時，讓出的格子直接改為休息。
+    """
+    MAX_ROUNDS = 8
+
+    def __init__(self, sites, shared_employees, year=None, month=None, start_date=None, end_date=None):
+        """
+        :param sites: 據點設定 {site_id: {"employees_config": ..., "shifts_config": ..., "coverage_rules": ...,
+               "daily_limits": ..., "business_hours": ..., "holidays": ...}} (同 SchedulerLogic 的建構參數)
+        :param shared_employees: 共用員工 {name: [site_id, ...]}，員工必須出現在這些據點的 employees_config 中
+        :param year / month / start_date / end_date: 排班區間 (同 SchedulerLogic，所有據點共用)
+        """
+        self.sites = dict(sites)
+        self.site_kwargs = {
+            site: dict(config, year=year, month=month, start_date=start_date, end_date=end_date)
+            for site, config in self.sites.items()
+        }
+        # 各據點在主行程的編譯結果 (協調時查詢日期、班別時間與覆蓋罰分，最後載入結果)
+        self.schedulers = {site: SchedulerLogic(**kwargs) for site, kwargs in self.site_kwargs.items()}
+        first = next(iter(self.schedulers.values()))
+        self.date_strs = first.date_strs
+        self.num_days = first.num_days
+        
+        # 共用員工: name -> [(site, eid), ...] (依列出的順序，競標同分時前面的優先)
+        self.warnings = []
+        self.shared = {}
+        for name, site_ids in shared_employees.items():
+            members = []
+            for site in site_ids:
+                scheduler = self.schedulers.get(site)
+                eid = scheduler.employee_index.id_of.get(name) if scheduler else None
+                if eid is None:
+                    self.warnings.append(f"⚠️ 共用員工 {name} 不在據點 {site} 的員工設定中，略過")
+                    continue
+                members.append((site, eid))
+            if len(members) > 1:
+                self.shared[name] = members
+        self.reservations = {}
+
+    def generate(self, max_retries=5, seed=None, workers=None, node_limit=5000, time_budget_s=None):
+        """
+        平行排班 + 協調共用員工
+
+        :param seed: 隨機種子 (選填，每個據點使用同一個 seed)
+        :param workers: 行程數 (選填，預設為 CPU 核心數，1 = 不開行程池)
+        :param node_limit: 每次重排 (replan) 的分支定界節點上限
+        :param time_budget_s: 每個據點 generate 的時間預算 (秒，選填，見 SchedulerLogic.generate)
+        回傳: (schedules, log) - schedules = {site_id: schedule 字典}
+              各據點的最終結果載入 self.schedulers (含 objective)，各據點的日誌在 self.site_logs；
+              計時在 self.site_timings (每個據點) 與 self.timings (整體)；
+              共用員工的保留結果在 self.reservations {(name, date_str): site_id}
+        """
+        import os
+        import time
+        
+        start_time = time.perf_counter()
+        sites = list(self.sites)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(sites)))
+        pool = None
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=workers)
+        run = pool.map if pool else map
+        
+        self.reservations = {}
+        self.released = {site: set() for site in sites}
+        self.site_logs = {site: [] for site in sites}
+        self.site_timings = {site: {"generate": 0.0, "replan": 0.0, "replans": 0} for site in sites}
+        assignments = {}
+        phase = {"solve": 0.0, "reconcile": 0.0, "replan": 0.0}
+        rounds = resolved = 0
+        try:
+            # 1. 各據點平行排班
+            phase_start = time.perf_counter()
+            n = len(sites)
+            for site, assignment, site_log, elapsed in run(_multi_site_generate, sites, [self.site_kwargs[s] for s in sites],
+                                                            [max_retries] * n, [seed] * n, [time_budget_s] * n):
+                assignments[site] = assignment
+                self.site_logs[site] += site_log
+                self.site_timings[site]["generate"] = elapsed
+            phase["solve"] = time.perf_counter() - phase_start
+            
+            # 2~3. 協調 -> 讓出格子的據點重排
+            for rounds in range(1, self.MAX_ROUNDS + 1):
+                phase_start = time.perf_counter()
+                lost = self._reconcile(assignments)
+                phase["reconcile"] += time.perf_counter() - phase_start
+                if not lost:
+                    break
+                resolved += sum(len(cells) for cells in lost.values())
+                for site, cells in lost.items():
+                    self.released[site] |= cells
+                if rounds == self.MAX_ROUNDS:
+                    # 只把格子改為休息不會產生新的衝突
+                    for site, cells in lost.items():
+                        for day, eid in cells:
+                            assignments[site][day, eid] = -1
+                        self.site_logs[site].append(f"⚠️ 協調 {rounds} 輪仍有衝突，直接讓出 {len(cells)} 格")
+                    break
+                
+                phase_start = time.perf_counter()
+                losers = list(lost)
+                n = len(losers)
+                for site, assignment, site_log, elapsed in run(
+                        _multi_site_replan, losers, [self._site_config(s) for s in losers], [assignments[s] for s in losers],
+                        [self._lost_events(s, lost[s]) for s in losers], [node_limit] * n):
+                    assignments[site] = assignment
+                    self.site_logs[site] += site_log
+                    self.site_timings[site]["replan"] += elapsed
+                    self.site_timings[site]["replans"] += 1
+                phase["replan"] += time.perf_counter() - phase_start
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        for site in sites:
+            scheduler = self.schedulers[site]
+            scheduler._load_assignment(assignments[site])
+            scheduler.objective = scheduler._schedule_objective()
+            timing = self.site_timings[site]
+            timing["total"] = timing["generate"] + timing["replan"]
+            for key in ("generate", "replan", "total"):
+                timing[key] = round(timing[key], 3)
+        self.reservations = {(name, self.date_strs[day]): site for (name, day), site in self.reservations.items()}
+        
+        elapsed = time.perf_counter() - start_time
+        self.timings = {key: round(value, 3) for key, value in phase.items()}
+        self.timings.update(total=round(elapsed, 3), rounds=rounds, resolved=resolved, workers=workers)
+        summary = [
+            f"🏬 多據點排班 (Multi-site): {len(sites)} 個據點，{len(self.shared)} 位共用員工，{workers} 個行程，"
+            f"協調 {rounds} 輪，化解 {resolved} 個衝突，總耗時 {elapsed:.2f} 秒",
+            f"  平行排班 {self.timings['solve']} 秒 / 協調 {self.timings['reconcile']} 秒 / 重排 {self.timings['replan']} 秒",
+        ]
+        for site in sites:
+            timing = self.site_timings[site]
+            summary.append(f"  {site}: 排班 {timing['generate']} 秒、重排 {timing['replans']} 次 {timing['replan']} 秒，"
+                           f"目標分數 {self.schedulers[site].objective['total']}")
+        return {site: self.schedulers[site].schedule for site in sites}, summary + self.warnings
+
+    def _site_config(self, site):
+        """
+        據點的建構參數，加上不可排班的格子 (unavailable): 共用員工在其他據點保留的日子，
+        以及這個據點讓出過的格子 (讓出後不再排回，避免同一個衝突來回出現)
+        """
+        kwargs = dict(self.site_kwargs[site])
+        blocked = [
+            {"person": name, "date": self.date_strs[day]}
+            for (name, day), holder in self.reservations.items()
+            if holder != site and any(member == site for member, _ in self.shared[name])
+        ]
+        kwargs["unavailable"] = list(kwargs.get("unavailable") or []) + blocked + self._lost_events(site, self.released[site])
+        return kwargs
+
+    def _lost_events(self, site, cells):
+        """讓出的格子 -> replan 的請假事件"""
+        names = self.schedulers[site].employee_index.names
+        return [{"person": names[eid], "date": self.date_strs[day]} for day, eid in sorted(cells)]
+
+    def _reconcile(self, assignments):
+        """
+        協調一輪: 依目前各據點的班表重建共用員工的保留 (self.reservations: (name, day) -> site)
+        回傳: 必須讓出的格子 {site: {(day, eid), ...}} (沒有衝突時為空)
+        """
+        lost = {}
+        self.reservations = {}
+        for name, members in self.shared.items():
+            rank = {site: k for k, (site, _) in enumerate(members)}
+            timeline = {}  # day -> (site, eid, sid)
+            for day in range(self.num_days):
+                booked = [(site, eid, int(assignments[site][day, eid])) for site, eid in members if assignments[site][day, eid] >= 0]
+                if len(booked) > 1:
+                    winner = max(booked, key=lambda b: (self._marginal_value(b[0], assignments[b[0]][day], b[1]), -rank[b[0]]))
+                    for site, eid, _ in booked:
+                        if site != winner[0]:
+                            lost.setdefault(site, set()).add((day, eid))
+                    booked = [winner]
+                if booked:
+                    timeline[day] = booked[0]
+            
+            # 跨據點的休息間隔與連續上班 (同一據點內的已由該據點檢查)
+            prev = None
+            run = 0
+            for day in sorted(timeline):
+                site, eid, sid = timeline[day]
+                run = run + 1 if prev is not None and day == prev + 1 else 1
+                if run > self.schedulers[site].MAX_CONSECUTIVE_DAYS or (prev is not None and not self._rest_ok(timeline[prev], prev, timeline[day], day)):
+                    lost.setdefault(site, set()).add((day, eid))
+                    continue
+                prev = day
+                self.reservations[(name, day)] = site
+        return lost
+
+    def _marginal_value(self, site, row, eid):
+        """據點當天拿掉 eid 後增加的覆蓋缺口 (競標的出價)"""
+        cov = self.schedulers[site].coverage_index
+        deficit, _ = cov.penalty(*cov.profile(row))
+        row = row.copy()
+        row[eid] = -1
+        without, _ = cov.penalty(*cov.profile(row))
+        return without - deficit
+
+    def _rest_ok(self, earlier, earlier_day, later, later_day):
+        """兩個據點的班別之間休息間隔是否足夠 (門檻取兩個據點中較嚴格的 min_rest_hours)"""
+        site_a, _, sid_a = earlier
+        site_b, _, sid_b = later
+        if site_a == site_b:
+            return True
+        a, b = self.schedulers[site_a], self.schedulers[site_b]
+        if not (a.shift_index.rest_timed[sid_a] and b.shift_index.rest_timed[sid_b]):
+            return True
+        min_rest = max(a.min_rest_hours, b.min_rest_hours) * 60
+        rest = (later_day - earlier_day) * 24 * 60 + b.shift_index.first_start_arr[sid_b] - a.shift_index.end_abs_arr[sid_a]
+        return rest >= min_rest
+
+# 多起點排班的 worker (ProcessPoolExecutor)
+# 設定在 initializer 中只傳送、編譯一次，之後每個任務只需要 seed
+_WORKER_SCHEDULER = None
+
+
+def _multi_start_init(config_kwargs):
+    global _WORKER_SCHEDULER
+    _WORKER_SCHEDULER = SchedulerLogic(**config_kwargs)
+
+
+def _multi_start_run(max_retries, seed):
+    scheduler = _WORKER_SCHEDULER
+    _, log = scheduler.generate(max_retries=max_retries, seed=seed)
+    return seed, scheduler.assignment.copy(), log, scheduler.objective
+
+
+# 多據點排班的 worker: 每個據點的設定不同，每個任務自己建構 SchedulerLogic
+def _multi_site_generate(site, config_kwargs, max_retries, seed, time_budget_s):
+    import time
+    start_time = time.perf_counter()
+    scheduler = SchedulerLogic(**config_kwargs)
+    _, log = scheduler.generate(max_retries=max_retries, seed=seed, time_budget_s=time_budget_s)
+    return site, scheduler.assignment.copy(), log, time.perf_counter() - start_time
+
+
+def _multi_site_replan(site, config_kwargs, assignment, events, node_limit):
+    import time
+    start_time = time.perf_counter()
+    scheduler = SchedulerLogic(**config_kwargs)
+    scheduler._load_assignment(assignment)
+    _, log = scheduler.replan(scheduler.schedule, events, node_limit=node_limit)
+    return site, scheduler.assignment.copy(), log, time.perf_counter() - start_time
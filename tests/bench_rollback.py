@@ -0,0 +1,140 @@
+"""
+重試回滾效能比較 (Rollback Benchmark): 舊版字典快照 vs. NumPy 狀態快照
+
+情境: 31 天 x 500 位員工，先排好整個月，再模擬每一天的每次重試 (重放當天的寫入後還原):
+  - dict:    舊做法 (DayJournal 之前)，每次嘗試前複製整個月份的 schedule 字典與每位員工的 history 字典，
+             失敗時換回快照
+  - copy:    目前的做法 (_snapshot_state / _restore_state)，複製 assignment 矩陣與所有員工計數器，失敗時還原
+每種做法另外量一次只重放寫入 (不快照 / 回滾) 的時間，兩者相減即為每次嘗試的回滾成本。
+
+用法: python tests/bench_rollback.py [員工數] [每天重試次數]
+"""
+import sys
+import os
+import time
+import tracemalloc
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.scheduler_logic import SchedulerLogic
+
+N_EMPLOYEES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+RETRIES = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 60, "enforce_headcount": True},
+    "B": {"time": "11:00-19:00", "required_people": 60, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 60, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"Emp{i:04d}", "available_weekdays": list(range(7)), "allowed_shifts": ["A", "B", "C"], "roles": ["一般員工"]}
+    for i in range(N_EMPLOYEES)
+]
+coverage_rules = [{"time_range": "07:00-22:00", "min_people": N_EMPLOYEES // 3}]
+daily_limits = {"max_staff_per_day": N_EMPLOYEES, "enforce_limit": False}
+
+
+def build_month():
+    scheduler = SchedulerLogic(2026, 1, employees, shifts, coverage_rules, daily_limits)
+    scheduler.generate(max_retries=1)
+    return scheduler
+
+
+def replay_day(scheduler, day, day_row):
+    """重放某一天的寫入 (與 schedule_one_day 相同的寫入量: 先清空當天，再逐人排入)"""
+    date_str = scheduler.dates[day].strftime("%Y-%m-%d")
+    for eid in np.flatnonzero(scheduler.assignment[day] >= 0):
+        scheduler._set_assignment(day, eid, -1)
+    for eid in np.flatnonzero(day_row >= 0):
+        scheduler._update_employee_history(scheduler.employee_index.names[eid], date_str, scheduler.shift_index.names[day_row[eid]])
+
+
+def dict_state(scheduler):
+    """把整月的狀態轉成舊版的資料結構: schedule {date: {shift: [names]}} 與 history {name: {...}}"""
+    history = {}
+    for eid, name in enumerate(scheduler.employee_index.names):
+        worked = np.flatnonzero(scheduler.assignment[:, eid] >= 0)
+        history[name] = {
+            "worked_days": {scheduler.date_strs[day] for day in worked},
+            "consecutive_days": int(scheduler.streak[eid]),
+            "last_shift_end_minutes": None,
+            "total_hours": scheduler.minutes_worked[eid] / 60.0,
+        }
+    return scheduler.schedule, history
+
+
+def bench_dict(scheduler, schedule, history, rollback=True):
+    """重現舊版 generate 的快照: 每次嘗試前整份複製 schedule 與 history，失敗時換回"""
+    hours = {shift_name: scheduler._calculate_shift_hours(shift_name) for shift_name in scheduler.shifts}
+    for date_str in scheduler.date_strs:
+        day_schedule = {shift: list(people) for shift, people in schedule[date_str].items()}
+        for _ in range(RETRIES):
+            if rollback:
+                saved_schedule = {k: {s: list(v) for s, v in shifts.items()} for k, shifts in schedule.items()}
+                saved_history = {
+                    name: {
+                        "worked_days": set(hist["worked_days"]),
+                        "consecutive_days": hist["consecutive_days"],
+                        "last_shift_end_minutes": hist["last_shift_end_minutes"],
+                        "total_hours": hist.get("total_hours", 0.0)
+                    }
+                    for name, hist in history.items()
+                }
+            # 與舊版 schedule_one_day / _update_employee_history 相同的寫入
+            schedule[date_str] = {shift: [] for shift in day_schedule}
+            for shift_name, people in day_schedule.items():
+                for name in people:
+                    schedule[date_str][shift_name].append(name)
+                    hist = history[name]
+                    hist["worked_days"].add(date_str)
+                    hist["consecutive_days"] += 1
+                    hist["total_hours"] += hours[shift_name]
+            if rollback:
+                schedule, history = saved_schedule, saved_history
+
+
+def bench_copy(scheduler, rollback=True):
+    for day in range(scheduler.num_days):
+        day_row = scheduler.assignment[day].copy()
+        for _ in range(RETRIES):
+            if rollback:
+                snapshot = scheduler._snapshot_state()
+            replay_day(scheduler, day, day_row)
+            if rollback:
+                scheduler._restore_state(snapshot)
+
+
+def run(fn, month, setup, trace=False, **kwargs):
+    scheduler = SchedulerLogic(2026, 1, employees, shifts, coverage_rules, daily_limits)
+    scheduler._load_assignment(month.assignment)
+    args = setup(scheduler) if setup else ()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    fn(scheduler, *args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def measure(label, fn, month, setup=None):
+    """
+    回滾成本 = 含快照 / 回滾的總時間 - 只重放寫入的時間 (同一種資料結構)
+    時間與峰值記憶體分開量測 (tracemalloc 會拖慢每一次配置，計時時不開啟)
+    """
+    elapsed, _ = run(fn, month, setup)
+    replay, _ = run(fn, month, setup, rollback=False)
+    _, peak = run(fn, month, setup, trace=True)
+    attempts = len(month.dates) * RETRIES
+    overhead = max(elapsed - replay, 0.0) / attempts
+    print(f"{label:<8} {elapsed:8.3f} 秒 (只重放 {replay:6.3f} 秒)   每次回滾 {overhead * 1000:7.3f} 毫秒   "
+          f"峰值記憶體 {peak / 1024 / 1024:6.2f} MB")
+    return overhead, peak
+
+
+if __name__ == "__main__":
+    print(f"=== Rollback Benchmark: 31 天 x {N_EMPLOYEES} 位員工, 每天 {RETRIES} 次嘗試 ===")
+    month = build_month()
+    measure("dict", bench_dict, month, setup=dict_state)
+    measure("copy", bench_copy, month)
@@ -0,0 +1,107 @@
+import copy
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 3, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 3, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"E{i:02d}", "allowed_shifts": ["A", "C"] if i % 3 else ["A"],
+     "roles": ["组长"] if i % 4 == 0 else ["一般員工"]}
+    for i in range(12)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "15:00-22:00", "min_people": 2},
+]
+limits = {"max_staff_per_day": 6, "enforce_limit": True, "min_monthly_hours": 120}
+
+def make():
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits)
+
+def test_anytime_keeps_best():
+    greedy = make()
+    greedy.generate(seed=7)
+
+    s = make()
+    schedule, log = s.generate(seed=7, time_budget_s=1.0)
+    print(log[0])
+    print(log[1])
+    assert set(s.phase_times) == {"greedy", "multi_start", "local_search", "lns"}
+    assert s.objective["total"] <= greedy.objective["total"]
+    assert s._hard_rule_violations() == []
+    assert s.schedule == schedule
+    assert (s.days_worked == (s.assignment >= 0).sum(axis=0)).all()
+    print("Anytime OK.")
+
+def test_tiny_budget_still_returns_greedy():
+    s = make()
+    schedule, log = s.generate(seed=7, time_budget_s=0.0)
+    greedy = make()
+    greedy_schedule, _ = greedy.generate(seed=7)
+    assert schedule == greedy_schedule
+    assert s.objective == greedy.objective
+    print("Zero budget OK.")
+
+def test_n_starts_is_minimum_under_budget():
+    # time_budget_s 優先；n_starts 是多起點階段至少要跑的次數 (即使預算已用完)
+    s = make()
+    schedule, log = s.generate(seed=7, n_starts=4, time_budget_s=0.0)
+    print(log[0])
+    assert "多起點 3 次" in log[0]
+    multi = make()
+    multi.generate(seed=7, n_starts=4, workers=1)
+    assert s.objective["total"] == multi.objective["total"]
+    assert s._hard_rule_violations() == []
+    print("n_starts with budget OK.")
+
+def test_failed_search_phase_keeps_schedule():
+    greedy = make()
+    greedy.generate(seed=7)
+    s = make()
+
+    def broken_search(time_budget_s=None):
+        # 拆掉一半的班表後出錯
+        s.assignment[::2] = -1
+        raise RecursionError("maximum recursion depth exceeded")
+
+    s.large_neighborhood_search = broken_search
+    schedule, log = s.generate(seed=7, time_budget_s=0.5)
+    assert any("lns 中斷" in line for line in log)
+    assert s.objective == s._schedule_objective(s.objective["retries"])
+    assert s._hard_rule_violations() == []
+    assert (s.days_worked == (s.assignment >= 0).sum(axis=0)).all()
+    assert s.objective["total"] <= greedy.objective["total"]
+    assert s.schedule == schedule
+    print("Failed phase OK.")
+
+def test_anytime_on_large_roster():
+    big_shifts = {
+        "A": {"time": "07:00-15:00", "required_people": 120, "enforce_headcount": True},
+        "C": {"time": "14:00-22:00", "required_people": 120, "enforce_headcount": True},
+    }
+    big_employees = [{"name": f"P{i:03d}", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]} for i in range(300)]
+    big_rules = [{"time_range": "07:00-14:00", "min_people": 100}, {"time_range": "15:00-22:00", "min_people": 100}]
+    big_limits = {"max_staff_per_day": 240, "enforce_limit": True, "min_monthly_hours": 120}
+    for seed in (1, 2, 3):
+        greedy = SchedulerLogic(2026, 3, copy.deepcopy(big_employees), big_shifts, big_rules, big_limits, class_matching=True)
+        greedy.generate(seed=seed)
+        s = SchedulerLogic(2026, 3, copy.deepcopy(big_employees), big_shifts, big_rules, big_limits, class_matching=True)
+        schedule, log = s.generate(seed=seed, time_budget_s=3.0)
+        print(log[1])
+        assert not any("中斷" in line for line in log)
+        assert s.objective["total"] <= greedy.objective["total"]
+        assert s._hard_rule_violations() == []
+        assert s.schedule == schedule
+    print("Large roster OK.")
+
+if __name__ == "__main__":
+    try:
+        test_anytime_keeps_best()
+        test_tiny_budget_still_returns_greedy()
+        test_n_starts_is_minimum_under_budget()
+        test_failed_search_phase_keeps_schedule()
+        test_anytime_on_large_roster()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.scheduler_logic import SchedulerLogic, ScheduleSearch
+import json
+
+
+def load_config(filename, default):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except:
+        return default
+
+base = os.path.join(os.path.dirname(__file__), '..', 'config')
+shifts = load_config(os.path.join(base, 'config_shifts.json'), {})
+employees = load_config(os.path.join(base, 'config_employees.json'), [])
+coverage = load_config(os.path.join(base, 'config_coverage.json'), [])
+daily_limits = load_config(os.path.join(base, 'config_daily_limits.json'), {})
+business_hours = load_config(os.path.join(base, 'config_business_hours.json'), {})
+
+
+def test_day_mask_matches_is_available():
+    s = SchedulerLogic(2026, 2, employees, shifts, coverage, daily_limits, business_hours)
+    # 先排前 20 天，再比較第 21 天的遮罩與逐一檢查的結果
+    for d in s.dates[:20]:
+        s.schedule_one_day(d)
+    day = 20
+    mask = s._day_availability(day)
+    mismatches = 0
+    for emp in s.employees:
+        eid = s.employee_index.id_of[emp['name']]
+        for sid, shift_name in enumerate(s.shift_index.names):
+            ok, reason = s._is_available(emp, s.dates[day], shift_name)
+            if ok != bool(mask[eid, sid]):
+                mismatches += 1
+                print(f"Mismatch: {emp['name']} {shift_name} {reason}")
+    assert mismatches == 0
+    print("Availability mask OK.")
+
+
+def test_candidates_role_filter():
+    s = SchedulerLogic(2026, 2, employees, shifts, coverage, daily_limits, business_hours)
+    candidates = s._get_available_candidates(s.dates[0], "A1", ["组长"])
+    print(f"Leaders for A1: {[c['name'] for c in candidates]}")
+    assert candidates
+    assert all("组长" in c['roles'] and "A1" in c['allowed_shifts'] for c in candidates)
+    assert s._get_available_candidates(s.dates[0], "NoSuchShift") == []
+
+
+def test_streak_and_rest_limits_are_shared():
+    # 覆寫 MAX_CONSECUTIVE_DAYS / min_rest_hours 後，逐筆檢查、每日遮罩與局部搜尋的判斷一致
+    class ShortStreak(SchedulerLogic):
+        MAX_CONSECUTIVE_DAYS = 3
+
+    limits = dict(daily_limits, min_rest_hours=14)
+    s = ShortStreak(2026, 2, employees, shifts, coverage, limits, business_hours)
+    search = ScheduleSearch(s)
+    assert search.max_consecutive == 3 and search.min_rest == 14 * 60
+
+    emp = next(e for e in s.employees if {"A1", "B", "D"} <= set(e['allowed_shifts'])
+               and len(e.get('available_weekdays', range(7))) == 7)
+    eid = s.employee_index.id_of[emp['name']]
+    a1, b, d = (s.shift_index.id_of[name] for name in ("A1", "B", "D"))
+    for day in range(3):
+        s._set_assignment(day, eid, a1)
+    # 第 4 天: 已連續上班 3 天
+    assert not s._is_available(emp, s.dates[3], "A1")[0]
+    assert not s._day_availability(3)[eid, a1]
+    assert not search.feasible(eid, 3, a1)
+
+    # B (17:05 下班) 接 D (06:20 上班) 休息 13.25 小時: 預設 11 小時可以，14 小時不行
+    s._set_assignment(10, eid, b)
+    ok, reason = s._is_available(emp, s.dates[11], "D")
+    assert not ok and "14" in reason
+    assert not s._day_availability(11)[eid, d]
+    assert not search.feasible(eid, 11, d)
+    assert any("14小時休息" in line for line in s._generate_validation_report())
+    print("Shared limits OK.")
+
+
+if __name__ == "__main__":
+    try:
+        test_day_mask_matches_is_available()
+        test_candidates_role_filter()
+        test_streak_and_rest_limits_are_shared()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,67 @@
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-14:00"},
+    "A2C": {"time": "07:00-10:00,17:00-21:00"},
+    "C": {"time": "14:00-22:00"},
+}
+employees = [
+    {"name": "Amy", "allowed_shifts": ["A", "A2C", "C"], "roles": ["组长"]},
+    {"name": "Ben", "allowed_shifts": ["A", "A2C", "C"], "roles": ["一般員工"]},
+    {"name": "Cat", "allowed_shifts": ["A", "A2C", "C"], "roles": ["一般員工"]},
+]
+rules = [
+    {"time_range": "07:00-12:00", "min_people": 2, "max_people": 2},
+    {"time_range": "15:00-16:00", "min_people": 1, "required_roles": ["组长"]},
+    {"time_range": "bad", "min_people": 1},
+]
+business_hours = {"start": "07:00", "end": "22:00", "enforce_coverage": True}
+
+def make():
+    s = SchedulerLogic(2026, 1, employees, shifts, rules, business_hours=business_hours)
+    return s
+
+def test_structured_violations():
+    s = make()
+    s._update_employee_history("Amy", "2026-01-01", "A2C")
+    s._update_employee_history("Ben", "2026-01-01", "A")
+    s._update_employee_history("Cat", "2026-01-01", "A")
+    violations = s._coverage_violations(0)
+    for v in violations:
+        print(v)
+    kinds = sorted((v["type"], v["time_range"]) for v in violations)
+    # 07:00-12:00 有 3 人 (分段班別只要有一段重疊就算) -> 超標但不算關鍵違規
+    # 15:00-16:00 沒有人 -> 人數不足 + 缺少组长；14:00-17:00、21:00-22:00 營業時段空窗
+    assert kinds == [
+        ("business_hours", "14:00-15:00"), ("business_hours", "15:00-16:00"), ("business_hours", "16:00-17:00"),
+        ("business_hours", "21:00-22:00"),
+        ("coverage", "15:00-16:00"), ("max_people", "07:00-12:00"), ("role", "15:00-16:00"),
+    ]
+    max_people = [v for v in violations if v["type"] == "max_people"][0]
+    assert max_people["actual"] == 3 and max_people["required"] == 2 and not max_people["critical"]
+    role = [v for v in violations if v["type"] == "role"][0]
+    assert role["role"] == "组长" and role["rule"] == 1 and role["critical"]
+
+    # 文字格式與原本的驗證函式相同
+    assert s._validate_business_hours_coverage("2026-01-01") == [
+        "⚠️ 營業時段空窗警告 (2026-01-01): 14:00-15:00, 15:00-16:00, 16:00-17:00, 21:00-22:00 沒有人上班！"
+    ]
+    assert "Role Warning: 2026-01-01 15:00-16:00 缺少必要角色 '组长'" in s._validate_coverage("2026-01-01")
+    print("Structured violations OK.")
+
+def test_no_violations():
+    s = make()
+    s._update_employee_history("Ben", "2026-01-02", "A")
+    s._update_employee_history("Cat", "2026-01-02", "A")
+    s._update_employee_history("Amy", "2026-01-02", "C")
+    assert s._coverage_violations(1) == []
+    assert s._validate_coverage("2026-01-02") == []
+    print("No violations OK.")
+
+if __name__ == "__main__":
+    try:
+        test_structured_violations()
+        test_no_violations()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,32 @@
+from datetime import date
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {"A": {"time": "07:00-14:00"}}
+employees = [{"name": "Amy", "allowed_shifts": ["A"], "roles": ["一般員工"]}]
+
+def test_day_vectors():
+    s = SchedulerLogic(2026, 2, employees, shifts, holidays=["2026-02-16", date(2026, 2, 17)])
+    assert s.num_days == 28
+    assert s.date_strs[0] == "2026-02-01" and s.day_of_str["2026-02-28"] == 27
+    # 2026-02-01 是週日
+    assert s.weekdays[0] == 6 and s.is_weekend[0]
+    assert list(s.weekdays[:8]) == [6, 0, 1, 2, 3, 4, 5, 6]
+    assert s.is_holiday.sum() == 2 and s.is_holiday[15] and s.is_holiday[16]
+    print("Day vectors OK.")
+
+def test_holidays_count_as_weekend():
+    s = SchedulerLogic(2026, 2, employees, shifts, holidays=["2026-02-16"])
+    s._update_employee_history("Amy", "2026-02-13", "A")  # 週五
+    s._update_employee_history("Amy", "2026-02-14", "A")  # 週六
+    s._update_employee_history("Amy", "2026-02-16", "A")  # 週一 (假日)
+    assert s.weekend_count[0] == 2
+    assert s._employee_stats(s.num_days)["weekend_count"][0] == 2
+    print("Holiday weekend count OK.")
+
+if __name__ == "__main__":
+    try:
+        test_day_vectors()
+        test_holidays_count_as_weekend()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
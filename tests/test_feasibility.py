@@ -0,0 +1,68 @@
+import copy
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 3, "enforce_headcount": True},
+}
+employees = [
+    # 組長只在平日上班 -> 週末無法滿足組長需求
+    {"name": "Lead", "available_weekdays": [0, 1, 2, 3, 4], "allowed_shifts": ["A", "C"], "roles": ["组长"]},
+] + [
+    {"name": f"E{i}", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]} for i in range(8)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "16:00-21:00", "min_people": 2},
+]
+limits = {"max_staff_per_day": 6, "enforce_limit": True}
+business_hours = {"start": "07:00", "end": "23:00", "enforce_coverage": True}
+
+def make(rules=rules, limits=limits, shifts=shifts):
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits, business_hours)
+
+def test_binding_constraints():
+    s = make()
+    analysis = s.analyze_feasibility()
+    print(f"Analysis took {analysis['elapsed_ms']} ms, infeasible: {analysis['infeasible_days'][:4]}")
+    assert not analysis["feasible"]
+    weekend = [d for d, w in zip(s.date_strs, s.weekdays) if w >= 5]
+    # 每天 22:00-23:00 都沒有班別涵蓋；週末另外缺組長
+    assert analysis["infeasible_days"] == s.date_strs
+    sat = analysis["days"][weekend[0]]
+    assert {(i["type"], i["binding"]) for i in sat} == {("role", "role_supply"), ("business_hours", "no_shift")}
+    mon = analysis["days"]["2026-03-02"]
+    assert [(i["type"], i["time_range"], i["binding"]) for i in mon] == [("business_hours", "22:00-23:00", "no_shift")]
+    assert analysis["weekdays"][5]["role_supply"]["组长"] == 0
+    assert analysis["weekdays"][0]["role_supply"]["组长"] == 1
+
+    # 班別人數上限與每日上限
+    tight = make(rules=[{"time_range": "16:00-21:00", "min_people": 4}])
+    issue = tight.analyze_feasibility()["days"]["2026-03-02"][0]
+    assert (issue["binding"], issue["upper_bound"]) == ("headcount_cap", 3)
+    tight = make(rules=[{"time_range": "16:00-21:00", "min_people": 3}], limits={"max_staff_per_day": 2, "enforce_limit": True})
+    issue = tight.analyze_feasibility()["days"]["2026-03-02"][0]
+    assert (issue["binding"], issue["upper_bound"]) == ("daily_limit", 2)
+    assert tight.analyze_feasibility()["weekdays"][0]["slot_shortfalls"]
+    print("Binding constraints OK.")
+
+def test_generate_skips_retries_on_infeasible_days():
+    s = SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules[:1], limits)
+    schedule, log = s.generate(max_retries=5, seed=1)
+    text = "\n".join(log)
+    weekend = [d for d, w in zip(s.date_strs, s.weekdays) if w >= 5]
+    assert s.feasibility["infeasible_days"] == weekend
+    for date_str in weekend:
+        assert f"⛔ {date_str}" in text
+        assert f"🔄 {date_str}" not in text
+        assert f"❌ {date_str} 經過 1 次嘗試" in text
+    assert "需要「组长」" in text
+    print("Retries skipped OK.")
+
+if __name__ == "__main__":
+    try:
+        test_binding_constraints()
+        test_generate_skips_retries_on_infeasible_days()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,95 @@
+import copy
+import itertools
+import random
+import numpy as np
+from src.scheduler_logic import SchedulerLogic, ScheduleSearch
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 3, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 3, "enforce_headcount": True},
+    "D": {"time": "10:00-14:00"},
+}
+employees = [
+    {"name": f"E{i:02d}", "allowed_shifts": ["A", "C", "D"] if i % 3 else ["A", "D"],
+     "available_weekdays": [0, 1, 2, 3, 4] if i % 5 == 0 else list(range(7)),
+     "roles": ["组长"] if i % 4 == 0 else ["一般員工"]}
+    for i in range(10)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "15:00-22:00", "min_people": 2, "max_people": 3},
+]
+limits = {"max_staff_per_day": 6, "enforce_limit": True, "min_monthly_hours": 130}
+
+def make():
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits)
+
+def test_lns_improves_without_breaking_rules():
+    s = make()
+    s.generate(seed=2)
+    before = dict(s.objective)
+    log = s.large_neighborhood_search(time_budget_s=10.0, seed=1, max_iters=15)
+    print("\n".join(log))
+    assert "大鄰域搜尋" in log[0]
+    assert s.objective["total"] <= before["total"]
+    assert s._hard_rule_violations() == []
+    assert sum(entry["tried"] for entry in s.lns_stats.values()) == 15
+    # 計數器與 assignment 一致
+    assert (s.days_worked == (s.assignment >= 0).sum(axis=0)).all()
+    print("LNS OK.")
+
+def test_repair_is_exact_on_small_neighborhood():
+    s = make()
+    s.generate(seed=2)
+    cells = [(day, eid) for day in (9, 10) for eid in (1, 4)]
+
+    # 暴力枚舉: 所有組合中符合硬性規則且 max_people 超額不增加的最佳目標分數
+    search = ScheduleSearch(s)
+    incumbent = search.objective()
+    excess = search.day_excess.copy()
+    best = incumbent
+    for values in itertools.product([-1, 0, 1, 2], repeat=len(cells)):
+        undo = search.apply([(d, e, v) for (d, e), v in zip(cells, values)])
+        if not s._hard_rule_violations() and (search.day_excess <= excess).all():
+            best = min(best, search.objective())
+        search.apply(undo)
+
+    value, exhausted = s._repair_exact(search, cells, incumbent, node_limit=10**6)
+    print(f"Incumbent {incumbent:.2f}, brute force {best:.2f}, branch-and-bound {value:.2f}")
+    assert exhausted
+    assert abs(value - best) < 1e-6
+    assert abs(search.objective() - value) < 1e-6
+    assert s._hard_rule_violations() == []
+    print("Exact repair OK.")
+
+def test_repair_on_large_roster():
+    # 300 人 x 4 天 = 1200 個格子: 搜尋深度等於格子數，不能依賴遞迴
+    big_shifts = {
+        "A": {"time": "07:00-15:00", "required_people": 120, "enforce_headcount": True},
+        "C": {"time": "14:00-22:00", "required_people": 120, "enforce_headcount": True},
+    }
+    big_employees = [{"name": f"P{i:03d}", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]} for i in range(300)]
+    big_rules = [{"time_range": "07:00-14:00", "min_people": 100}, {"time_range": "15:00-22:00", "min_people": 100}]
+    s = SchedulerLogic(2026, 3, big_employees, big_shifts, big_rules,
+                       {"max_staff_per_day": 240, "enforce_limit": True, "min_monthly_hours": 120}, class_matching=True)
+    s.generate(seed=1)
+    search = ScheduleSearch(s)
+    cells = s._lns_neighborhood("days", 4, random.Random(0), search)
+    assert len(cells) == 1200
+    incumbent = search.objective()
+    value, _ = s._repair_exact(search, cells, incumbent, node_limit=3000)
+    assert value <= incumbent
+    log = s.large_neighborhood_search(time_budget_s=30.0, seed=1, max_iters=10)
+    print(log[0])
+    assert s._hard_rule_violations() == []
+    assert (s.days_worked == (s.assignment >= 0).sum(axis=0)).all()
+    print("Large roster OK.")
+
+if __name__ == "__main__":
+    try:
+        test_lns_improves_without_breaking_rules()
+        test_repair_is_exact_on_small_neighborhood()
+        test_repair_on_large_roster()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
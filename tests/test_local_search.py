@@ -0,0 +1,71 @@
+import copy
+import numpy as np
+from src.scheduler_logic import SchedulerLogic, ScheduleSearch
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 3, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 3, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"E{i:02d}", "allowed_shifts": ["A", "C"] if i % 3 else ["A"],
+     "available_weekdays": [0, 1, 2, 3, 4] if i % 5 == 0 else list(range(7)),
+     "roles": ["组长"] if i % 4 == 0 else ["一般員工"]}
+    for i in range(12)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "15:00-22:00", "min_people": 2, "max_people": 3},
+]
+limits = {"max_staff_per_day": 6, "enforce_limit": True, "min_monthly_hours": 120}
+
+def make():
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits)
+
+def test_local_search_improves_without_breaking_rules():
+    s = make()
+    s.generate(seed=3)
+    before = dict(s.objective)
+    assert s._hard_rule_violations() == []
+
+    log = s.local_search(time_budget_s=5.0, seed=1, max_iters=3000)
+    print(log[0])
+    print(f"Before: {before}\nAfter:  {s.objective}")
+    assert "局部搜尋" in log[0]
+    assert s.objective["total"] <= before["total"]
+    assert s.objective["coverage_deficit"] <= before["coverage_deficit"]
+    assert s.objective["retries"] == before["retries"]
+    assert s._hard_rule_violations() == []
+
+    # 計數器與 assignment 一致
+    assert (s.days_worked == (s.assignment >= 0).sum(axis=0)).all()
+    assert (s.minutes_worked == np.where(s.assignment >= 0, s.shift_index.minutes_arr[s.assignment], 0).sum(axis=0)).all()
+    print("Local search OK.")
+
+def test_delta_evaluation_matches_full_objective():
+    s = make()
+    s.generate(seed=4)
+    search = ScheduleSearch(s)
+    full = lambda: sum(s.OBJECTIVE_WEIGHTS[k] * s._schedule_objective()[k]
+                       for k in ("coverage_deficit", "min_hours_deficit", "fairness_spread"))
+    assert abs(search.objective() - full()) < 0.05
+
+    # 套用一連串變更後，增量快取與整月重算一致；還原後回到原狀
+    original = s.assignment.copy()
+    undos = []
+    for day, eid in ((0, 0), (3, 5), (10, 7), (20, 11)):
+        sid = 1 if s.assignment[day, eid] != 1 else -1
+        undos.append(search.apply([(day, eid, sid)]))
+    assert abs(search.objective() - full()) < 0.05
+    for undo in reversed(undos):
+        search.apply(undo)
+    assert (s.assignment == original).all()
+    assert abs(search.objective() - full()) < 0.05
+    print("Delta evaluation OK.")
+
+if __name__ == "__main__":
+    try:
+        test_local_search_improves_without_breaking_rules()
+        test_delta_evaluation_matches_full_objective()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,192 @@
+import numpy as np
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-14:00"},
+    "B": {"time": "14:00-21:00"},
+}
+
+def test_hungarian_optimal():
+    cost = np.array([
+        [4.0, 1.0, 3.0],
+        [2.0, 0.0, 5.0],
+        [3.0, 2.0, 2.0],
+    ])
+    match = SchedulerLogic._min_cost_assignment(cost)
+    print(f"Match: {match}")
+    assert sorted(match) == [0, 1, 2]
+    assert cost[range(3), match].sum() == 5.0
+
+    # 長方形 (列 < 欄)
+    match = SchedulerLogic._min_cost_assignment(np.array([[5.0, 1.0, 9.0], [1.0, 2.0, 9.0]]))
+    assert match == [1, 0]
+
+def test_matching_fills_every_slot():
+    # Amy 排在前面 (同分時優先)，但只有 Ben 不能上 B；逐格貪婪會讓 A 拿走 Amy 而 B 缺工
+    employees = [
+        {"name": "Amy", "allowed_shifts": ["A", "B"], "roles": ["一般員工"]},
+        {"name": "Ben", "allowed_shifts": ["A"], "roles": ["一般員工"]},
+    ]
+    s = SchedulerLogic(2026, 1, employees, shifts)
+    available = s._day_availability(0)
+    order_pos = s._employee_order_positions()
+    consecutive = s._counter_stats(0)["consecutive"]
+    picked = s._match_skeleton([("A", None), ("B", None)], available, order_pos, consecutive)
+    names = [s.employee_index.names[e] for e in picked]
+    print(f"Picked: {names}")
+    assert names == ["Ben", "Amy"]
+
+def test_matching_prefers_fairness_and_roles():
+    employees = [
+        {"name": "Amy", "allowed_shifts": ["A", "B"], "roles": ["一般員工"]},
+        {"name": "Ben", "allowed_shifts": ["A", "B"], "roles": ["一般員工"]},
+        {"name": "Lee", "allowed_shifts": ["A", "B"], "roles": ["组长"]},
+    ]
+    s = SchedulerLogic(2026, 1, employees, shifts)
+    # Amy 已經上了很多天 -> 公平性成本較高
+    for d in range(1, 4):
+        s._update_employee_history("Amy", f"2026-01-0{d}", "A")
+    day = 5
+    picked = s._match_skeleton(
+        [("B", "组长"), ("A", None), ("A", None)],
+        s._day_availability(day), s._employee_order_positions(), s._counter_stats(day)["consecutive"],
+    )
+    names = [s.employee_index.names[e] for e in picked]
+    print(f"Picked: {names}")
+    assert names[0] == "Lee"
+    assert sorted(names[1:]) == ["Amy", "Ben"]
+
+    # 只有一個一般班次時，選工作量較少的 Ben
+    picked = s._match_skeleton(
+        [("B", "组长"), ("A", None)],
+        s._day_availability(day), s._employee_order_positions(), s._counter_stats(day)["consecutive"],
+    )
+    assert [s.employee_index.names[e] for e in picked] == ["Lee", "Ben"]
+
+    # 沒有人持有的角色 -> 該班次留空
+    picked = s._match_skeleton(
+        [("A", "資深")], s._day_availability(day), s._employee_order_positions(), s._counter_stats(day)["consecutive"],
+    )
+    assert picked == [None]
+
+def test_equivalence_classes():
+    employees = [
+        {"name": "Amy", "available_weekdays": [0, 1], "allowed_shifts": ["A", "B"], "roles": ["一般員工"]},
+        {"name": "Ben", "available_weekdays": [0, 1], "allowed_shifts": ["B", "A"], "roles": ["一般員工"]},
+        {"name": "Cat", "available_weekdays": [0, 1], "allowed_shifts": ["A"], "roles": ["一般員工"]},
+        {"name": "Lee", "available_weekdays": [0, 1], "allowed_shifts": ["A", "B"], "roles": ["组长"]},
+        {"name": "Max", "available_weekdays": [1, 0], "allowed_shifts": ["A", "B"], "roles": ["一般員工"]},
+    ]
+    idx = SchedulerLogic(2026, 1, employees, shifts).employee_index
+    print(f"Classes: {[list(c) for c in idx.classes]}")
+    assert list(idx.class_of) == [0, 0, 1, 2, 0]
+    assert [list(c) for c in idx.classes] == [[0, 1, 4], [2], [3]]
+
+def test_class_matching_matches_hungarian():
+    # 兩個類別各 12 人 (平均人數 >= CLASS_MATCH_MIN_SIZE)，工作量不同但與班別無關時，類別層級的解也是最佳解
+    shifts3 = dict(shifts, C={"time": "22:00-23:00"})
+    employees = [{"name": f"G{i:02d}", "allowed_shifts": ["A", "B", "C"], "roles": ["一般員工"]} for i in range(12)]
+    employees += [{"name": f"L{i:02d}", "allowed_shifts": ["B", "C"], "roles": ["组长"]} for i in range(12)]
+    s = SchedulerLogic(2026, 1, employees, shifts3, class_matching=True)
+    for i, name in enumerate(s.employee_index.names):
+        for d in range(1, 2 + i % 4):
+            s._update_employee_history(name, f"2026-01-{d:02d}", "C")
+    day = 8
+    skeleton = [("B", "组长")] * 3 + [("A", None)] * 6 + [("B", None)] * 5
+    args = (s._day_availability(day), s._employee_order_positions(), s._counter_stats(day)["consecutive"])
+    picked = s._match_skeleton(skeleton, *args)
+    s.class_matching = False  # 逐人匹配
+    exact = s._match_skeleton(skeleton, *args)
+    
+    def total(match):
+        return sum(s._fairness_scores(np.array([e]), s.shift_index.id_of[name], args[2])[0]
+                   for e, (name, _) in zip(match, skeleton))
+    print(f"Class-level cost {total(picked)} vs Hungarian {total(exact)}")
+    assert None not in picked and len(set(picked)) == len(picked)
+    assert all(s.employee_index.has_role(s.employee_index.names[e], "组长") for e in picked[:3])
+    assert all(s.employee_index.names[e].startswith("G") for e in picked[3:9])
+    assert total(picked) == total(exact)
+
+def test_class_matching_fills_as_many_slots_as_hungarian():
+    # 同一類別的人當天的可用班別不同 (休息間隔、連續上班、不可排班)，類別層級的匹配也不能多留缺工
+    rng = np.random.default_rng(0)
+    shifts4 = {"A": {"time": "07:00-15:00"}, "B": {"time": "11:00-19:00"},
+               "C": {"time": "14:00-22:00"}, "D": {"time": "06:00-12:00"}}
+    names = list(shifts4)
+    for trial in range(150):
+        kinds = [(list(rng.choice(names, rng.integers(1, 5), replace=False)), ["组长"] if rng.random() < 0.4 else ["一般員工"])
+                 for _ in range(rng.integers(1, 4))]
+        n = int(rng.integers(8, 41))
+        employees = [{"name": f"E{i:02d}", "allowed_shifts": kinds[i % len(kinds)][0], "roles": kinds[i % len(kinds)][1]}
+                     for i in range(n)]
+        s = SchedulerLogic(2026, 1, employees, shifts4, class_matching=True)
+        day = 3
+        available = s.employee_index.eligibility[:, :, s.weekdays[day]] & (rng.random((n, len(names))) < rng.choice([0.3, 0.6, 0.9]))
+        skeleton = [(names[rng.integers(4)], "组长" if rng.random() < 0.3 else None) for _ in range(rng.integers(2, n + 1))]
+        args = (available, s._employee_order_positions(), np.zeros(n, dtype=np.int64))
+        s.CLASS_MATCH_MIN_SIZE = 1  # 強制類別層級匹配
+        by_class = s._match_skeleton(skeleton, *args)
+        s.class_matching = False  # 逐人匹配 (_min_cost_assignment)
+        exact = s._match_skeleton(skeleton, *args)
+        
+        people = [e for e in by_class if e is not None]
+        assert len(people) == len(set(people))
+        for (name, role), e in zip(skeleton, by_class):
+            if e is not None:
+                assert available[e, s.shift_index.id_of[name]]
+                assert role is None or s.employee_index.has_role(s.employee_index.names[e], role)
+        # 補上的班次數相同 (不補的成本: 角色班次 = 2 個一般班次)
+        unfilled = lambda match: sum(2 if role else 1 for e, (_, role) in zip(match, skeleton) if e is None)
+        assert sum(e is not None for e in by_class) == sum(e is not None for e in exact), f"trial {trial}"
+        assert unfilled(by_class) == unfilled(exact), f"trial {trial}"
+    print("Class matching fill counts OK.")
+
+def test_class_matching_is_opt_in_on_large_roster():
+    # 200 人、8 種員工: 預設一律逐人匹配；開啟 class_matching 時目標分數與逐人匹配相近
+    rng = np.random.default_rng(2)
+    names = ["A", "B", "C", "D"]
+    shifts4 = {"A": {"time": "07:00-15:00", "required_people": 20, "enforce_headcount": True},
+               "B": {"time": "11:00-19:00", "required_people": 20, "enforce_headcount": True},
+               "C": {"time": "14:00-22:00", "required_people": 20, "enforce_headcount": True},
+               "D": {"time": "06:00-12:00", "required_people": 10, "enforce_headcount": True}}
+    kinds = [(sorted(rng.choice(7, rng.integers(4, 8), replace=False).tolist()), list(rng.choice(names, rng.integers(2, 5), replace=False)),
+              ["组长"] if rng.random() < 0.3 else ["一般員工"]) for _ in range(8)]
+    employees = [{"name": f"E{i:03d}", "available_weekdays": kinds[i % 8][0], "allowed_shifts": kinds[i % 8][1], "roles": kinds[i % 8][2]}
+                 for i in range(200)]
+    rules = [{"time_range": "07:00-12:00", "min_people": 25, "required_roles": ["组长"]},
+             {"time_range": "12:00-18:00", "min_people": 33}, {"time_range": "18:00-22:00", "min_people": 25}]
+    limits = {"max_staff_per_day": 100, "enforce_limit": True, "min_monthly_hours": 80}
+
+    exact = SchedulerLogic(2026, 1, employees, shifts4, rules, limits)
+    def not_expected(*args):
+        raise AssertionError("class matching used without class_matching=True")
+    exact._match_by_class = not_expected
+    exact.generate(seed=1)
+
+    by_class = SchedulerLogic(2026, 1, employees, shifts4, rules, limits, class_matching=True)
+    calls = []
+    match_by_class = by_class._match_by_class
+    def counting(*args):
+        calls.append(1)
+        return match_by_class(*args)
+    by_class._match_by_class = counting
+    by_class.generate(seed=1)
+    print(f"Hungarian {exact.objective}")
+    print(f"Class-level ({len(calls)} days) {by_class.objective}")
+    assert calls
+    assert by_class.objective["coverage_deficit"] <= exact.objective["coverage_deficit"]
+    assert by_class.objective["total"] <= exact.objective["total"] * 1.02
+    print("Opt-in class matching OK.")
+
+if __name__ == "__main__":
+    try:
+        test_hungarian_optimal()
+        test_matching_fills_every_slot()
+        test_matching_prefers_fairness_and_roles()
+        test_equivalence_classes()
+        test_class_matching_matches_hungarian()
+        test_class_matching_fills_as_many_slots_as_hungarian()
+        test_class_matching_is_opt_in_on_large_roster()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,88 @@
+import numpy as np
+from src.scheduler_logic import SchedulerLogic, MultiSiteScheduler
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 2, "enforce_headcount": True},
+}
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2},
+    {"time_range": "16:00-21:00", "min_people": 2},
+]
+limits = {"max_staff_per_day": 4, "enforce_limit": True}
+floaters = ["Float1", "Float2"]
+
+def site_config(prefix, n_local):
+    employees = [{"name": f"{prefix}{i}", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]} for i in range(n_local)]
+    employees += [{"name": name, "allowed_shifts": ["A", "C"], "roles": ["一般員工"]} for name in floaters]
+    return {"employees_config": employees, "shifts_config": shifts, "coverage_rules": rules, "daily_limits": limits}
+
+def make():
+    # 每個據點的在地人力不足，一定會用到共用員工
+    sites = {"North": site_config("N", 4), "South": site_config("S", 4), "East": site_config("E", 4)}
+    shared = {name: ["North", "South", "East"] for name in floaters}
+    return MultiSiteScheduler(sites, shared, 2026, 2)
+
+def test_unavailable_cells_are_never_assigned():
+    config = site_config("N", 3)
+    blocked = [{"person": "Float1", "date": "2026-02-02", "end_date": "2026-02-10"}]
+    s = SchedulerLogic(2026, 2, config["employees_config"], shifts, rules, limits, unavailable=blocked)
+    s.generate(seed=1)
+    eid = s.employee_index.id_of["Float1"]
+    assert s.blocked[1:10, eid].all() and s.blocked[:, eid].sum() == 9
+    assert (s.assignment[1:10, eid] < 0).all()
+    assert s._hard_rule_violations() == []
+    print("Unavailable cells OK.")
+
+def test_floaters_are_not_double_booked():
+    ms = make()
+    schedules, log = ms.generate(seed=3, workers=1)
+    print("\n".join(log))
+    for name in floaters:
+        worked = []
+        for day, date_str in enumerate(ms.date_strs):
+            booked = [(site, shift) for site, schedule in schedules.items()
+                      for shift, people in schedule[date_str].items() if name in people]
+            assert len(booked) <= 1, f"{name} 在 {date_str} 重複排班: {booked}"
+            if booked:
+                assert ms.reservations[(name, date_str)] == booked[0][0]
+                worked.append((day, booked[0][1]))
+        # 跨據點: 連續上班不超過 6 天、休息間隔至少 11 小時 (C 22:00 -> A 07:00 只有 9 小時)
+        run = 0
+        for k, (day, shift) in enumerate(worked):
+            run = run + 1 if k and worked[k - 1][0] == day - 1 else 1
+            assert run <= 6
+            if k and worked[k - 1] == (day - 1, "C"):
+                assert shift != "A"
+    for site, scheduler in ms.schedulers.items():
+        assert scheduler._hard_rule_violations() == []
+    print("No double booking OK.")
+
+def test_timings_are_reported():
+    ms = make()
+    ms.generate(seed=3, workers=1)
+    print(ms.timings)
+    assert set(ms.site_timings) == {"North", "South", "East"}
+    for timing in ms.site_timings.values():
+        assert abs(timing["total"] - timing["generate"] - timing["replan"]) < 0.002
+    assert ms.timings["total"] >= ms.timings["solve"]
+    assert ms.timings["rounds"] >= 1
+    print("Timings OK.")
+
+def test_unknown_shared_members_are_skipped():
+    sites = {"North": site_config("N", 4), "South": site_config("S", 4)}
+    ms = MultiSiteScheduler(sites, {"Float1": ["North", "South", "West"], "Nobody": ["North", "South"]}, 2026, 2)
+    assert list(ms.shared) == ["Float1"]
+    assert [site for site, _ in ms.shared["Float1"]] == ["North", "South"]
+    assert len(ms.warnings) == 3
+    print("Unknown members OK.")
+
+if __name__ == "__main__":
+    try:
+        test_unavailable_cells_are_never_assigned()
+        test_floaters_are_not_double_booked()
+        test_timings_are_reported()
+        test_unknown_shared_members_are_skipped()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
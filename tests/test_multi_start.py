@@ -0,0 +1,54 @@
+import copy
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-14:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-21:00", "required_people": 2, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"E{i:02d}", "allowed_shifts": ["A", "C"], "roles": ["组长"] if i % 4 == 0 else ["一般員工"]}
+    for i in range(10)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "14:00-21:00", "min_people": 2},
+]
+limits = {"max_staff_per_day": 8, "enforce_limit": True, "min_monthly_hours": 100}
+
+def make():
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits)
+
+def test_multi_start_keeps_best():
+    s = make()
+    schedule, log = s.generate(seed=5, n_starts=4, workers=1)
+    results = s.multi_start_results
+    print(f"Scores: {[r['total'] for r in results]}")
+    assert [r["seed"] for r in results] == [5, 6, 7, 8]
+    best = min(results, key=lambda r: (r["total"], r["seed"]))
+    assert s.seed == best["seed"]
+    assert s.objective["total"] == best["total"]
+    assert "多起點排班" in log[0]
+
+    # 最佳結果與直接用該 seed 單獨排班相同，且計數器已重建
+    single = make()
+    single_schedule, _ = single.generate(seed=best["seed"])
+    assert schedule == single_schedule
+    assert (s.days_worked == single.days_worked).all()
+    print("Multi-start best OK.")
+
+def test_process_pool_matches_sequential():
+    s1 = make()
+    schedule1, _ = s1.generate(seed=5, n_starts=3, workers=1)
+    s2 = make()
+    schedule2, _ = s2.generate(seed=5, n_starts=3, workers=2)
+    assert schedule1 == schedule2
+    assert s1.multi_start_results == s2.multi_start_results
+    print("Process pool OK.")
+
+if __name__ == "__main__":
+    try:
+        test_multi_start_keeps_best()
+        test_process_pool_matches_sequential()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
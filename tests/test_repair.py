@@ -0,0 +1,72 @@
+import copy
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 2, "enforce_headcount": True},
+}
+employees = [
+    {"name": "Lead", "allowed_shifts": ["A", "C"], "roles": ["组长"]},
+    {"name": "Amy", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]},
+    {"name": "Bob", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]},
+    {"name": "Cat", "allowed_shifts": ["A"], "roles": ["一般員工"]},
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 1, "required_roles": ["组长"]},
+    {"time_range": "16:00-21:00", "min_people": 1},
+]
+
+def make(limits=None):
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits or {"max_staff_per_day": 4})
+
+def critical(s, day):
+    return [v for v in s._coverage_violations(day) if v["critical"]]
+
+def test_repair_adds_and_replaces():
+    s = make()
+    s._reset_state()
+    ids = s.employee_index.id_of
+    A, C = s.shift_index.id_of["A"], s.shift_index.id_of["C"]
+    # A 班滿額但沒有組長、晚上沒人
+    s._set_assignment(0, ids["Amy"], A)
+    s._set_assignment(0, ids["Cat"], A)
+    violations = critical(s, 0)
+    print([(v["type"], v["time_range"]) for v in violations])
+    assert {v["type"] for v in violations} == {"role", "coverage"}
+
+    ok, log = s._repair_day(0, violations)
+    print("\n".join(log))
+    assert ok and critical(s, 0) == []
+    assert s.assignment[0, ids["Lead"]] == A          # 組長替換進 A 班
+    assert (s.assignment[0] == A).sum() <= 2          # 沒有超過班別人數上限
+    assert (s.assignment[0] == C).sum() >= 1          # 晚上補上一人
+    assert s._hard_rule_violations() == []
+    print("Repair OK.")
+
+def test_repair_respects_daily_limit():
+    s = make({"max_staff_per_day": 1, "enforce_limit": True})
+    s._reset_state()
+    ids = s.employee_index.id_of
+    s._set_assignment(0, ids["Lead"], s.shift_index.id_of["A"])
+    violations = critical(s, 0)
+    ok, log = s._repair_day(0, violations)
+    # 每日上限 1 人: 無法補晚班，也不能把組長換走 (會少了組長)
+    assert not ok and log == []
+    assert (s.assignment[0] >= 0).sum() == 1
+    print("Daily limit OK.")
+
+def test_generate_uses_repair():
+    staff = copy.deepcopy(employees) + [{"name": "Lead2", "allowed_shifts": ["A", "C"], "roles": ["组长"]}]
+    s = SchedulerLogic(2026, 3, staff, shifts, rules, {"max_staff_per_day": 4})
+    schedule, log = s.generate(seed=1)
+    assert s.objective["coverage_deficit"] == 0
+    print(f"Repairs used: {s.repairs_used}, retries: {s.objective['retries']}")
+
+if __name__ == "__main__":
+    try:
+        test_repair_adds_and_replaces()
+        test_repair_respects_daily_limit()
+        test_generate_uses_repair()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,112 @@
+import copy
+import numpy as np
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 2, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"E{i}", "allowed_shifts": ["A", "C"], "roles": ["组长"] if i % 3 == 0 else ["一般員工"]}
+    for i in range(8)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 1, "required_roles": ["组长"]},
+    {"time_range": "16:00-21:00", "min_people": 1},
+]
+limits = {"max_staff_per_day": 4, "enforce_limit": True}
+
+def make():
+    return SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules, limits)
+
+def published():
+    s = make()
+    schedule, _ = s.generate(seed=4)
+    return s, schedule
+
+def test_replan_covers_call_out_with_minimal_changes():
+    s, schedule = published()
+    day = 9
+    date_str = s.date_strs[day]
+    # 請假的人是當天唯一的晚班 -> 一定要有人補
+    evening = schedule[date_str]["C"]
+    sick = evening[0]
+    r = make()
+    diff, log = r.replan(schedule, [{"person": sick, "date": date_str}])
+    print("\n".join(log))
+    assert {"date": date_str, "person": sick, "from": "C", "to": None} in diff
+    # 晚班由其他人補上，且當天的嚴重覆蓋缺口不比原班表多
+    cover = [r.employee_index.names[eid] for eid in np.flatnonzero(r.assignment[day] == r.shift_index.id_of["C"])]
+    assert cover and sick not in cover
+    critical = lambda sched: [v for v in sched._coverage_violations(day) if v["critical"]]
+    assert all(v in critical(s) for v in critical(r))
+    assert r._hard_rule_violations() == []
+    # 只動到事件當天與前後一天
+    assert {d["date"] for d in diff} <= set(r.date_strs[day - 1:day + 2])
+    # 其他日子與原班表相同
+    changed = np.flatnonzero((r.assignment != s.assignment).any(axis=1))
+    assert set(changed) <= {day - 1, day, day + 1}
+    print("Replan OK.")
+
+def test_replan_only_removes_when_coverage_still_met():
+    s, schedule = published()
+    # 在某天多排一個人 (人力過剩)，這個人請假時只需要移除他
+    day, date_str = 12, s.date_strs[12]
+    extra = next(eid for eid in np.flatnonzero(s.assignment[day] < 0)
+                 if s._is_available(s.employees[eid], s.dates[day], "C")[0])
+    name = s.employee_index.names[extra]
+    schedule[date_str]["C"].append(name)
+    diff, log = make().replan(schedule, [{"person": name, "date": date_str}])
+    print(log[0])
+    assert diff == [{"date": date_str, "person": name, "from": "C", "to": None}]
+    print(f"Only removal for {name} on {date_str} OK.")
+
+def test_replan_ignores_unknown_events():
+    s, schedule = published()
+    diff, log = make().replan(schedule, [{"person": "Nobody", "date": "2026-03-05"}, {"person": "E1", "date": "2026-04-01"}])
+    assert diff == []
+    assert any("Nobody" in line for line in log)
+    print("Unknown events OK.")
+
+def test_replan_on_large_roster():
+    # 1200 人: 一天的欄位就超過 REPLAN_MAX_CELLS，必須再依員工分段
+    big_shifts = {
+        "A": {"time": "07:00-15:00", "required_people": 300, "enforce_headcount": True},
+        "C": {"time": "14:00-22:00", "required_people": 300, "enforce_headcount": True},
+    }
+    big_employees = [{"name": f"P{i:04d}", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]} for i in range(1200)]
+    big_rules = [{"time_range": "07:00-14:00", "min_people": 300}, {"time_range": "15:00-22:00", "min_people": 250}]
+    big_limits = {"max_staff_per_day": 600, "enforce_limit": True}
+    g = SchedulerLogic(2026, 3, big_employees, big_shifts, big_rules, big_limits, class_matching=True)
+    schedule, _ = g.generate(seed=1)
+    day = 10
+    date_str = g.date_strs[day]
+    sick = schedule[date_str]["A"][:5]
+
+    r = SchedulerLogic(2026, 3, big_employees, big_shifts, big_rules, big_limits, class_matching=True)
+    sizes = []
+    repair_exact = r._repair_exact
+    def recording_repair(search, cells, *args, **kwargs):
+        sizes.append(len(cells))
+        return repair_exact(search, cells, *args, **kwargs)
+    r._repair_exact = recording_repair
+
+    diff, log = r.replan(schedule, [{"person": name, "date": date_str} for name in sick])
+    print(log[0])
+    assert sizes and max(sizes) <= r.REPLAN_MAX_CELLS
+    assert sum(sizes) == 3 * 1200
+    for name in sick:
+        assert {"date": date_str, "person": name, "from": "A", "to": None} in diff
+    assert not [v for v in r._coverage_violations(day) if v["critical"]]
+    assert r._hard_rule_violations() == []
+    print("Large roster OK.")
+
+if __name__ == "__main__":
+    try:
+        test_replan_covers_call_out_with_minimal_changes()
+        test_replan_only_removes_when_coverage_still_met()
+        test_replan_ignores_unknown_events()
+        test_replan_on_large_roster()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
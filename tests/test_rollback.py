@@ -0,0 +1,70 @@
+from datetime import date
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {"A": {"time": "07:00-15:00"}, "C": {"time": "14:00-22:00"}}
+employees = [
+    {"name": "Amy", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]},
+    {"name": "Ben", "allowed_shifts": ["A", "C"], "roles": ["一般員工"]},
+]
+rules = [{"time_range": "07:00-22:00", "min_people": 2}]
+
+def test_restore_returns_to_start_of_day():
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    s.generate(max_retries=1)
+    before_schedule = s.schedule
+    before = s._snapshot_state()
+
+    # 在已排好的月份上清空並重排最後一天，再還原
+    snapshot = s._snapshot_state()
+    assignment = s.assignment
+    for eid in range(len(s.employee_index)):
+        s._set_assignment(30, eid, -1)
+    s.schedule_one_day(date(2026, 1, 31))
+    s._set_assignment(14, s.employee_index.id_of["Amy"], -1)
+    s._restore_state(snapshot)
+
+    assert s.schedule == before_schedule
+    assert s.assignment is assignment
+    for name, saved in zip(s.STATE_ARRAYS, before):
+        assert (getattr(s, name) == saved).all(), name
+    print("Restore OK.")
+
+def test_snapshot_is_a_copy():
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    snapshot = s._snapshot_state()
+    s.schedule_one_day(date(2026, 1, 1))
+    assert any(s.schedule["2026-01-01"].values())
+    assert (snapshot[0] < 0).all() and not snapshot[2].any()
+    print("Snapshot OK.")
+
+def test_counters_match_matrix():
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    s.generate(max_retries=1)
+
+    def check(day):
+        counted = s._counter_stats(day)
+        derived = s._employee_stats(day)
+        for key in derived:
+            assert (counted[key] == derived[key]).all(), key
+
+    check(s.num_days)
+    check(10)
+
+    # 非依序的寫入 (移除中間某天、再補回) 並還原，計數器必須與矩陣一致
+    snapshot = s._snapshot_state()
+    s._update_employee_history("Amy", "2026-01-15", "C")
+    s._set_assignment(14, s.employee_index.id_of["Ben"], -1)
+    check(s.num_days)
+    check(15)
+    s._restore_state(snapshot)
+    check(s.num_days)
+    print("Counters OK.")
+
+if __name__ == "__main__":
+    try:
+        test_restore_returns_to_start_of_day()
+        test_snapshot_is_a_copy()
+        test_counters_match_matrix()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,78 @@
+import copy
+import json
+import numpy as np
+from datetime import date, timedelta
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-15:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-22:00", "required_people": 2, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"E{i}", "allowed_shifts": ["A", "C"], "roles": ["组长"] if i % 3 == 0 else ["一般員工"]}
+    for i in range(8)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "16:00-21:00", "min_people": 2},
+]
+limits = {"max_staff_per_day": 5, "enforce_limit": True}
+
+def test_prior_state_blocks_streak_and_clopening():
+    prior = {"end_date": "2026-01-31", "employees": {
+        "E0": {"streak": 6, "last_offset": 0, "last_shift": "C", "minutes_to_date": 2880},
+        "E1": {"streak": 1, "last_offset": 0, "last_shift": "C", "minutes_to_date": 480},
+        "E2": {"streak": 6, "last_offset": 1, "last_shift": "C", "minutes_to_date": 2880},
+    }}
+    s = SchedulerLogic(None, None, copy.deepcopy(employees), shifts, rules, limits,
+                       start_date="2026-02-01", end_date="2026-02-07", prior_state=prior)
+    assert s.num_days == 7 and s.date_strs[0] == "2026-02-01"
+    feb1 = s.dates[0]
+    e0, e1, e2 = (employees[i] for i in range(3))
+    print(s._is_available(e0, feb1, "A"), s._is_available(e1, feb1, "A"))
+    assert not s._is_available(e0, feb1, "C")[0]           # 已連續上班 6 天
+    assert not s._is_available(e1, feb1, "A")[0]           # 22:00 下班 -> 07:00 上班只休息 9 小時
+    assert s._is_available(e1, feb1, "C")[0]
+    assert s._is_available(e2, feb1, "A")[0]               # 1/31 休息過，連續天數歸零
+    mask = s._day_availability(0)
+    assert not mask[0].any() and not mask[1, s.shift_index.id_of["A"]]
+
+    s.generate(seed=1)
+    assert s.assignment[0, 0] < 0
+    assert s._hard_rule_violations() == []
+    print("Prior state OK.")
+
+def test_rolling_weeks_match_one_long_horizon_rules():
+    start = date(2026, 2, 1)
+    periods = [(start + timedelta(days=7 * k), start + timedelta(days=7 * k + 6)) for k in range(5)]
+    results, state = SchedulerLogic.rolling_horizon(periods, copy.deepcopy(employees), shifts, rules, limits, seed=3)
+    assert len(results) == 5
+    json.dumps(state)  # 快照可序列化
+
+    # 把每一期的結果接起來，用一個涵蓋全部日期的排班器檢查跨期的硬性規則
+    whole = SchedulerLogic(None, None, copy.deepcopy(employees), shifts, rules, limits,
+                           start_date=periods[0][0], end_date=periods[-1][1])
+    whole._load_assignment(np.vstack([r[0].assignment for r in results]))
+    assert whole._hard_rule_violations() == []
+    worked = whole.assignment >= 0
+    for eid in range(worked.shape[1]):
+        run = 0
+        for day in range(worked.shape[0]):
+            run = run + 1 if worked[day, eid] else 0
+            assert run <= 6
+
+    # 累積工時與最後的連續天數
+    for eid, name in enumerate(whole.employee_index.names):
+        entry = state["employees"].get(name)
+        if entry:
+            assert entry["minutes_to_date"] == whole.minutes_worked[eid]
+            assert entry["streak"] == whole.streak[eid]
+    print(f"Rolling horizon OK: {len(results)} periods, final state for {len(state['employees'])} employees.")
+
+if __name__ == "__main__":
+    try:
+        test_prior_state_blocks_streak_and_clopening()
+        test_rolling_weeks_match_one_long_horizon_rules()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
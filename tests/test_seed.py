@@ -0,0 +1,55 @@
+import copy
+import random
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-14:00", "required_people": 2, "enforce_headcount": True},
+    "C": {"time": "14:00-21:00", "required_people": 2, "enforce_headcount": True},
+}
+employees = [
+    {"name": f"E{i:02d}", "allowed_shifts": ["A", "C"], "roles": ["组长"] if i % 4 == 0 else ["一般員工"]}
+    for i in range(10)
+]
+rules = [
+    {"time_range": "07:00-14:00", "min_people": 2, "required_roles": ["组长"]},
+    {"time_range": "14:00-21:00", "min_people": 2},
+]
+
+def run(seed):
+    s = SchedulerLogic(2026, 3, copy.deepcopy(employees), shifts, rules)
+    schedule, log = s.generate(seed=seed)
+    return s, schedule, log
+
+def test_same_seed_same_schedule():
+    _, schedule1, log1 = run(42)
+    _, schedule2, log2 = run(42)
+    assert schedule1 == schedule2
+    assert log1 == log2
+    assert any("seed): 42" in l for l in log1)
+    print("Same seed OK.")
+
+def test_input_not_mutated_and_global_random_untouched():
+    config = copy.deepcopy(employees)
+    random.seed(7)
+    expected = random.random()
+    random.seed(7)
+    s = SchedulerLogic(2026, 3, config, shifts, rules)
+    s.generate(seed=1)
+    assert random.random() == expected
+    assert [e["name"] for e in config] == [e["name"] for e in employees]
+    assert s.seed == 1
+    print("No side effects OK.")
+
+def test_default_seed_is_recorded():
+    s, _, log = run(None)
+    assert isinstance(s.seed, int)
+    assert any(f"seed): {s.seed}" in l for l in log)
+
+if __name__ == "__main__":
+    try:
+        test_same_seed_same_schedule()
+        test_input_not_mutated_and_global_random_untouched()
+        test_default_seed_is_recorded()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,102 @@
+from src.scheduler_logic import SchedulerLogic
+
+shifts = {
+    "A": {"time": "07:00-14:00"},
+    "A2C": {"time": "7:00-10:00,16:50-21:35"},
+    "N": {"time": "22:00-02:00"},
+    "X": {"time": ""},
+}
+
+def test_compiled_shifts():
+    s = SchedulerLogic(2026, 1, [], shifts)
+    idx = s.shift_index
+    print(f"Shift ids: {idx.id_of}")
+
+    a2c = idx.id_of["A2C"]
+    assert idx.segments[a2c] == ((420, 600), (1010, 1295))
+    assert idx.first_start[a2c] == 420
+    assert idx.last_end[a2c] == 1295
+    assert idx.total_minutes[a2c] == 180 + 285
+
+    # 跨日班別
+    assert s._calculate_shift_hours("N") == 4.0
+
+    # 無時間的班別
+    x = idx.id_of["X"]
+    assert not idx.has_time[x]
+    assert idx.first_start[x] is None
+    assert s._calculate_shift_hours("Unknown") == 0.0
+    print("Compiled shifts OK.")
+
+def test_timeline_matches_segments():
+    s = SchedulerLogic(2026, 1, [], shifts)
+    timeline = s._get_shift_timeline("A2C")
+    assert len(timeline) == 289
+    assert timeline[84] == 1 and timeline[119] == 1   # 07:00, 09:55
+    assert timeline[120] == 0                          # 10:00
+    assert timeline[202] == 1 and timeline[258] == 1   # 16:50, 21:30
+    assert timeline[259] == 0                          # 21:35
+    assert sum(s._get_shift_timeline("Unknown")) == 0
+    print("Timeline OK.")
+
+def test_rest_matrix():
+    s = SchedulerLogic(2026, 1, [], shifts)
+    idx = s.shift_index
+    a, a2c, n, x = (idx.id_of[k] for k in ("A", "A2C", "N", "X"))
+    # A2C 21:35 下班 -> 隔天 A 07:00 上班 = 9 小時 25 分
+    assert idx.rest_matrix[a2c, a] == 565
+    # A 14:00 下班 -> 隔天 A2C 07:00 上班 = 17 小時
+    assert idx.rest_matrix[a, a2c] == 17 * 60
+    # 跨日班別: N 凌晨 02:00 下班 -> 同一天 07:00 上班 = 5 小時
+    assert idx.rest_matrix[n, a] == 300
+    # 無時間的班別不受限制
+    assert idx.rest_matrix[x, a] == idx.REST_UNBOUNDED
+    assert idx.rest_matrix[a, x] == idx.REST_UNBOUNDED
+    print("Rest matrix OK.")
+
+def test_missing_time_keeps_full_day_rest():
+    # 沒有 "time" 欄位的班別: 休息間隔視為 00:00-23:59 (舊版預設)，工時與覆蓋仍視為無時間
+    s = SchedulerLogic(2026, 1, [], dict(shifts, Y={"required_people": 1}))
+    idx = s.shift_index
+    a, x, y = (idx.id_of[k] for k in ("A", "X", "Y"))
+    assert not idx.has_time[y] and idx.segments[y] == ()
+    assert s._calculate_shift_hours("Y") == 0.0
+    assert sum(s._get_shift_timeline("Y")) == 0
+    # 23:59 下班 -> 隔天 07:00 上班 = 7 小時 1 分；14:00 下班 -> 隔天 00:00 上班 = 10 小時
+    assert idx.rest_matrix[y, a] == 421
+    assert idx.rest_matrix[a, y] == 600
+    assert idx.rest_matrix[y, y] == 1
+    # "time" 為空字串仍不受限制
+    assert idx.rest_matrix[x, y] == idx.rest_matrix[y, x] == idx.REST_UNBOUNDED
+
+    employees = [{"name": "Amy", "allowed_shifts": ["A", "Y"], "roles": ["一般員工"]}]
+    s = SchedulerLogic(2026, 1, employees, dict(shifts, Y={}))
+    s._update_employee_history("Amy", "2026-01-05", "Y")
+    ok, reason = s._is_available(employees[0], s.dates[5], "A")
+    print(f"Y -> A: {ok} {reason}")
+    assert not ok
+    assert not s._day_availability(5)[0, s.shift_index.id_of["A"]]
+    print("Missing time OK.")
+
+def test_min_rest_hours_configurable():
+    employees = [{"name": "Amy", "allowed_shifts": ["A", "A2C"], "roles": ["一般員工"]}]
+    for hours, expected in ((11, False), (9, True)):
+        s = SchedulerLogic(2026, 1, employees, shifts, daily_limits={"min_rest_hours": hours})
+        s._update_employee_history("Amy", "2026-01-05", "A2C")
+        ok, reason = s._is_available(employees[0], s.dates[5], "A")
+        print(f"min_rest_hours={hours}: {ok} {reason}")
+        assert ok == expected
+        assert s._day_availability(5)[0, s.shift_index.id_of["A"]] == expected
+        # 隔一天休息就沒有限制
+        assert s._is_available(employees[0], s.dates[6], "A")[0]
+
+if __name__ == "__main__":
+    try:
+        test_compiled_shifts()
+        test_timeline_matches_segments()
+        test_rest_matrix()
+        test_missing_time_keeps_full_day_rest()
+        test_min_rest_hours_configurable()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")
@@ -0,0 +1,153 @@
+import json
+import numpy as np
+from src.scheduler_logic import SchedulerLogic
+
+def build(shifts, rules, limits=None, biz=None):
+    s = SchedulerLogic(2026, 1, [], shifts, rules, limits, biz)
+    day_log = []
+    general, roles = s._build_demand_profile()
+    return s._build_skeleton(general, roles, day_log), day_log
+
+def test_tie_break_and_headcount():
+    shifts = {
+        "M": {"time": "08:00-12:00", "required_people": 1, "enforce_headcount": True},
+        "M2": {"time": "08:00-12:00", "required_people": 1, "enforce_headcount": True},
+        "L": {"time": "12:00-16:00", "required_people": 1, "enforce_headcount": True},
+    }
+    rules = [{"time_range": "08:00-12:00", "min_people": 2}]
+    skeleton, _ = build(shifts, rules)
+    print(f"Skeleton: {skeleton}")
+    # 同分時取設定順序中的第一個，M 達上限後改用 M2
+    assert skeleton == [("M", None), ("M2", None)]
+
+def test_roles_first_and_alignment():
+    shifts = {
+        "Long": {"time": "06:00-14:00"},
+        "Early": {"time": "08:00-12:00"},
+        "Late": {"time": "14:00-20:00"},
+    }
+    rules = [
+        {"time_range": "08:00-12:00", "min_people": 1, "required_roles": ["組長"]},
+        {"time_range": "12:00-20:00", "min_people": 1},
+    ]
+    skeleton, day_log = build(shifts, rules)
+    print(f"Skeleton: {skeleton}")
+    # Early 與 Long 覆蓋相同格數，但 Early 剛好從需求開頭開始 (對齊加分)
+    assert skeleton[0] == ("Early", "組長")
+    assert ("Late", None) in skeleton
+    assert not day_log
+
+def test_daily_limit():
+    shifts = {"M": {"time": "08:00-12:00"}}
+    rules = [{"time_range": "08:00-12:00", "min_people": 5}]
+    skeleton, day_log = build(shifts, rules, {"max_staff_per_day": 3, "enforce_limit": True})
+    assert len(skeleton) == 3
+    assert any("每日人數上限" in l for l in day_log)
+
+def test_off_grid_boundaries():
+    shifts = {
+        "A": {"time": "06:00-06:21"},
+        "B": {"time": "06:21-12:00"},
+    }
+    # 3 分鐘的需求時段，不在 5 分鐘格上也不會被捨入掉
+    rules = [{"time_range": "06:21-06:24", "min_people": 1}]
+    s = SchedulerLogic(2026, 1, [], shifts, rules)
+    assert list(s.interval_grid.bounds) == [0, 360, 381, 384, 720, 1440]
+    skeleton, _ = build(shifts, rules)
+    print(f"Skeleton: {skeleton}")
+    assert skeleton == [("B", None)]
+
+def test_skeleton_cache():
+    shifts = {"M": {"time": "08:00-12:00"}, "L": {"time": "12:00-16:00"}}
+    rules = [{"time_range": "08:00-16:00", "min_people": 1}]
+    employees = [{"name": f"E{i}", "allowed_shifts": ["M", "L"], "roles": ["一般員工"]} for i in range(6)]
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    s.generate(max_retries=2)
+    stats = s.skeleton_cache_stats
+    print(f"Skeleton cache: {stats}")
+    # 每天的需求都一樣，只需要求解一次
+    assert stats["misses"] == 1
+    assert stats["hits"] + stats["misses"] >= s.num_days
+
+    # 人數上限改變 -> 不同的簽章
+    s.daily_limits = {"max_staff_per_day": 1, "enforce_limit": True}
+    skeleton = s._cached_skeleton(*s._build_demand_profile(), [])
+    assert stats["misses"] == 2 and len(skeleton) == 1
+
+def test_shift_dominance():
+    shifts = {
+        "C": {"time": "16:50-21:35"},
+        "E": {"time": "16:50-21:00"},
+        "E2": {"time": "17:00-21:00"},
+        "N": {"time": "22:00-23:55"},
+    }
+    rules = [{"time_range": "16:00-21:35", "min_people": 3}]
+    employees = [{"name": f"P{i}", "allowed_shifts": ["C", "E", "E2", "N"], "roles": ["一般員工"]} for i in range(3)]
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    general, _ = s._build_demand_profile()
+    dominated, uncovered = s._shift_dominance(general > 0)
+    c, e, e2, n = (s.shift_index.id_of[k] for k in ("C", "E", "E2", "N"))
+    # E 是 C 的子集且開頭相同 -> 被 C 支配；E2 晚 10 分鐘開始，可能拿到開頭對齊加分 -> 不被支配
+    assert dominated[c, e] and not dominated[c, e2] and not dominated[e, c]
+    # N 在需求時段外，永遠不會被選到
+    assert uncovered[n] and not uncovered[c]
+    
+    # 有人可以上 E 但不能上 C 時，不算支配
+    employees.append({"name": "Eve", "allowed_shifts": ["E"], "roles": ["一般員工"]})
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    assert not s._shift_dominance(general > 0)[0][c, e]
+    print("Dominance OK.")
+
+def test_dominance_pruning_keeps_skeleton():
+    def load(name):
+        with open(f"config/config_{name}.json", encoding="utf-8") as f:
+            return json.load(f)
+    args = (load("employees"), load("shifts"), load("coverage"), load("daily_limits"), load("business_hours"))
+    pruned = SchedulerLogic(2026, 1, *args)
+    pruned.DOMINANCE_MIN_SHIFTS = 0  # 強制剪枝
+    # 預設: 班別數少於 DOMINANCE_MIN_SHIFTS，全部評分、不做支配分析
+    full = SchedulerLogic(2026, 1, *args)
+    assert len(full.shift_index) < full.DOMINANCE_MIN_SHIFTS
+    general, roles = pruned._build_demand_profile()
+    log_a, log_b = [], []
+    assert pruned._build_skeleton(general, roles, log_a) == full._build_skeleton(general, roles, log_b)
+    assert log_a == log_b
+    stats = pruned.dominance_stats
+    print(f"Dominance stats: {stats}")
+    # 支配分析依需求時段快取 (需求時段相同的角色共用)
+    assert stats["profiles"] == len({(d > 0).tobytes() for d in [general, *roles.values()]})
+    assert stats["skipped"] > 0 and full.dominance_stats["skipped"] == 0
+    assert full.dominance_stats["profiles"] == 0 and not full._dominance_cache
+    assert stats["scored"] + stats["skipped"] == full.dominance_stats["scored"]
+
+def test_float_min_people():
+    # JSON / Streamlit 的數字輸入會給 2.0 這類浮點數: 骨架與驗證器都要納入這條規則
+    shifts = {"M": {"time": "08:00-12:00"}, "L": {"time": "12:00-16:00"}}
+    skeleton, _ = build(shifts, [{"time_range": "08:00-12:00", "min_people": 2.0},
+                                 {"time_range": "12:00-16:00", "min_people": np.float64(1.5)}])
+    print(f"Skeleton: {skeleton}")
+    # 小數人數無條件進位
+    assert skeleton == [("M", None), ("M", None), ("L", None), ("L", None)]
+
+    employees = [{"name": f"E{i}", "allowed_shifts": ["M", "L"], "roles": ["一般員工"]} for i in range(6)]
+    rules = [{"time_range": "08:00-12:00", "min_people": 2.0}]
+    s = SchedulerLogic(2026, 1, employees, shifts, rules)
+    assert len(s.coverage_index.rules) == 1 and s.demand_windows[0][2] == 2
+    s.generate(seed=1)
+    assert not [v for day in range(s.num_days) for v in s._coverage_violations(day) if v["critical"]]
+    assert all(len(day["M"]) >= 2 for day in s.schedule.values())
+    print("Float min_people OK.")
+
+if __name__ == "__main__":
+    try:
+        test_tie_break_and_headcount()
+        test_roles_first_and_alignment()
+        test_daily_limit()
+        test_off_grid_boundaries()
+        test_skeleton_cache()
+        test_shift_dominance()
+        test_dominance_pruning_keeps_skeleton()
+        test_float_min_people()
+        print("ALL TESTS PASSED")
+    except Exception as e:
+        print(f"FAILED: {e}")